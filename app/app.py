@@ -1,29 +1,525 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, abort, render_template, request, Response
+from collections import deque
+import csv
+import gzip
+import hashlib
+import io
 import json
 import os
+import queue
+import stat
+import threading
+
+import pyarrow.dataset as ds
 
 app = Flask(__name__)
 
+REPORT_PATH = os.path.join(os.path.dirname(__file__), '..', 'mine-tracker', 'data', '08_reporting', 'report_inference.json')
+# todas as instâncias, uma partição por cluster (cluster=N/), gravadas pelo pipeline junto do relatório
+INSTANCIAS_DIR = 'report_inference_instancias'
+
+CAMPOS_INSTANCIA = ('hora', 'final_de_semana', 'media_movel_10', 'proporcao_rede', 'pct_var_jogadores')
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+
+class IndiceRelatorio:
+    """Índice das consultas da API, montado uma vez por versão do relatório.
+
+    Guarda o resumo de cada cluster (sem as instâncias), o ranking, a legenda
+    e o agregado por hora que o dashboard desenha, já serializados. O
+    agregado por hora vem pronto do relatório (``horas``, calculado sobre
+    todas as instâncias); as instâncias ficam no Parquet de
+    :class:`InstanciasRelatorio`.
+    """
+
+    def __init__(self, data, versao=None):
+        self.versao = versao
+        self.legenda = data.get('legend', {})
+        self.ranking = data.get('ranking', [])
+        self.horas = data.get('horas', [])
+        self.clusters = []
+        for cluster in data.get('clusters', []):
+            instancias = cluster.get('instances', [])
+            self.clusters.append({
+                'cluster_id': cluster['cluster_id'],
+                'baseline_prediction': cluster['baseline_prediction'],
+                'level': cluster['level'],
+                'action': cluster['action'],
+                'total_instances': cluster.get('total_instances', len(instancias)),
+                'primeira_instancia': instancias[0] if instancias else None,
+            })
+        self.por_id = {str(c['cluster_id']): c for c in self.clusters}
+        self.resumo = app.json.response({
+            'versao': versao,
+            'legend': self.legenda,
+            'ranking': self.ranking,
+            'clusters': self.clusters,
+            'horas': self.horas,
+        }).get_data()
+
+    def filtrar_clusters(self, level=None):
+        if level is None:
+            return self.clusters
+        return [c for c in self.clusters if c['level'] == level]
+
+
+class InstanciasRelatorio:
+    """Instâncias completas do relatório, no Parquet particionado por cluster.
+
+    O filtro do cluster (só a partição ``cluster=N/`` é aberta) e a faixa de
+    hora vão para o scan do pyarrow, e só as linhas da página são
+    materializadas: o custo de uma página não depende do tamanho da base.
+
+    O pipeline regrava este Parquet (um diretório novo trocado no lugar)
+    antes do JSON, então o dataset aberto é guardado pela assinatura do
+    próprio diretório (inode/mtime) e não só pela versão do relatório; se os
+    arquivos somem entre o ``stat`` e a leitura, ele é reaberto uma vez.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._dataset = None
+        self._assinatura = None
+
+    def _abrir(self):
+        st = os.stat(self.caminho)
+        if not stat.S_ISDIR(st.st_mode):
+            raise FileNotFoundError(self.caminho)
+        assinatura = (st.st_ino, st.st_mtime_ns)
+        if self._dataset is None or assinatura != self._assinatura:
+            self._dataset = ds.dataset(self.caminho, format='parquet', partitioning='hive')
+            self._assinatura = assinatura
+        return self._dataset
+
+    def _ler(self, funcao):
+        try:
+            return funcao(self._abrir())
+        except FileNotFoundError:
+            self._dataset = None  # regravado no meio da consulta
+            return funcao(self._abrir())
+
+    @property
+    def colunas(self):
+        """Colunas na ordem gravada (a de partição volta ao lugar), sem a predição."""
+        esquema = self._abrir().schema
+        pandas = json.loads((esquema.metadata or {}).get(b'pandas', b'{}'))
+        ordem = [c['name'] for c in pandas.get('columns', []) if c.get('name') in esquema.names]
+        ordem += [c for c in esquema.names if c not in ordem]
+        return [c for c in ordem if c != 'prediction']
+
+    @staticmethod
+    def _filtro(cluster_id, hora_min=None, hora_max=None):
+        filtro = ds.field('cluster') == int(cluster_id)
+        if hora_min is not None:
+            filtro = filtro & (ds.field('hora') >= hora_min)
+        if hora_max is not None:
+            filtro = filtro & (ds.field('hora') <= hora_max)
+        return filtro
+
+    def pagina(self, cluster_id, offset, limit, hora_min=None, hora_max=None, campos=None):
+        """Instâncias ``[offset, offset + limit)`` do cluster, na ordem original."""
+        filtro = self._filtro(cluster_id, hora_min, hora_max)
+
+        def ler(dataset):
+            total = dataset.count_rows(filter=filtro)
+            posicoes = list(range(offset, min(offset + limit, total)))
+            itens = dataset.take(posicoes, columns=campos or self.colunas, filter=filtro).to_pylist() if posicoes else []
+            return {'total': total, 'offset': offset, 'limit': limit, 'itens': itens}
+
+        return self._ler(ler)
+
+    def todas(self, cluster_id, colunas=None):
+        """Todas as instâncias do cluster, um lote de linhas por vez."""
+        def abrir(dataset):
+            lotes = iter(dataset.to_batches(columns=colunas or self.colunas, filter=self._filtro(cluster_id)))
+            return next(lotes, None), lotes
+
+        # só o primeiro lote passa pela releitura: depois dele a resposta já começou
+        primeiro, lotes = self._ler(abrir)
+        if primeiro is None:
+            return
+        yield from primeiro.to_pylist()
+        for lote in lotes:
+            yield from lote.to_pylist()
+
+
+class CacheRelatorio:
+    """Relatório em memória, já serializado e comprimido.
+
+    A cada pedido só é feito um ``stat`` no arquivo; ele é lido de novo apenas
+    quando mtime/tamanho mudam, e reprocessado apenas se o conteúdo (sha256)
+    mudou (o ``IndiceRelatorio`` das consultas é montado nesse momento). O
+    custo de um pedido não depende do tamanho do relatório.
+    """
+
+    def __init__(self, caminho, caminho_instancias=None):
+        self.caminho = caminho
+        self.caminho_instancias = caminho_instancias or os.path.join(os.path.dirname(caminho), INSTANCIAS_DIR)
+        self._lock = threading.Lock()
+        self._assinatura = None
+        self._hash = None
+        self.entrada = None
+
+    def obter(self):
+        st = os.stat(self.caminho)
+        assinatura = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if assinatura == self._assinatura:
+            return self.entrada
+        with self._lock:
+            if assinatura != self._assinatura:
+                self._recarregar(assinatura, st.st_mtime)
+            return self.entrada
+
+    def _recarregar(self, assinatura, mtime):
+        with open(self.caminho, 'rb') as f:
+            bruto = f.read()
+        conteudo = hashlib.sha256(bruto).hexdigest()
+        if conteudo != self._hash:
+            data = json.loads(bruto)
+            # mesmo corpo que o jsonify gerava
+            corpo = app.json.response(data).get_data()
+            self.entrada = {
+                'data': data,
+                'corpo': corpo,
+                'corpo_gzip': gzip.compress(corpo, compresslevel=6, mtime=0),
+                'etag': conteudo[:32],
+                'last_modified': mtime,
+                'indice': IndiceRelatorio(data, conteudo[:32]),
+                # o pipeline grava as instâncias antes do relatório: a versão nova já está no disco
+                'instancias': InstanciasRelatorio(self.caminho_instancias),
+            }
+            self._hash = conteudo
+        self._assinatura = assinatura
+
+
+cache = CacheRelatorio(REPORT_PATH)
+
+
 # Carregar dados do JSON
 def load_data():
-    json_path = os.path.join(os.path.dirname(__file__), '..', 'mine-tracker', 'data', '08_reporting', 'report_inference.json')
-    with open(json_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return cache.obter()['data']
+
+
+def _entrada_ou_503():
+    try:
+        return cache.obter()
+    except FileNotFoundError:
+        abort(Response(json.dumps({'erro': 'relatório ainda não gerado'}), status=503, mimetype='application/json'))
+
+
+def _erro(mensagem, status=400):
+    abort(Response(json.dumps({'erro': mensagem}, ensure_ascii=False), status=status, mimetype='application/json'))
+
+
+def _instancias_ou_503(entrada):
+    instancias = entrada['instancias']
+    if not os.path.isdir(instancias.caminho):
+        _erro('instâncias do relatório ainda não geradas', status=503)
+    return instancias
+
+
+def _pagina_instancias_ou_503(entrada, *args):
+    try:
+        return _instancias_ou_503(entrada).pagina(*args)
+    except FileNotFoundError:
+        _erro('instâncias do relatório sendo regravadas, tente novamente', status=503)
+
+
+def _resposta_json(entrada, corpo, corpo_gzip=None, chave=''):
+    """Resposta com ETag da versão do relatório (e da consulta) e gzip negociado."""
+    usa_gzip = 'gzip' in request.accept_encodings and len(corpo) > 1024
+    if usa_gzip:
+        corpo = corpo_gzip if corpo_gzip is not None else gzip.compress(corpo, compresslevel=6, mtime=0)
+    resp = Response(corpo, mimetype='application/json')
+    if usa_gzip:
+        resp.headers['Content-Encoding'] = 'gzip'
+    # cada codificação tem o seu ETag; o cliente revalida a cada polling
+    etag = entrada['etag']
+    if chave:
+        etag += '-' + hashlib.sha256(chave.encode()).hexdigest()[:12]
+    resp.set_etag(etag + ('-gz' if usa_gzip else ''))
+    resp.last_modified = entrada['last_modified']
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp.make_conditional(request)
+
+
+def _resposta_relatorio():
+    entrada = _entrada_ou_503()
+    return _resposta_json(entrada, entrada['corpo'], entrada['corpo_gzip'])
+
+
+def _inteiro(nome, padrao=None, minimo=0, maximo=None):
+    valor = request.args.get(nome)
+    if valor is None or valor == '':
+        return padrao
+    try:
+        valor = int(valor)
+    except ValueError:
+        _erro(f'{nome} deve ser inteiro')
+    if valor < minimo or (maximo is not None and valor > maximo):
+        _erro(f'{nome} fora do intervalo [{minimo}, {maximo if maximo is not None else "∞"}]')
+    return valor
+
+
+def _offset_limit():
+    return _inteiro('offset', 0), _inteiro('limit', LIMITE_PADRAO, minimo=1, maximo=LIMITE_MAXIMO)
+
+
+def _pagina(itens):
+    """Aplica ``offset``/``limit`` da query string."""
+    offset, limit = _offset_limit()
+    return {'total': len(itens), 'offset': offset, 'limit': limit, 'itens': itens[offset:offset + limit]}
+
+
+def _campos():
+    campos = request.args.get('campos')
+    if not campos:
+        return None
+    campos = [c.strip() for c in campos.split(',') if c.strip()]
+    desconhecidos = [c for c in campos if c not in CAMPOS_INSTANCIA]
+    if desconhecidos:
+        _erro(f'campos desconhecidos: {", ".join(desconhecidos)}')
+    return campos
+
+
+def _consulta(entrada, dados):
+    # a chave do ETag é a própria consulta: mesma versão + mesmos parâmetros = mesmo corpo
+    chave = request.full_path
+    return _resposta_json(entrada, app.json.response(dados).get_data(), chave=chave)
+
+
+def diferenca_indices(antigo, novo):
+    """O que mudou no resumo entre duas versões do relatório.
+
+    Vão apenas os clusters novos ou com algum campo do resumo alterado, os ids
+    removidos e, se mudaram, a ordem dos clusters, o ranking, a legenda e o
+    agregado por hora. ``anterior`` permite ao cliente saber se está na base certa.
+    """
+    velhos = {c['cluster_id']: c for c in antigo.clusters}
+    ids_novos = [c['cluster_id'] for c in novo.clusters]
+    diff = {
+        'versao': novo.versao,
+        'anterior': antigo.versao,
+        'clusters': [c for c in novo.clusters if velhos.get(c['cluster_id']) != c],
+        'removidos': [cid for cid in velhos if cid not in set(ids_novos)],
+    }
+    if ids_novos != [c['cluster_id'] for c in antigo.clusters]:
+        diff['ordem'] = ids_novos
+    if novo.ranking != antigo.ranking:
+        diff['ranking'] = novo.ranking
+    if novo.legenda != antigo.legenda:
+        diff['legend'] = novo.legenda
+    if novo.horas != antigo.horas:
+        diff['horas'] = novo.horas
+    return diff
+
+
+def _evento_sse(tipo, dados, id_evento=None):
+    texto = f'event: {tipo}\n' + ''.join(f'data: {linha}\n' for linha in json.dumps(dados, ensure_ascii=False).split('\n'))
+    if id_evento:
+        texto = f'id: {id_evento}\n' + texto
+    return texto + '\n'
+
+
+class PublicadorRelatorio:
+    """Observa o relatório e empurra as diferenças para os dashboards abertos.
+
+    Uma única thread faz ``stat`` no arquivo a cada ``intervalo`` segundos (via
+    ``CacheRelatorio``); quando a versão muda, calcula o diff do resumo uma vez,
+    formata o evento SSE uma vez e o coloca na fila de cada assinante. O custo
+    de N dashboards abertos é um observador e N filas, não N pollings do
+    relatório inteiro. Os últimos eventos ficam guardados para quem reconecta
+    com ``Last-Event-ID``; assinante lento demais recebe ``recarregar``.
+    """
+
+    def __init__(self, cache, intervalo=2.0, historico=32, max_fila=64):
+        self.cache = cache
+        self.intervalo = intervalo
+        self.max_fila = max_fila
+        self._historico = deque(maxlen=historico)  # (versão anterior, evento)
+        self._assinantes = set()
+        self._lock = threading.RLock()
+        self._indice = None
+        self._thread = None
+        self._parar = threading.Event()
+
+    def versao(self):
+        return self._indice.versao if self._indice is not None else None
+
+    def assinar(self, desde=None):
+        """Nova fila de eventos, já com o que o cliente perdeu desde a versão ``desde``."""
+        self._iniciar()
+        fila = queue.Queue(maxsize=self.max_fila)
+        with self._lock:
+            atual = self.versao()
+            if desde and atual and desde != atual:
+                anteriores = [anterior for anterior, _ in self._historico]
+                if desde in anteriores:
+                    for _, evento in list(self._historico)[anteriores.index(desde):]:
+                        fila.put_nowait(evento)
+                else:
+                    fila.put_nowait(_evento_sse('recarregar', {'versao': atual}, atual))
+            self._assinantes.add(fila)
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes.discard(fila)
+
+    def parar(self):
+        self._parar.set()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None:
+                self._verificar()
+                self._thread = threading.Thread(target=self._laco, name='publicador-relatorio', daemon=True)
+                self._thread.start()
+
+    def _laco(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self._verificar()
+            except Exception:
+                app.logger.exception('falha ao verificar o relatório')
+
+    def _verificar(self):
+        try:
+            indice = self.cache.obter()['indice']
+        except FileNotFoundError:
+            return
+        with self._lock:
+            antigo = self._indice
+            if antigo is not None and indice.versao == antigo.versao:
+                return
+            self._indice = indice
+            if antigo is None:
+                # relatório apareceu depois que o app subiu: quem já estava aberto recarrega
+                if self._thread is not None:
+                    self._publicar(None, _evento_sse('recarregar', {'versao': indice.versao}, indice.versao))
+                return
+            diff = diferenca_indices(antigo, indice)
+            self._publicar(diff['anterior'], _evento_sse('diff', diff, diff['versao']))
+
+    def _publicar(self, anterior, evento):
+        with self._lock:
+            self._historico.append((anterior, evento))
+            for fila in list(self._assinantes):
+                try:
+                    fila.put_nowait(evento)
+                except queue.Full:
+                    # cliente não acompanha: descarta o atraso e pede recarga completa
+                    with fila.mutex:
+                        fila.queue.clear()
+                    fila.put_nowait(_evento_sse('recarregar', {'versao': self.versao()}, self.versao()))
+
+
+publicador = PublicadorRelatorio(cache)
+
 
 @app.route('/')
 def dashboard():
-    data = load_data()
-    return render_template('dashboard.html', data=data)
+    # o template busca os dados em /api/resumo; não precisa do relatório aqui
+    return render_template('dashboard.html')
 
 @app.route('/dashboard')
 def dashboard_alt():
-    data = load_data()
-    return render_template('dashboard.html', data=data)
+    return render_template('dashboard.html')
 
 @app.route('/api/data')
 def api_data():
-    data = load_data()
-    return jsonify(data)
+    # relatório completo; o dashboard só usa para exportar
+    return _resposta_relatorio()
+
+@app.route('/api/resumo')
+def api_resumo():
+    # tudo o que o dashboard desenha, sem as instâncias: tamanho não cresce com elas
+    entrada = _entrada_ou_503()
+    return _resposta_json(entrada, entrada['indice'].resumo)
+
+@app.route('/api/clusters')
+def api_clusters():
+    entrada = _entrada_ou_503()
+    clusters = entrada['indice'].filtrar_clusters(request.args.get('level'))
+    return _consulta(entrada, _pagina(clusters))
+
+@app.route('/api/ranking')
+def api_ranking():
+    entrada = _entrada_ou_503()
+    return _consulta(entrada, entrada['indice'].ranking)
+
+@app.route('/api/clusters/<cluster_id>/instancias')
+def api_instancias(cluster_id):
+    entrada = _entrada_ou_503()
+    if cluster_id not in entrada['indice'].por_id:
+        _erro(f'cluster {cluster_id} não encontrado', status=404)
+    hora_min = _inteiro('hora_min', minimo=0, maximo=23)
+    hora_max = _inteiro('hora_max', minimo=0, maximo=23)
+    offset, limit = _offset_limit()
+    pagina = _pagina_instancias_ou_503(entrada, cluster_id, offset, limit, hora_min, hora_max, _campos())
+    return _consulta(entrada, pagina)
+
+CABECALHO_CSV = ['Cluster ID', 'Hora', 'Fim de Semana', 'Média Móvel', 'Proporção Rede', 'Variação %', 'Previsão', 'Nível', 'Ação']
+
+@app.route('/api/exportar')
+def api_exportar():
+    # todas as instâncias (não só a amostra do JSON), lidas cluster a cluster do Parquet e enviadas em fluxo
+    entrada = _entrada_ou_503()
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'json'):
+        _erro('formato deve ser csv ou json')
+    indice, instancias = entrada['indice'], _instancias_ou_503(entrada)
+
+    def csv_():
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer, lineterminator='\n')
+        escritor.writerow(CABECALHO_CSV)
+        for cluster in indice.clusters:
+            for inst in instancias.todas(cluster['cluster_id'], list(CAMPOS_INSTANCIA)):
+                escritor.writerow([cluster['cluster_id'], *(inst[c] for c in CAMPOS_INSTANCIA),
+                                   cluster['baseline_prediction'], cluster['level'], cluster['action']])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    def json_():
+        cabeca = json.dumps({'versao': indice.versao, 'legend': indice.legenda, 'ranking': indice.ranking,
+                             'horas': indice.horas}, ensure_ascii=False)
+        yield cabeca[:-1] + ', "clusters": ['
+        for i, cluster in enumerate(indice.clusters):
+            resumo = {k: v for k, v in cluster.items() if k != 'primeira_instancia'}
+            yield (', ' if i else '') + json.dumps({**resumo, 'instances': list(instancias.todas(cluster['cluster_id']))},
+                                                   ensure_ascii=False)
+        yield ']}'
+
+    resp = Response(csv_() if formato == 'csv' else json_(),
+                    mimetype='text/csv' if formato == 'csv' else 'application/json')
+    resp.headers['Content-Disposition'] = f'attachment; filename=mine_tracker_dados.{formato}'
+    return resp
+
+@app.route('/api/eventos')
+def api_eventos():
+    # Last-Event-ID vem do próprio EventSource ao reconectar; ?versao= na primeira conexão
+    desde = request.headers.get('Last-Event-ID') or request.args.get('versao')
+    fila = publicador.assinar(desde)
+
+    def fluxo():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    yield fila.get(timeout=15)
+                except queue.Empty:
+                    yield ': ping\n\n'  # mantém a conexão e detecta cliente que saiu
+        finally:
+            publicador.cancelar(fila)
+
+    resp = Response(fluxo(), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8901, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8901, debug=True)
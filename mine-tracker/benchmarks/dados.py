@@ -0,0 +1,66 @@
+"""
+Dados sintéticos e determinísticos para os benchmarks.
+
+Mesmo formato das tabelas reais: ``raw_sintetico`` imita os CSVs diários do
+minetrack já lidos (``timestamp`` UTC, ``ip``, ``playerCount``) e
+``inferencia_sintetica`` a saída da inferência (``input_inference`` +
+``prediction``). Mesma semente, mesmos dados.
+"""
+import numpy as np
+import pandas as pd
+
+from mine_tracker.pipelines.mine.esquema import ESQUEMA_INFERENCIA, ESQUEMA_RAW, aplicar_esquema
+
+INICIO = pd.Timestamp("2022-09-02", tz="UTC")
+
+# linhas / servidores por escala; servidores coletados a cada minuto, como no minetrack
+ESCALAS = {
+    "pequena": {"linhas": 10_000, "servidores": 100},
+    "media": {"linhas": 1_000_000, "servidores": 1_000},
+    "grande": {"linhas": 10_000_000, "servidores": 2_000},
+    "enorme": {"linhas": 100_000_000, "servidores": 5_000},
+}
+
+
+def raw_sintetico(linhas: int, servidores: int, semente: int = 0) -> pd.DataFrame:
+    """Leituras de ``servidores`` servidores, uma por minuto, intercaladas no
+    tempo como nos CSVs (todos os servidores de um minuto, depois o próximo).
+
+    Cada servidor tem um tamanho próprio (lognormal), ciclo diário com pico à
+    noite e ruído; ~0,1% das leituras vêm sem ``playerCount``.
+    """
+    rng = np.random.default_rng(semente)
+    minutos = -(-linhas // servidores)
+    servidor = np.tile(np.arange(servidores, dtype=np.int32), minutos)[:linhas]
+    minuto = np.repeat(np.arange(minutos, dtype=np.int64), servidores)[:linhas]
+
+    base = rng.lognormal(mean=5.0, sigma=1.5, size=servidores).astype(np.float32)
+    hora = (minuto // 60) % 24
+    ciclo = 1.0 + 0.5 * np.sin((hora - 15) * (np.pi / 12)).astype(np.float32)
+    jogadores = np.rint(base[servidor] * ciclo * rng.normal(1.0, 0.05, linhas).astype(np.float32))
+    jogadores = np.clip(jogadores, 0, None).astype(np.float32)
+    jogadores[rng.random(linhas) < 0.001] = np.nan
+
+    ips = pd.Categorical.from_codes(servidor, categories=[f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(servidores)])
+    df = pd.DataFrame({
+        "timestamp": INICIO + pd.to_timedelta(minuto, unit="min"),
+        "ip": ips,
+        "playerCount": jogadores,
+    })
+    return aplicar_esquema(df, ESQUEMA_RAW)
+
+
+def inferencia_sintetica(linhas: int, clusters: int, semente: int = 0) -> pd.DataFrame:
+    """Saída de inferência com o esquema de ``input_inference`` + ``prediction``."""
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame({
+        "hora": rng.integers(0, 24, linhas),
+        "final_de_semana": rng.integers(0, 2, linhas),
+        "media_movel_10": rng.gamma(2.0, 400.0, linhas),
+        "proporcao_rede": rng.random(linhas),
+        "pct_var_jogadores": rng.normal(0, 0.05, linhas),
+        "cluster": rng.integers(0, clusters, linhas),
+    })
+    df = aplicar_esquema(df, ESQUEMA_INFERENCIA)
+    df["prediction"] = rng.gamma(2.0, 25000.0, linhas)
+    return df
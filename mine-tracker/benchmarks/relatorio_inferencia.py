@@ -0,0 +1,109 @@
+"""
+Benchmark do ``generate_report`` (pipeline 'inference').
+
+Compara o relatório atual (um ``groupby`` só) com a versão anterior, que
+varria o DataFrame inteiro para cada cluster, e confere que o JSON gerado
+pelos dois é idêntico byte a byte.
+
+Uso (a partir de ``mine-tracker/``)::
+
+    python benchmarks/relatorio_inferencia.py --linhas 1000000 --clusters 1000
+    python benchmarks/relatorio_inferencia.py --sem-legado   # só a versão atual
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict
+
+import pandas as pd
+
+from dados import inferencia_sintetica
+from mine_tracker.pipelines.inference.nodes import action_for_load, generate_report, label_load
+
+
+# Versão anterior, mantida só como referência de saída e de tempo
+
+def generate_report_legado(df: pd.DataFrame) -> Dict[str, Any]:
+    # 🔹 legenda explicando cada feature
+    legend = {
+        "hora": "Hora do dia (0–23)",
+        "final_de_semana": "Indicador se é fim de semana (0=Não, 1=Sim)",
+        "media_movel_10": "Média móvel de jogadores nas últimas 10 janelas",
+        "proporcao_rede": "Proporção de jogadores no cluster em relação à rede total (0–1)",
+        "pct_var_jogadores": "Variação percentual de jogadores em relação ao período anterior"
+    }
+
+    report = {
+        "legend": legend,
+        "clusters": [],
+        "ranking": []
+    }
+
+    grouped = df.groupby("cluster")["prediction"].mean().reset_index()
+    rank = grouped.sort_values("prediction", ascending=False).reset_index(drop=True)
+
+    for _, row in grouped.iterrows():
+        cluster_id = int(row["cluster"])
+        pred = round(float(row["prediction"]))  # 🔹 arredonda predição
+        level = label_load(pred)
+        action = action_for_load(level)
+
+        subset = df[df["cluster"] == cluster_id].drop(columns=["prediction"])
+
+        cluster_info = {
+            "cluster_id": cluster_id,
+            "baseline_prediction": pred,
+            "level": level,
+            "action": action,
+            "instances": subset.to_dict(orient="records")
+        }
+        report["clusters"].append(cluster_info)
+
+    for i, row in rank.iterrows():
+        pred = round(float(row["prediction"]))
+        lvl = label_load(pred)
+        report["ranking"].append({
+            "posicao": i + 1,
+            "cluster_id": int(row["cluster"]),
+            "prediction": pred,
+            "level": lvl
+        })
+
+    return report
+
+
+def _serializar(report: Dict[str, Any]) -> bytes:
+    # mesmos argumentos do report_inference no catálogo
+    return json.dumps(report, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def _medir(funcao, df: pd.DataFrame):
+    inicio = time.perf_counter()
+    report = funcao(df)
+    return report, time.perf_counter() - inicio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--clusters", type=int, default=1_000)
+    parser.add_argument("--sem-legado", action="store_true", help="não roda a versão anterior (lenta)")
+    args = parser.parse_args()
+
+    df = inferencia_sintetica(args.linhas, args.clusters)
+    atual, t_atual = _medir(generate_report, df)
+    resultado = {"linhas": args.linhas, "clusters": args.clusters, "atual_segundos": round(t_atual, 3)}
+
+    if not args.sem_legado:
+        legado, t_legado = _medir(generate_report_legado, df)
+        resultado.update({
+            "legado_segundos": round(t_legado, 3),
+            "aceleracao": round(t_legado / t_atual, 1),
+            # o legado não tinha o agregado por hora
+            "saida_identica": _serializar({k: v for k, v in atual.items() if k != "horas"}) == _serializar(legado),
+        })
+    print(json.dumps(resultado, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Suíte de benchmarks dos nodes de mine, model e inference e do ``/api/data``.
+
+Para cada escala (ver ``dados.ESCALAS``) gera dados sintéticos determinísticos
+e mede tempo (melhor de N repetições) e pico de memória (RSS acima do que já
+estava em uso) de cada caso, na ordem do pipeline:
+
+- ``gerar_features``: raw -> features (tabela inteira)
+- ``preprocess_data``: features -> X, y (tabela inteira)
+- ``treinar_modelos`` / ``avaliar_modelos``: como no pipeline, no servidor
+  com mais leituras (``load_data``) e modelos de ``criar_pipelines``
+- ``inferencia``: ``best_model`` compactado sobre ``linhas`` linhas
+- ``generate_report``: relatório + gravação pelo ``JSONStreamDataset``
+- ``api_data_frio`` / ``api_data_quente`` / ``api_data_304``: ``/api/data`` do
+  app Flask na primeira leitura do relatório, com cache e condicional
+
+Os casos de partida não dependem da escala: rodam uma vez (escala
+``partida``), cada repetição num processo Python novo, e medem o import frio:
+
+- ``importar_inference``: ``import mine_tracker.pipelines.inference``
+- ``importar_model``: ``import mine_tracker.pipelines.model`` (sem sklearn)
+- ``registro_inference``: ``bootstrap_project`` + ``pipelines["inference"]``,
+  o que ``kedro run --pipeline inference`` faz antes do primeiro node
+
+Eles registram também se o sklearn foi carregado e os pacotes mais caros
+(``python -X importtime``).
+
+Uso (a partir de ``mine-tracker/``)::
+
+    python benchmarks/suite.py                                # escalas pequena e media
+    python benchmarks/suite.py --escalas grande --repeticoes 1
+    python benchmarks/suite.py --casos gerar_features inferencia
+    python benchmarks/suite.py --salvar-baseline              # vira a referência
+    python benchmarks/suite.py --comparar benchmarks/resultados/20250101T000000.json
+
+Cada execução grava ``benchmarks/resultados/<data>.json``. Havendo baseline
+(``--comparar``, ou ``resultados/baseline.json`` se existir), cada caso é
+comparado com os limites de ``limites.yml`` e o processo sai com código 1
+se algum ficou mais lento ou mais pesado que o permitido.
+"""
+import argparse
+import ctypes
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+from dados import ESCALAS, inferencia_sintetica, raw_sintetico
+from mine_tracker.datasets import JSONStreamDataset
+from mine_tracker.hooks import pico_rss_bytes, rss_bytes, zerar_pico_rss
+from mine_tracker.pipelines.inference.nodes import generate_report, inferencia
+from mine_tracker.pipelines.mine.nodes import gerar_features
+from mine_tracker.pipelines.model.nodes import (
+    avaliar_modelos,
+    compactar_modelo,
+    criar_pipelines,
+    dividir_treino_teste,
+    load_data,
+    preprocess_data,
+    treinar_modelos,
+)
+
+AQUI = Path(__file__).resolve().parent
+PROJETO = AQUI.parent
+RESULTADOS = AQUI / "resultados"
+BASELINE = RESULTADOS / "baseline.json"
+CASOS = [
+    "gerar_features",
+    "preprocess_data",
+    "treinar_modelos",
+    "avaliar_modelos",
+    "inferencia",
+    "generate_report",
+    "api_data_frio",
+    "api_data_quente",
+    "api_data_304",
+]
+# código medido num processo novo por repetição (imports frios)
+CASOS_PARTIDA = {
+    "importar_inference": "import mine_tracker.pipelines.inference",
+    "importar_model": "import mine_tracker.pipelines.model",
+    "registro_inference": (
+        "from kedro.framework.project import pipelines\n"
+        "from kedro.framework.startup import bootstrap_project\n"
+        "bootstrap_project(Path.cwd())\n"
+        "pipelines.set_requested(['inference'])\n"
+        "pipelines['inference']"
+    ),
+}
+_FILHO = """
+import json, sys, time
+from pathlib import Path
+sys.stderr.write("# inicio\\n")
+inicio = time.perf_counter()
+{codigo}
+tempo = time.perf_counter() - inicio
+from mine_tracker.hooks import pico_rss_bytes
+print(json.dumps({{"tempo": tempo, "pico": pico_rss_bytes(), "sklearn": "sklearn" in sys.modules}}))
+"""
+
+
+def _parametros(arquivo: str) -> Dict[str, Any]:
+    with open(PROJETO / "conf" / "base" / arquivo, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def _devolver_heap() -> None:
+    """Devolve ao sistema a memória livre do malloc (glibc), para o RSS de
+    partida não esconder alocações que reaproveitariam o que já foi liberado."""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def medir(funcao: Callable[[], Any], repeticoes: int):
+    """Roda ``funcao`` ``repeticoes`` vezes: memória da primeira, melhor tempo.
+
+    O pico é o VmHWM (zerado antes) menos o RSS de antes, ou seja, quanto o
+    caso precisou além do que já estava em uso.
+    """
+    gc.collect()
+    _devolver_heap()
+    antes = rss_bytes() or 0
+    zerar_pico_rss()
+    tempos = []
+    inicio = time.perf_counter()
+    saida = funcao()
+    tempos.append(time.perf_counter() - inicio)
+    pico = max(0, (pico_rss_bytes() or 0) - antes)
+    for _ in range(repeticoes - 1):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return saida, {"tempo_segundos": min(tempos), "tempos": tempos, "memoria_pico_bytes": pico}
+
+
+def _cliente_app(caminho_relatorio: Path):
+    """``test_client`` do app Flask lendo ``caminho_relatorio``, com cache novo."""
+    sys.path.insert(0, str(PROJETO.parent / "app"))
+    import app as app_flask
+
+    app_flask.cache = app_flask.CacheRelatorio(str(caminho_relatorio))
+    return app_flask, app_flask.app.test_client()
+
+
+def rodar_escala(nome: str, casos: List[str], repeticoes: int, semente: int = 0) -> List[Dict[str, Any]]:
+    escala = ESCALAS[nome]
+    linhas, servidores = escala["linhas"], escala["servidores"]
+    resultados = []
+
+    def registrar(caso: str, funcao: Callable[[], Any], n_linhas: int, rodar: bool = True):
+        if not rodar:
+            return funcao()
+        saida, medida = medir(funcao, repeticoes)
+        resultados.append({"escala": nome, "caso": caso, "linhas": n_linhas, **medida})
+        print(f"  {caso:<18} {n_linhas:>12,} linhas  {medida['tempo_segundos']:>9.3f} s  "
+              f"{medida['memoria_pico_bytes'] / 2**20:>9.1f} MiB", flush=True)
+        return saida
+
+    def precisa(*nomes: str) -> bool:
+        return any(c in casos for c in nomes)
+
+    print(f"escala {nome}: {linhas:,} linhas, {servidores:,} servidores", flush=True)
+    tmp = Path(tempfile.mkdtemp(prefix="mine_tracker_bench_"))
+    try:
+        modelo = None
+        if precisa("gerar_features", "preprocess_data", "treinar_modelos", "avaliar_modelos", "inferencia"):
+            raw = raw_sintetico(linhas, servidores, semente)
+            features = registrar("gerar_features", lambda: gerar_features(raw), linhas, "gerar_features" in casos)
+            del raw
+            if "preprocess_data" in casos:
+                registrar("preprocess_data", lambda: preprocess_data(features), len(features))
+
+            if precisa("treinar_modelos", "avaliar_modelos", "inferencia"):
+                X, y, n_drop_y = preprocess_data(load_data(features))
+                split = dividir_treino_teste(X, y)
+                del features
+                treinados = registrar(
+                    "treinar_modelos", lambda: treinar_modelos(criar_pipelines(), X, y, split), len(X),
+                    "treinar_modelos" in casos,
+                )
+                modelo, _, _ = registrar(
+                    "avaliar_modelos", lambda: avaliar_modelos(treinados, X, y, n_drop_y, split), len(X),
+                    "avaliar_modelos" in casos,
+                )
+
+        if precisa("inferencia", "generate_report", "api_data_frio", "api_data_quente", "api_data_304"):
+            entrada = inferencia_sintetica(linhas, servidores, semente)
+            if "inferencia" in casos:
+                compacto = compactar_modelo(modelo, _parametros("parameters_model.yml")["model"]["compacto"])
+                registrar("inferencia", lambda: inferencia(compacto, entrada), linhas)
+            # o relatório usa a predição sintética: não depende do modelo treinado
+            relatorio = JSONStreamDataset(filepath=str(tmp / "report_inference.json"))
+            params = _parametros("parameters_inference.yml")["relatorio"]
+            registrar(
+                "generate_report", lambda: relatorio.save(generate_report(entrada, params)), linhas,
+                "generate_report" in casos,
+            )
+            del entrada
+
+            if precisa("api_data_frio", "api_data_quente", "api_data_304"):
+                app_flask, cliente = _cliente_app(tmp / "report_inference.json")
+                cabecalhos = {"Accept-Encoding": "gzip"}
+
+                def frio():
+                    app_flask.cache = app_flask.CacheRelatorio(str(tmp / "report_inference.json"))
+                    return cliente.get("/api/data", headers=cabecalhos)
+
+                resposta = registrar("api_data_frio", frio, linhas, "api_data_frio" in casos)
+                registrar(
+                    "api_data_quente", lambda: cliente.get("/api/data", headers=cabecalhos), linhas,
+                    "api_data_quente" in casos,
+                )
+                condicional = {**cabecalhos, "If-None-Match": resposta.headers["ETag"]}
+                registrar(
+                    "api_data_304", lambda: cliente.get("/api/data", headers=condicional), linhas,
+                    "api_data_304" in casos,
+                )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return resultados
+
+
+def _rodar_filho(codigo: str, *opcoes: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *opcoes, "-c", _FILHO.format(codigo=codigo)],
+        capture_output=True, text=True, cwd=PROJETO, check=True,
+    )
+
+
+def maiores_importacoes(saida_importtime: str, n: int = 10) -> List[Dict[str, Any]]:
+    """Pacotes de primeiro nível que mais custaram no ``-X importtime``:
+    tempo próprio de cada módulo somado no pacote (``pandas.core.frame`` conta
+    para ``pandas``), só do que veio depois da partida do interpretador."""
+    pacotes: Dict[str, int] = {}
+    _, _, depois = saida_importtime.partition("# inicio\n")
+    for linha in depois.splitlines():
+        partes = linha.split("|")
+        proprio = partes[0].removeprefix("import time:").strip()
+        if len(partes) != 3 or not proprio.isdigit():
+            continue
+        pacote = partes[2].strip().split(".")[0]
+        pacotes[pacote] = pacotes.get(pacote, 0) + int(proprio)
+    maiores = sorted(pacotes.items(), key=lambda item: -item[1])[:n]
+    return [{"pacote": nome, "segundos": micro / 1e6} for nome, micro in maiores]
+
+
+def rodar_partida(casos: List[str], repeticoes: int) -> List[Dict[str, Any]]:
+    resultados = []
+    if casos:
+        print("partida (processo novo por repetição)", flush=True)
+    for caso in casos:
+        medidas = [json.loads(_rodar_filho(CASOS_PARTIDA[caso]).stdout.splitlines()[-1]) for _ in range(repeticoes)]
+        importtime = _rodar_filho(CASOS_PARTIDA[caso], "-X", "importtime").stderr
+        resultado = {
+            "escala": "partida",
+            "caso": caso,
+            "linhas": None,
+            "tempo_segundos": min(m["tempo"] for m in medidas),
+            "tempos": [m["tempo"] for m in medidas],
+            "memoria_pico_bytes": medidas[0]["pico"] or 0,
+            "sklearn_importado": medidas[0]["sklearn"],
+            "maiores_importacoes": maiores_importacoes(importtime),
+        }
+        resultados.append(resultado)
+        print(f"  {caso:<18} {'':>12}         {resultado['tempo_segundos']:>9.3f} s  "
+              f"{resultado['memoria_pico_bytes'] / 2**20:>9.1f} MiB  sklearn={resultado['sklearn_importado']}", flush=True)
+    return resultados
+
+
+def _ambiente() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=PROJETO, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "versoes": {p: metadata.version(p) for p in ("numpy", "pandas", "pyarrow", "scikit-learn", "flask", "kedro")},
+        "memoria": "VmHWM" if zerar_pico_rss() else "ru_maxrss",
+    }
+
+
+def comparar(atual: Dict[str, Any], base: Dict[str, Any], limites: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Casos que pioraram além da tolerância de ``limites`` em relação a ``base``.
+
+    Só compara o que existe nas duas execuções (mesma escala e caso);
+    diferenças absolutas abaixo de ``tempo_minimo_segundos`` /
+    ``memoria_minima_bytes`` são tratadas como ruído.
+    """
+    referencia = {(r["escala"], r["caso"]): r for r in base["resultados"]}
+    minimos = {"tempo": limites.get("tempo_minimo_segundos", 0.0), "memoria": limites.get("memoria_minima_bytes", 0)}
+    regressoes = []
+    for r in atual["resultados"]:
+        b = referencia.get((r["escala"], r["caso"]))
+        if b is None:
+            continue
+        tolerancia = {**limites.get("padrao", {}), **(limites.get("casos") or {}).get(r["caso"], {})}
+        for metrica, chave in (("tempo", "tempo_segundos"), ("memoria", "memoria_pico_bytes")):
+            if metrica not in tolerancia:
+                continue
+            teto = b[chave] * (1 + tolerancia[metrica])
+            if r[chave] > teto and r[chave] - b[chave] > minimos[metrica]:
+                regressoes.append({
+                    "escala": r["escala"], "caso": r["caso"], "metrica": metrica,
+                    "baseline": b[chave], "atual": r[chave], "tolerancia": tolerancia[metrica],
+                })
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--escalas", nargs="+", choices=list(ESCALAS), default=["pequena", "media"])
+    parser.add_argument("--casos", nargs="+", choices=CASOS + list(CASOS_PARTIDA), default=CASOS + list(CASOS_PARTIDA))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--comparar", type=Path, help="resultado de referência (padrão: resultados/baseline.json)")
+    parser.add_argument("--limites", type=Path, default=AQUI / "limites.yml")
+    parser.add_argument("--salvar-baseline", action="store_true", help="grava esta execução como baseline.json")
+    args = parser.parse_args(argv)
+
+    execucao = {
+        "inicio": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "ambiente": _ambiente(),
+        "parametros": {"escalas": args.escalas, "casos": args.casos, "repeticoes": args.repeticoes, "semente": args.semente},
+        "resultados": [],
+    }
+    if any(c in CASOS for c in args.casos):
+        for escala in args.escalas:
+            execucao["resultados"] += rodar_escala(escala, args.casos, args.repeticoes, args.semente)
+    execucao["resultados"] += rodar_partida([c for c in args.casos if c in CASOS_PARTIDA], args.repeticoes)
+
+    RESULTADOS.mkdir(parents=True, exist_ok=True)
+    arquivo = RESULTADOS / f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}.json"
+    arquivo.write_text(json.dumps(execucao, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"resultados em {arquivo}")
+
+    referencia = args.comparar or (BASELINE if BASELINE.exists() else None)
+    codigo = 0
+    if referencia is not None and not args.salvar_baseline:
+        base = json.loads(Path(referencia).read_text(encoding="utf-8"))
+        with open(args.limites, encoding="utf-8") as f:
+            limites = yaml.safe_load(f)
+        regressoes = comparar(execucao, base, limites)
+        print(f"comparado com {referencia} (commit {base['ambiente'].get('commit')})")
+        for r in regressoes:
+            print(f"  REGRESSÃO {r['escala']}/{r['caso']} {r['metrica']}: "
+                  f"{r['baseline']:.4g} -> {r['atual']:.4g} (tolerância {r['tolerancia']:.0%})")
+        if not regressoes:
+            print("  sem regressões")
+        codigo = 1 if regressoes else 0
+
+    if args.salvar_baseline:
+        shutil.copyfile(arquivo, BASELINE)
+        print(f"baseline atualizado: {BASELINE}")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
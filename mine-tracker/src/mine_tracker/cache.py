@@ -0,0 +1,263 @@
+"""
+Cache de resultados de nodes, endereçado por conteúdo.
+
+Um node envolvido por :func:`cacheado` tem a chave calculada a partir de:
+
+- cada entrada: o próprio valor (DataFrames, arrays, modelos, ``params:``...)
+  ou, para datasets passados sem carregar (``@arrow`` com ``lazy: true``),
+  o conteúdo dos arquivos dele (o catálogo regrava a saída a cada run, então
+  ``mtime`` não serve);
+- o código fonte de todos os ``.py`` do pacote do node (ex.: mudar
+  ``pipelines/model/busca.py`` invalida os nodes de ``model``, mas mexer só em
+  ``pipelines/inference`` não invalida nada de ``mine``/``model``);
+- as versões de Python, pandas, numpy, pyarrow e scikit-learn.
+
+Com a mesma chave a saída gravada é devolvida sem rodar o node; o catálogo
+continua salvando-a normalmente. As entradas ficam em
+``<diretorio>/<node>-<chave>.pkl`` e, passando de ``max_bytes``, as de uso
+mais antigo saem primeiro.
+
+Desligado por padrão: ``CacheNodesHooks`` liga a partir de ``cache_nodes`` em
+``conf/base/parameters.yml`` (ex.: ``kedro run --params cache_nodes.ativo=true``).
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import sys
+import tempfile
+import threading
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from joblib.hashing import NumpyHasher
+from kedro.framework.hooks import hook_impl
+from kedro.io import AbstractDataset
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES_PADRAO = 2 * 1024 ** 3
+_PACOTES_VERSIONADOS = ("pandas", "numpy", "pyarrow", "scikit-learn")
+
+
+def _versoes() -> Dict[str, Optional[str]]:
+    versoes = {"python": sys.version.split()[0]}
+    for pacote in _PACOTES_VERSIONADOS:
+        try:
+            versoes[pacote] = metadata.version(pacote)
+        except metadata.PackageNotFoundError:
+            versoes[pacote] = None
+    return versoes
+
+
+class _Hasher(NumpyHasher):
+    """``joblib.hash`` que ignora o padding de arrays estruturados.
+
+    Os nós das árvores do sklearn (``Tree.nodes``) são um array estruturado
+    com bytes de padding não inicializados: a mesma floresta, copiada ou
+    recarregada, teria outro hash. Cada campo é hasheado separado.
+    """
+
+    def save(self, obj):
+        if isinstance(obj, np.ndarray) and obj.dtype.names:
+            obj = ("__estruturado__", obj.dtype.descr, [np.ascontiguousarray(obj[c]) for c in obj.dtype.names])
+        NumpyHasher.save(self, obj)
+
+
+def impressao(obj: Any) -> str:
+    """Hash md5 estável de ``obj`` (como ``joblib.hash``, ver :class:`_Hasher`)."""
+    return _Hasher(hash_name="md5").hash(obj)
+
+
+@functools.lru_cache(maxsize=None)
+def _codigo_do_pacote(diretorio: str) -> str:
+    """Hash dos ``.py`` do diretório do módulo do node (lido uma vez por processo)."""
+    arquivos = sorted(Path(diretorio).glob("*.py"))
+    return impressao([(p.name, p.read_bytes()) for p in arquivos])
+
+
+def _hash_arquivo(caminho: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _impressao_arquivos(arquivos: List[Path]) -> List[Tuple[str, str]]:
+    return [(str(p), _hash_arquivo(p)) for p in sorted(arquivos)]
+
+
+def _arquivos_do_dataset(valor: Any) -> Optional[List[Tuple[str, str]]]:
+    """Caminho e hash do conteúdo dos arquivos por trás de uma entrada que não é
+    dado carregado: um dataset do Kedro local ou um ``pyarrow.dataset``
+    (``lazy: true``). ``None`` se não dá para saber de onde os dados vêm."""
+    if isinstance(valor, AbstractDataset):
+        interno = getattr(valor, "_dataset", None)
+        valor = interno if isinstance(interno, AbstractDataset) else valor  # CachedDataset
+        caminho = getattr(valor, "_filepath", None) or getattr(valor, "_path", None)
+        if caminho is None or getattr(valor, "_protocol", "file") not in ("file", None):
+            return None
+        caminho = Path(str(caminho))
+        return _impressao_arquivos([caminho] if caminho.is_file() else [p for p in caminho.rglob("*") if p.is_file()])
+    # pyarrow.dataset.FileSystemDataset, só em disco local
+    if type(getattr(valor, "filesystem", None)).__name__ == "LocalFileSystem":
+        return _impressao_arquivos([Path(f) for f in valor.files])
+    return None
+
+
+def _eh_dataset(valor: Any) -> bool:
+    return isinstance(valor, AbstractDataset) or type(valor).__module__.startswith("pyarrow._dataset")
+
+
+class CacheNodes:
+    """Armazena saídas de nodes em ``diretorio``, limitado a ``max_bytes``."""
+
+    def __init__(self, diretorio: str, max_bytes: int = MAX_BYTES_PADRAO):
+        self.diretorio = Path(diretorio)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._versoes = _versoes()
+
+    def chave(self, func: Callable, args: tuple, kwargs: Dict[str, Any]) -> Optional[str]:
+        """Impressão digital da chamada; ``None`` se alguma entrada não dá para
+        identificar (dataset remoto, objeto que não serializa) e o node roda sem cache."""
+        entradas = []
+        for valor in list(args) + [kwargs[k] for k in sorted(kwargs)]:
+            if _eh_dataset(valor):
+                valor = _arquivos_do_dataset(valor)
+                if valor is None:
+                    return None
+            entradas.append(valor)
+        modulo = sys.modules[func.__module__]
+        try:
+            return impressao([
+                func.__qualname__,
+                _codigo_do_pacote(os.path.dirname(inspect.getfile(modulo))),
+                self._versoes,
+                sorted(kwargs),
+                entradas,
+            ])
+        except Exception as exc:  # objetos que não serializam
+            logger.warning("Cache de nodes: %s sem cache (%s)", func.__name__, exc)
+            return None
+
+    def _arquivo(self, nome: str, chave: str) -> Path:
+        return self.diretorio / f"{nome}-{chave}.pkl"
+
+    def ler(self, nome: str, chave: str) -> Tuple[bool, Any]:
+        arquivo = self._arquivo(nome, chave)
+        try:
+            saida = joblib.load(arquivo)
+        except FileNotFoundError:
+            return False, None
+        except Exception as exc:  # gravação interrompida, pickle de outra versão...
+            logger.warning("Cache de nodes: descartando %s (%s)", arquivo.name, exc)
+            arquivo.unlink(missing_ok=True)
+            return False, None
+        os.utime(arquivo)  # marca o uso para o despejo
+        return True, saida
+
+    def gravar(self, nome: str, chave: str, saida: Any) -> None:
+        destino = self._arquivo(nome, chave)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.diretorio, prefix=f".{destino.name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(saida, tmp)
+            if os.path.getsize(tmp) > self.max_bytes:
+                logger.info("Cache de nodes: saída de %s maior que max_bytes, não guardada", nome)
+                os.remove(tmp)
+                return
+            os.replace(tmp, destino)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.despejar()
+
+    def despejar(self) -> List[str]:
+        """Remove as entradas de uso mais antigo até caber em ``max_bytes``."""
+        with self._lock:
+            entradas = []
+            for p in self.diretorio.glob("*.pkl"):
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((st.st_mtime_ns, st.st_size, p))
+            entradas.sort()
+            total = sum(tamanho for _, tamanho, _ in entradas)
+            removidas = []
+            for _, tamanho, p in entradas:
+                if total <= self.max_bytes:
+                    break
+                p.unlink(missing_ok=True)
+                total -= tamanho
+                removidas.append(p.name)
+        if removidas:
+            logger.info("Cache de nodes: %d entrada(s) antiga(s) removida(s)", len(removidas))
+        return removidas
+
+
+_cache: Optional[CacheNodes] = None
+
+
+def configurar(diretorio: Optional[str], max_bytes: int = MAX_BYTES_PADRAO) -> Optional[CacheNodes]:
+    """Liga o cache em ``diretorio`` (``None`` desliga) para os nodes :func:`cacheado`."""
+    global _cache
+    _cache = CacheNodes(diretorio, max_bytes) if diretorio is not None else None
+    return _cache
+
+
+def cacheado(func: Callable) -> Callable:
+    """Envolve a função de um node para reaproveitar a saída de uma chamada
+    com as mesmas entradas e o mesmo código (ver o docstring do módulo).
+    Sem cache configurado chama a função direto."""
+    if inspect.isgeneratorfunction(func):
+        raise TypeError(f"{func.__name__}: nodes geradores não podem usar o cache de nodes")
+
+    @functools.wraps(func)
+    def envoltorio(*args, **kwargs):
+        cache = _cache
+        if cache is None:
+            return func(*args, **kwargs)
+        chave = cache.chave(func, args, kwargs)
+        if chave is None:
+            return func(*args, **kwargs)
+        achou, saida = cache.ler(func.__name__, chave)
+        if achou:
+            logger.info("Cache de nodes: %s reaproveitado (%s)", func.__name__, chave[:12])
+            return saida
+        saida = func(*args, **kwargs)
+        cache.gravar(func.__name__, chave, saida)
+        return saida
+
+    return envoltorio
+
+
+class CacheNodesHooks:
+    """Liga/desliga o cache de nodes conforme ``cache_nodes`` nos parâmetros.
+
+    Lê a configuração crua (sem ``context.params``) para não forçar a carga
+    de todos os pipelines na validação de parâmetros.
+    """
+
+    @hook_impl
+    def after_context_created(self, context) -> None:
+        try:
+            config = context.config_loader["parameters"].get("cache_nodes") or {}
+        except Exception:
+            config = {}
+        if not config.get("ativo", False):
+            configurar(None)
+            return
+        diretorio = Path(context.project_path) / config.get("diretorio", "data/09_cache_nodes")
+        cache = configurar(str(diretorio), config.get("max_bytes", MAX_BYTES_PADRAO))
+        logger.info("Cache de nodes ativo em %s (até %.1f GiB)", diretorio, cache.max_bytes / 1024 ** 3)
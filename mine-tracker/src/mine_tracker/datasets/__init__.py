@@ -0,0 +1,17 @@
+"""Datasets customizados do projeto (referenciados no catálogo como
+``mine_tracker.datasets.<Classe>``)."""
+
+from .arquivo_incremental import ArquivoIncrementalDataset
+from .json_stream import JSONStreamDataset
+from .modelo_compacto import ModeloCompacto, ModeloCompactoDataset
+from .parquet_particionado import ParquetParticionadoDataset
+from .particoes import ParticoesDataset
+
+__all__ = [
+    "ArquivoIncrementalDataset",
+    "JSONStreamDataset",
+    "ModeloCompacto",
+    "ModeloCompactoDataset",
+    "ParquetParticionadoDataset",
+    "ParticoesDataset",
+]
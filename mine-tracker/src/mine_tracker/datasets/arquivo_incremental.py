@@ -0,0 +1,82 @@
+"""
+Dataset de saída gravado aos pedaços, para nodes geradores.
+
+Quando um node é uma função geradora, o Kedro chama ``save`` uma vez para
+cada pedaço produzido. Aqui o primeiro ``save`` de uma execução limpa o
+destino e os seguintes acrescentam, na ordem em que chegam, sem nunca
+juntar a saída inteira em memória.
+"""
+from __future__ import annotations
+
+import shutil
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from kedro.io import AbstractDataset, DatasetError
+
+
+class ArquivoIncrementalDataset(AbstractDataset[pd.DataFrame, pd.DataFrame]):
+    """Grava ``DataFrame`` em pedaços, em Parquet ou CSV.
+
+    Exemplo de catálogo::
+
+        output_inference_lotes:
+          type: mine_tracker.datasets.ArquivoIncrementalDataset
+          filepath: data/07_model_output/inferencia_lotes
+          formato: parquet
+
+    - ``formato: parquet``: ``filepath`` é um diretório com um arquivo por
+      pedaço (``parte-00000.parquet``, ...), lido de volta em ordem de nome;
+      para saídas grandes leia com ``ParquetParticionadoDataset`` e ``lazy: true``.
+    - ``formato: csv``: um único arquivo, com cabeçalho só no primeiro pedaço.
+    """
+
+    def __init__(
+        self,
+        *,
+        filepath: str,
+        formato: str = "parquet",
+        save_args: Optional[Dict[str, Any]] = None,
+        load_args: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if formato not in ("parquet", "csv"):
+            raise DatasetError(f"formato inválido: {formato!r} (use 'parquet' ou 'csv')")
+        self._filepath = Path(filepath)
+        self._formato = formato
+        self._save_args = deepcopy(save_args or {})
+        self._load_args = deepcopy(load_args or {})
+        self._partes = 0  # pedaços gravados nesta execução
+        self.metadata = metadata
+
+    def _describe(self) -> Dict[str, Any]:
+        return {"filepath": str(self._filepath), "formato": self._formato, "partes": self._partes}
+
+    def _limpar(self) -> None:
+        if self._filepath.is_dir():
+            shutil.rmtree(self._filepath)
+        elif self._filepath.exists():
+            self._filepath.unlink()
+
+    def save(self, data: pd.DataFrame) -> None:
+        if self._partes == 0:
+            self._limpar()
+        if self._formato == "parquet":
+            self._filepath.mkdir(parents=True, exist_ok=True)
+            data.to_parquet(self._filepath / f"parte-{self._partes:05d}.parquet", index=False, **self._save_args)
+        else:
+            self._filepath.parent.mkdir(parents=True, exist_ok=True)
+            data.to_csv(
+                self._filepath, mode="a", header=self._partes == 0, index=False, **self._save_args
+            )
+        self._partes += 1
+
+    def load(self) -> pd.DataFrame:
+        if self._formato == "parquet":
+            return pd.read_parquet(self._filepath, **self._load_args)
+        return pd.read_csv(self._filepath, **self._load_args)
+
+    def _exists(self) -> bool:
+        return self._filepath.exists()
@@ -0,0 +1,103 @@
+"""
+JSON gravado em fluxo: listas produzidas por geradores vão para o disco
+item a item, sem montar o documento inteiro em memória.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from collections.abc import Iterator
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Dict, Optional, TextIO
+
+from kedro.io import AbstractDataset
+
+
+class JSONStreamDataset(AbstractDataset[Dict[str, Any], Dict[str, Any]]):
+    """Grava um dicionário JSON cujos valores podem ser iteradores.
+
+    Exemplo de catálogo::
+
+        report_inference:
+          type: mine_tracker.datasets.JSONStreamDataset
+          filepath: data/08_reporting/report_inference.json
+          save_args:
+            indent: 2
+            ensure_ascii: false
+
+    Valores comuns são serializados como no ``json.JSONDataset``; um valor
+    que seja iterador (ex.: gerador de clusters) vira uma lista escrita um
+    elemento por vez. Com os mesmos ``save_args`` o arquivo sai byte a byte
+    igual ao ``json.dump`` do dicionário com as listas materializadas. A
+    escrita vai para um temporário e troca de nome no fim, então quem lê o
+    arquivo nunca vê um JSON pela metade.
+    """
+
+    DEFAULT_SAVE_ARGS: Dict[str, Any] = {"indent": 2, "ensure_ascii": False}
+
+    def __init__(
+        self,
+        *,
+        filepath: str,
+        save_args: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self._filepath = Path(filepath)
+        self._save_args = {**self.DEFAULT_SAVE_ARGS, **deepcopy(save_args or {})}
+        self.metadata = metadata
+
+    def _describe(self) -> Dict[str, Any]:
+        return {"filepath": str(self._filepath), "save_args": self._save_args}
+
+    def load(self) -> Dict[str, Any]:
+        with open(self._filepath, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, data: Dict[str, Any]) -> None:
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self._filepath.parent, prefix=f".{self._filepath.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                self._escrever(f, data)
+            os.replace(tmp, self._filepath)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _dumps(self, valor: Any, nivel: int) -> str:
+        """``json.dumps`` de um valor aninhado em ``nivel`` níveis de indentação."""
+        texto = json.dumps(valor, **self._save_args)
+        indent = self._save_args.get("indent")
+        if not indent:
+            return texto
+        return texto.replace("\n", "\n" + " " * (indent * nivel))
+
+    def _escrever(self, f: TextIO, data: Dict[str, Any]) -> None:
+        indent = self._save_args.get("indent")
+        if not isinstance(data, dict) or not indent:
+            # sem indentação não há ganho em reproduzir o layout; materializa
+            json.dump({k: list(v) if isinstance(v, Iterator) else v for k, v in data.items()}, f, **self._save_args)
+            return
+
+        separador_item = self._save_args.get("separators", (",", ": "))[0]
+        separador_chave = self._save_args.get("separators", (",", ": "))[1]
+        nivel1, nivel2 = " " * indent, " " * (2 * indent)
+        if not data:
+            f.write("{}")
+            return
+        f.write("{")
+        for i, (chave, valor) in enumerate(data.items()):
+            f.write(("" if i == 0 else separador_item) + "\n" + nivel1)
+            f.write(json.dumps(chave, ensure_ascii=self._save_args.get("ensure_ascii", True)) + separador_chave)
+            if not isinstance(valor, Iterator):
+                f.write(self._dumps(valor, 1))
+                continue
+            vazio = True
+            for item in valor:
+                f.write(("[" if vazio else separador_item) + "\n" + nivel2 + self._dumps(item, 2))
+                vazio = False
+            f.write("[]" if vazio else "\n" + nivel1 + "]")
+        f.write("\n}")
@@ -0,0 +1,293 @@
+"""
+Formato compacto do ``best_model`` para inferência.
+
+O ``Pipeline`` do sklearn vira um diretório só com arrays ``.npy`` e um
+``meta.json``:
+
+- pré-processamento: valores de preenchimento do imputer e, se houver,
+  média/escala do scaler, por coluna;
+- RandomForest/DecisionTree: todas as árvores achatadas em arrays únicos
+  (``feature``, ``limiar``, ``valor`` por nó e ``filhos`` com esquerda/direita
+  intercalados) com a raiz de cada uma em ``raizes``;
+- LinearRegression: ``coef`` e ``intercept``.
+
+Os arrays podem ser abertos com ``mmap_mode="r"``: carregar é só abrir os
+arquivos, e processos que leem o mesmo modelo compartilham as páginas.
+A predição desce todas as árvores ao mesmo tempo, vetorizada em numpy.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from kedro.io import AbstractDataset, DatasetError
+
+from .parquet_particionado import _trocar
+
+_FOLHA = -1
+# pares (linha, árvore) descidos de uma vez; limita a memória de predições grandes
+_PARES_POR_BLOCO = 1 << 22
+
+
+def _extrair_prep(prep) -> Dict[str, Any]:
+    """Colunas e parâmetros do ``ColumnTransformer`` (imputer e scaler opcional)."""
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    ativos = [(nome, t, cols) for nome, t, cols in prep.transformers_ if t != "drop" and nome != "remainder"]
+    if len(ativos) != 1:
+        raise ValueError("Formato compacto suporta um único transformer numérico no 'prep'.")
+    _, transformador, colunas = ativos[0]
+    passos = [p for _, p in transformador.steps] if isinstance(transformador, Pipeline) else [transformador]
+
+    resultado: Dict[str, Any] = {"colunas": list(colunas), "preenchimento": None, "media": None, "escala": None}
+    for passo in passos:
+        if isinstance(passo, SimpleImputer):
+            resultado["preenchimento"] = np.asarray(passo.statistics_, dtype=np.float64)
+        elif isinstance(passo, StandardScaler):
+            if passo.mean_ is not None:
+                resultado["media"] = np.asarray(passo.mean_, dtype=np.float64)
+            if passo.scale_ is not None:
+                resultado["escala"] = np.asarray(passo.scale_, dtype=np.float64)
+        else:
+            raise ValueError(f"Passo de pré-processamento sem suporte no formato compacto: {type(passo).__name__}")
+    return resultado
+
+
+def _achatar_arvore(arvore, profundidade_max: Optional[int]) -> Dict[str, np.ndarray]:
+    """Nós alcançáveis até ``profundidade_max`` em ordem de largura, com os
+    filhos renumerados; nós no limite viram folhas com o valor médio do nó."""
+    esq, dir_ = arvore.children_left, arvore.children_right
+    ordem, profundidades, expandido = [0], [0], []
+    i = 0
+    while i < len(ordem):
+        no, prof = ordem[i], profundidades[i]
+        expande = esq[no] != _FOLHA and (profundidade_max is None or prof < profundidade_max)
+        expandido.append(expande)
+        if expande:
+            ordem += [esq[no], dir_[no]]
+            profundidades += [prof + 1, prof + 1]
+        i += 1
+
+    ordem = np.asarray(ordem, dtype=np.int64)
+    folha = ~np.asarray(expandido, dtype=bool)
+    novo = np.zeros(arvore.node_count, dtype=np.int64)
+    novo[ordem] = np.arange(len(ordem))
+    esquerda = np.where(folha, _FOLHA, novo[np.where(folha, 0, esq[ordem])])
+    direita = np.where(folha, _FOLHA, novo[np.where(folha, 0, dir_[ordem])])
+    return {
+        "feature": np.where(folha, _FOLHA, arvore.feature[ordem]).astype(np.int32),
+        "limiar": arvore.threshold[ordem].astype(np.float64),
+        "esquerda": esquerda,
+        "direita": direita,
+        "valor": arvore.value[ordem, 0, 0].astype(np.float64),
+        "profundidade": int(max(profundidades)),
+    }
+
+
+class ModeloCompacto:
+    """Modelo de inferência só com arrays; ``predict(df)`` como o ``Pipeline`` original."""
+
+    def __init__(self, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.meta = meta
+        self.arrays = arrays
+        # marcas d'água do treino (ver atualizar_modelo_incremental)
+        self.servidor_escolhido_ = meta.get("servidor_escolhido")
+        self.ultimo_dia_ = meta.get("ultimo_dia")
+        self._origem: Optional[str] = None  # diretório de onde foi mapeado, se veio de mmap
+
+    def __reduce_ex__(self, protocolo):
+        # mapeado do disco: vai para outros processos só como caminho e é
+        # mapeado de novo lá, compartilhando as mesmas páginas
+        if self._origem is not None:
+            return (ModeloCompacto.carregar, (self._origem, True))
+        return super().__reduce_ex__(protocolo)
+
+    @classmethod
+    def de_pipeline(
+        cls,
+        modelo,
+        profundidade_max: Optional[int] = None,
+        max_arvores: Optional[int] = None,
+    ) -> "ModeloCompacto":
+        """Converte um ``Pipeline(prep, est)`` treinado. ``profundidade_max`` e
+        ``max_arvores`` podam a floresta (troca precisão por tamanho/latência)."""
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.linear_model import LinearRegression
+        from sklearn.tree import DecisionTreeRegressor
+
+        prep = _extrair_prep(modelo.named_steps["prep"])
+        est = modelo.named_steps["est"]
+        meta: Dict[str, Any] = {
+            "colunas": prep["colunas"],
+            "estimador": type(est).__name__,
+            "servidor_escolhido": getattr(modelo, "servidor_escolhido_", None),
+            "ultimo_dia": getattr(modelo, "ultimo_dia_", None),
+        }
+        arrays = {k: prep[k] for k in ("preenchimento", "media", "escala") if prep[k] is not None}
+
+        if isinstance(est, (RandomForestRegressor, DecisionTreeRegressor)):
+            arvores = est.estimators_ if isinstance(est, RandomForestRegressor) else [est]
+            arvores = arvores[:max_arvores] if max_arvores else arvores
+            partes = [_achatar_arvore(a.tree_, profundidade_max) for a in arvores]
+            tamanhos = np.array([len(p["feature"]) for p in partes])
+            deslocamento = np.concatenate([[0], np.cumsum(tamanhos)[:-1]])
+            for chave in ("feature", "limiar", "valor"):
+                arrays[chave] = np.concatenate([p[chave] for p in partes])
+            filhos = [
+                np.stack([np.where(p[lado] == _FOLHA, _FOLHA, p[lado] + d) for lado in ("esquerda", "direita")], axis=1)
+                for p, d in zip(partes, deslocamento)
+            ]
+            arrays["filhos"] = np.concatenate(filhos).astype(np.int32).ravel()
+            arrays["raizes"] = deslocamento.astype(np.int32)
+            meta.update({
+                "tipo": "floresta",
+                "arvores": len(partes),
+                "nos": int(tamanhos.sum()),
+                "profundidade": max(p["profundidade"] for p in partes),
+                "profundidade_max": profundidade_max,
+            })
+        elif isinstance(est, LinearRegression):
+            arrays["coef"] = np.asarray(est.coef_, dtype=np.float64).ravel()
+            arrays["intercept"] = np.asarray([est.intercept_], dtype=np.float64).ravel()
+            meta["tipo"] = "linear"
+        else:
+            raise ValueError(f"Estimador sem suporte no formato compacto: {type(est).__name__}")
+        return cls(meta, arrays)
+
+    # ---------- predição ----------
+    def _preparar(self, df: pd.DataFrame) -> np.ndarray:
+        X = df[self.meta["colunas"]].to_numpy(dtype=np.float64, copy=True)
+        if "preenchimento" in self.arrays:
+            nulos = np.isnan(X)
+            if nulos.any():
+                X[nulos] = np.take(self.arrays["preenchimento"], np.nonzero(nulos)[1])
+        if "media" in self.arrays:
+            X -= self.arrays["media"]
+        if "escala" in self.arrays:
+            X /= self.arrays["escala"]
+        return X
+
+    def _prever_floresta(self, X: np.ndarray) -> np.ndarray:
+        a = self.arrays
+        # o sklearn compara em float32 (X) contra limiares float64
+        X = X.astype(np.float32).ravel()
+        n, n_arvores, n_colunas = len(X) // len(self.meta["colunas"]), len(a["raizes"]), len(self.meta["colunas"])
+        feature, limiar, filhos = a["feature"], a["limiar"], a["filhos"]
+        nos = np.tile(np.asarray(a["raizes"], dtype=np.int64), n)
+
+        # desce todos os pares (linha, árvore) juntos; os que chegam à folha saem do lote
+        ativos = np.nonzero(feature[nos] != _FOLHA)[0]
+        base = (ativos // n_arvores) * n_colunas  # início da linha de cada par em X achatado
+        while len(ativos):
+            atual = nos[ativos]
+            f = feature[atual]
+            # filhos[2*no] é o da esquerda, filhos[2*no + 1] o da direita
+            prox = filhos[2 * atual + (X[base + f] > limiar[atual])]
+            nos[ativos] = prox
+            continua = feature[prox] != _FOLHA
+            ativos, base = ativos[continua], base[continua]
+
+        valores = np.asarray(a["valor"])[nos].reshape(n, n_arvores)
+        # soma árvore a árvore, na mesma ordem do RandomForestRegressor.predict
+        soma = np.zeros(n, dtype=np.float64)
+        for t in range(n_arvores):
+            soma += valores[:, t]
+        return soma / n_arvores
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        X = self._preparar(df)
+        if self.meta["tipo"] == "linear":
+            return X @ self.arrays["coef"] + self.arrays["intercept"][0]
+        # linhas são independentes: em blocos, a memória não cresce com len(df)
+        passo = max(1, _PARES_POR_BLOCO // len(self.arrays["raizes"]))
+        if len(X) <= passo:
+            return self._prever_floresta(X)
+        return np.concatenate([self._prever_floresta(X[i:i + passo]) for i in range(0, len(X), passo)])
+
+    # ---------- disco ----------
+    def salvar(self, diretorio: str) -> None:
+        """Grava num diretório irmão e troca de nome no fim: quem está lendo
+        (ou com os arrays mapeados) nunca vê um modelo pela metade, e as
+        páginas mapeadas do modelo antigo continuam válidas até serem soltas."""
+        destino = Path(diretorio)
+        temporario = destino.with_name(f".{destino.name}.tmp-{uuid.uuid4().hex[:8]}")
+        temporario.mkdir(parents=True)
+        try:
+            for nome, array in self.arrays.items():
+                np.save(temporario / f"{nome}.npy", np.ascontiguousarray(array))
+            with open(temporario / "meta.json", "w", encoding="utf-8") as f:
+                json.dump({**self.meta, "arrays": sorted(self.arrays)}, f, ensure_ascii=False, indent=2)
+            _trocar(temporario, destino)
+        finally:
+            if temporario.exists():
+                shutil.rmtree(temporario, ignore_errors=True)
+
+    @classmethod
+    def carregar(cls, diretorio: str, mmap: bool = True) -> "ModeloCompacto":
+        origem = Path(diretorio)
+        with open(origem / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {
+            nome: np.load(origem / f"{nome}.npy", mmap_mode="r" if mmap else None)
+            for nome in meta.pop("arrays")
+        }
+        modelo = cls(meta, arrays)
+        if mmap:
+            modelo._origem = str(origem)
+        return modelo
+
+    def tamanho_bytes(self) -> int:
+        return int(sum(np.asarray(a).nbytes for a in self.arrays.values()))
+
+    @property
+    def mapeado(self) -> bool:
+        """``True`` se os arrays vêm de ``mmap`` (páginas compartilháveis entre processos)."""
+        return any(isinstance(a, np.memmap) for a in self.arrays.values())
+
+    def aquecer(self) -> None:
+        """Lê uma vez cada página dos arrays mapeados, para que o processo que
+        pré-carrega o modelo deixe tudo no cache de páginas antes do fork."""
+        for array in self.arrays.values():
+            if isinstance(array, np.memmap) and array.nbytes:
+                np.asarray(array).reshape(-1).view(np.uint8)[::4096].sum()
+
+
+class ModeloCompactoDataset(AbstractDataset[ModeloCompacto, ModeloCompacto]):
+    """Lê/grava um :class:`ModeloCompacto` num diretório de ``.npy``.
+
+    Exemplo de catálogo::
+
+        best_model_compacto:
+          type: mine_tracker.datasets.ModeloCompactoDataset
+          filepath: data/06_models/best_model_compacto
+          mmap: true
+
+    Com ``mmap: true`` (padrão) os arrays são mapeados em memória, sem cópia.
+    """
+
+    def __init__(self, *, filepath: str, mmap: bool = True, metadata: Optional[Dict[str, Any]] = None) -> None:
+        self._filepath = Path(filepath)
+        self._mmap = mmap
+        self.metadata = metadata
+
+    def _describe(self) -> Dict[str, Any]:
+        return {"filepath": str(self._filepath), "mmap": self._mmap}
+
+    def load(self) -> ModeloCompacto:
+        if not (self._filepath / "meta.json").exists():
+            raise DatasetError(f"Modelo compacto não encontrado em {self._filepath}")
+        return ModeloCompacto.carregar(str(self._filepath), mmap=self._mmap)
+
+    def save(self, data: ModeloCompacto) -> None:
+        data.salvar(str(self._filepath))
+
+    def _exists(self) -> bool:
+        return (self._filepath / "meta.json").exists()
+
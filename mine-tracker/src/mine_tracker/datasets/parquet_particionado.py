@@ -0,0 +1,254 @@
+"""
+Dataset Parquet particionado (layout hive, ex.: ``data=2022-09-02/``) com
+leitura preguiçosa para empurrar filtros de coluna e de linha até o disco.
+
+O esquema completo da tabela gravada (com as colunas de partição, que saem
+dos arquivos e viram nome de diretório) fica em ``_common_metadata``; na
+leitura as colunas de partição voltam com o tipo e a posição originais em
+vez de texto no fim da tabela.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import uuid
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+from kedro.io import AbstractDataset, DatasetError
+
+
+class ParquetParticionadoDataset(AbstractDataset[Union[pd.DataFrame, Dict[str, Any]], Any]):
+    """Lê/grava uma tabela Parquet, opcionalmente particionada por colunas.
+
+    Exemplo de catálogo::
+
+        minecraft_servidores_features@pandas:
+          type: mine_tracker.datasets.ParquetParticionadoDataset
+          filepath: data/04_feature/minecraft_servidores_features
+          partition_cols: [data]
+
+        minecraft_servidores_features@arrow:
+          type: mine_tracker.datasets.ParquetParticionadoDataset
+          filepath: data/04_feature/minecraft_servidores_features
+          lazy: true
+
+    - ``lazy: false`` (padrão): ``load`` devolve um ``DataFrame``; ``load_args``
+      aceita ``columns`` e ``filters`` (formato do ``pyarrow``), lidos só do
+      que for necessário nos arquivos.
+    - ``lazy: true``: ``load`` devolve um ``pyarrow.dataset.Dataset``, que o
+      node consulta com ``to_table(columns=..., filter=...)`` quando o filtro
+      depende dos dados (ex.: o servidor escolhido no pipeline 'model').
+
+    ``save`` aceita um ``DataFrame`` ou um dicionário ``{chave: DataFrame}``
+    (valores podem ser funções, chamadas uma a uma em ordem de chave, como no
+    ``PartitionedDataset``). Com ``save_args.modo: sobrescrever`` (padrão) a
+    tabela inteira é substituída: a nova é gravada num diretório irmão e só
+    entra no lugar da antiga depois de gravada por completo, então uma falha
+    no meio (ou um ``DataFrame`` vazio, sem colunas ou sem as colunas de
+    partição, rejeitado antes de tocar o disco) mantém a tabela anterior. Com
+    ``modo: particoes`` só as partições presentes nos dados gravados são
+    trocadas, o resto fica como está.
+    """
+
+    DEFAULT_SAVE_ARGS: Dict[str, Any] = {"modo": "sobrescrever"}
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        filepath: str,
+        partition_cols: Optional[List[str]] = None,
+        lazy: bool = False,
+        load_args: Optional[Dict[str, Any]] = None,
+        save_args: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self._filepath = Path(filepath)
+        self._partition_cols = list(partition_cols or [])
+        self._lazy = lazy
+        self._load_args = deepcopy(load_args or {})
+        self._save_args = {**self.DEFAULT_SAVE_ARGS, **(save_args or {})}
+        if self._save_args["modo"] not in ("sobrescrever", "particoes"):
+            raise DatasetError(f"save_args.modo inválido: {self._save_args['modo']!r}")
+        self.metadata = metadata
+
+    def _describe(self) -> Dict[str, Any]:
+        return {
+            "filepath": str(self._filepath),
+            "partition_cols": self._partition_cols,
+            "lazy": self._lazy,
+            "load_args": self._load_args,
+            "save_args": self._save_args,
+        }
+
+    def _esquema_salvo(self):
+        arquivo = self._filepath / _METADADOS
+        if not arquivo.is_file():
+            return None
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(arquivo)
+
+    def _dataset(self, esquema=None):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        particionamento = "hive"
+        colunas = _colunas_particao(esquema)
+        if colunas:
+            # partições com o tipo gravado (ex.: data como date32, cluster como int16)
+            particionamento = ds.partitioning(
+                pa.schema([pa.field(c, _tipo_valor(esquema.field(c).type)) for c in colunas]), flavor="hive"
+            )
+        return ds.dataset(str(self._filepath), format="parquet", partitioning=particionamento)
+
+    def load(self):
+        esquema = self._esquema_salvo()
+        dataset = self._dataset(esquema)
+        if self._lazy:
+            return dataset
+        tabela = dataset.to_table(
+            columns=self._load_args.get("columns"),
+            filter=_filtro(self._load_args.get("filters"), dataset.schema),
+        )
+        return _restaurar(tabela, esquema).to_pandas()
+
+    def save(self, data: Union[pd.DataFrame, Dict[str, Union[pd.DataFrame, Callable[[], pd.DataFrame]]]]) -> None:
+        if self._save_args["modo"] == "particoes":
+            for df in self._partes(data):
+                self._gravar(df, self._filepath)
+            return
+
+        temporario = self._filepath.with_name(f".{self._filepath.name}.tmp-{uuid.uuid4().hex[:8]}")
+        try:
+            for df in self._partes(data):
+                self._gravar(df, temporario)
+            if not temporario.exists():
+                raise DatasetError(f"Nenhuma linha para gravar em {self._filepath}; a tabela existente foi mantida")
+            _trocar(temporario, self._filepath)
+        finally:
+            _remover(temporario)
+
+    def _partes(self, data) -> Iterator[pd.DataFrame]:
+        """Os ``DataFrame`` a gravar, na ordem de chave; partes sem linhas ficam de fora."""
+        partes = [data[chave] for chave in sorted(data)] if isinstance(data, dict) else [data]
+        for parte in partes:
+            df = parte() if callable(parte) else parte
+            faltantes = [c for c in self._partition_cols if c not in df.columns]
+            if len(df.columns) == 0 or faltantes:
+                raise DatasetError(
+                    f"DataFrame sem esquema para {self._filepath} (colunas de partição faltantes: {faltantes}); "
+                    "nada foi gravado"
+                )
+            if len(df):
+                yield df
+
+    def _gravar(self, df: pd.DataFrame, destino: Path) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        if not self._partition_cols:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(tabela, str(destino))
+            return
+        destino.mkdir(parents=True, exist_ok=True)
+        metadados = {**(tabela.schema.metadata or {}), _CHAVE_PARTICOES: json.dumps(self._partition_cols).encode()}
+        pq.write_metadata(tabela.schema.with_metadata(metadados), str(destino / _METADADOS))
+        # nomes fixos por partição: regravar um dia troca o arquivo em vez de acumular
+        pq.write_to_dataset(
+            tabela,
+            str(destino),
+            partition_cols=self._partition_cols,
+            existing_data_behavior="delete_matching",
+            basename_template="parte-{i}.parquet",
+        )
+
+    def _exists(self) -> bool:
+        return self._filepath.exists()
+
+
+_METADADOS = "_common_metadata"  # começa com "_": o pyarrow.dataset não lê como dado
+_CHAVE_PARTICOES = b"mine_tracker.partition_cols"
+
+
+def _remover(caminho: Path) -> None:
+    if caminho.is_dir():
+        shutil.rmtree(caminho, ignore_errors=True)
+    elif caminho.exists():
+        caminho.unlink()
+
+
+def _trocar(novo: Path, destino: Path) -> None:
+    """Põe ``novo`` no lugar de ``destino``. Arquivo sobre arquivo é um
+    ``os.replace``; diretórios não se sobrescrevem com rename, então o antigo
+    sai para um nome irmão e é apagado só depois que o novo entrou."""
+    if not destino.exists() or (novo.is_file() and destino.is_file()):
+        os.replace(novo, destino)
+        return
+    antigo = destino.with_name(f".{destino.name}.old-{uuid.uuid4().hex[:8]}")
+    os.replace(destino, antigo)
+    os.replace(novo, destino)
+    _remover(antigo)
+
+
+def _colunas_particao(esquema) -> List[str]:
+    if esquema is None or not esquema.metadata:
+        return []
+    return json.loads(esquema.metadata.get(_CHAVE_PARTICOES, b"[]"))
+
+
+def _tipo_valor(tipo):
+    """Tipo dos valores de uma coluna categórica (dicionário); o próprio tipo nas demais."""
+    import pyarrow as pa
+
+    return tipo.value_type if pa.types.is_dictionary(tipo) else tipo
+
+
+def _restaurar(tabela, esquema):
+    """Colunas de partição de volta ao tipo gravado (categórico inclusive) e
+    todas as colunas na ordem original."""
+    if esquema is None:
+        return tabela
+    import pyarrow.compute as pc
+    import pyarrow.types as tipos
+
+    # o Parquet guarda o dicionário só de texto; os demais vêm da metadata do pandas
+    pandas = json.loads((esquema.metadata or {}).get(b"pandas", b"{}"))
+    categoricas = {c["name"] for c in pandas.get("columns", []) if c.get("pandas_type") == "categorical"}
+    for coluna in _colunas_particao(esquema):
+        if coluna in tabela.column_names and (coluna in categoricas or tipos.is_dictionary(esquema.field(coluna).type)):
+            posicao = tabela.column_names.index(coluna)
+            tabela = tabela.set_column(posicao, coluna, pc.dictionary_encode(tabela.column(coluna)))
+    ordem = [c for c in esquema.names if c in tabela.column_names]
+    ordem += [c for c in tabela.column_names if c not in ordem]
+    return tabela.select(ordem)
+
+
+def _filtro(filters, esquema=None):
+    """Converte filtros no formato ``[(coluna, op, valor), ...]`` em expressão do
+    pyarrow; valores em texto (ex.: datas no YAML) são convertidos para o tipo da coluna."""
+    if not filters:
+        return None
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def _converter(coluna, valor):
+        if esquema is None or coluna not in esquema.names or not isinstance(valor, str):
+            return valor
+        tipo = _tipo_valor(esquema.field(coluna).type)
+        return valor if pa.types.is_string(tipo) or pa.types.is_large_string(tipo) else pa.scalar(valor).cast(tipo).as_py()
+
+    def _condicao(coluna, op, valor):
+        if isinstance(valor, (list, tuple, set)):
+            return coluna, op, [_converter(coluna, v) for v in valor]
+        return coluna, op, _converter(coluna, valor)
+
+    if isinstance(filters[0], (list, tuple)) and filters[0] and isinstance(filters[0][0], (list, tuple)):
+        filters = [[_condicao(*c) for c in grupo] for grupo in filters]
+    else:
+        filters = [_condicao(*c) for c in filters]
+    return pq.filters_to_expression(filters)
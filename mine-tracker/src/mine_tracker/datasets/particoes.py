@@ -0,0 +1,23 @@
+"""
+``PartitionedDataset`` que pode ser lido antes da primeira partição existir.
+
+Usado como watermark da ingestão incremental: o node recebe as partições já
+gravadas (só as chaves importam; nada é lido) direto do catálogo, em vez de
+repetir o caminho do diretório nos parâmetros.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict
+
+from kedro_datasets.partitions import PartitionedDataset
+
+
+class ParticoesDataset(PartitionedDataset):
+    """Igual ao ``partitions.PartitionedDataset``, mas ``load`` devolve ``{}``
+    quando o diretório ainda não tem partições (o original levanta erro)."""
+
+    def load(self) -> Dict[str, Callable[[], Any]]:
+        self._invalidate_caches()
+        if not self._list_partitions():
+            return {}
+        return super().load()
@@ -0,0 +1,384 @@
+"""
+Hooks do projeto: instrumentação de cada ``kedro run``.
+
+Para cada node: tempo de parede e de CPU, pico de memória e linhas de entrada
+e saída; para cada load/save do catálogo: duração, e para cada dataset os
+bytes no disco no fim do run. No fim da execução grava um JSON por run e um
+arquivo no formato do textfile collector do node_exporter (Prometheus), um
+por pipeline, sobrescrito a cada execução.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import resource
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from kedro.framework.hooks import hook_impl
+from kedro.io import AbstractDataset
+
+logger = logging.getLogger(__name__)
+
+
+def _ler_status_kb(campo: str) -> Optional[int]:
+    """Valor (em bytes) de um campo ``Vm*`` de ``/proc/self/status``."""
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith(campo + ":"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_bytes() -> Optional[int]:
+    """RSS atual do processo."""
+    return _ler_status_kb("VmRSS")
+
+
+def pico_rss_bytes() -> Optional[int]:
+    """Pico de RSS do processo desde o último :func:`zerar_pico_rss`."""
+    pico = _ler_status_kb("VmHWM")
+    if pico is None:
+        # fora do Linux: pico do processo inteiro, sem como zerar
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return pico
+
+
+def cpu_processo() -> float:
+    """CPU do processo e dos filhos já encerrados (pools de processos)."""
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + filhos.ru_utime + filhos.ru_stime
+
+
+def zerar_pico_rss() -> bool:
+    """Zera o VmHWM do processo (Linux >= 4.0); ``False`` se não der."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _linhas(dado: Any) -> Optional[int]:
+    """Linhas de um DataFrame/array/Table do arrow; ``None`` para o resto."""
+    if hasattr(dado, "num_rows"):
+        return int(dado.num_rows)
+    forma = getattr(dado, "shape", None)
+    if isinstance(forma, tuple) and forma:
+        return int(forma[0])
+    return None
+
+
+def _tamanho_em_disco(caminho: Path) -> Optional[int]:
+    if caminho.is_file():
+        return caminho.stat().st_size
+    if caminho.is_dir():
+        return sum(p.stat().st_size for p in caminho.rglob("*") if p.is_file())
+    return None
+
+
+def _escapar_rotulo(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _gravar_atomico(destino: Path, texto: str) -> None:
+    # o node_exporter pode ler no meio da escrita: grava num temporário e troca
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=destino.parent, prefix=f".{destino.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(tmp, destino)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class InstrumentacaoHooks:
+    """Mede nodes e I/O do catálogo e grava as métricas no fim do run.
+
+    A janela de um node vai do primeiro load de entrada ao último save de
+    saída, para que nodes geradores (que só produzem durante o save) sejam
+    medidos por inteiro; ``duracao_funcao_segundos`` é só a chamada da função.
+    CPU é a do processo (inclui threads do sklearn/BLAS e pools de processos
+    fechados durante o node) e o pico de memória é o VmHWM do processo,
+    zerado no início do node. Com nodes em paralelo (``ThreadRunner``) esses
+    números seriam divididos entre eles: o node fica marcado ``concorrente``,
+    a CPU passa a ser só a da sua thread e o pico de memória é o do processo
+    no período.
+
+    O tamanho no disco de cada dataset é medido uma vez, no fim do run: nodes
+    geradores salvam um pedaço por vez, e varrer o diretório a cada pedaço
+    deixaria a instrumentação quadrática no número de pedaços.
+
+    Args:
+        diretorio: onde gravar ``<pipeline>-<data>.json`` (relativo ao projeto).
+        diretorio_textfile: onde gravar ``mine_tracker_<pipeline>.prom``; por
+            padrão ``$MINE_TRACKER_TEXTFILE_DIR`` ou o próprio ``diretorio``.
+    """
+
+    def __init__(
+        self,
+        diretorio: str = "data/08_reporting/metricas_execucao",
+        diretorio_textfile: Optional[str] = None,
+    ) -> None:
+        self.diretorio = diretorio
+        self.diretorio_textfile = diretorio_textfile or os.environ.get("MINE_TRACKER_TEXTFILE_DIR")
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self) -> None:
+        self._catalogo = None
+        self._run: Dict[str, Any] = {}
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._em_execucao: set = set()
+        self._io_abertos: Dict[tuple, float] = {}
+        self._datasets: list = []
+
+    # ---- pipeline ---------------------------------------------------------
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any], pipeline, catalog) -> None:
+        self._reiniciar()
+        self._catalogo = catalog
+        self._run = {
+            "run_id": run_params.get("run_id"),
+            "pipeline": ",".join(run_params.get("pipeline_names") or ["__default__"]),
+            "env": run_params.get("env"),
+            "runner": run_params.get("runner"),
+            "projeto": run_params.get("project_path") or ".",
+            "inicio": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "_t0": time.perf_counter(),
+            "_cpu0": cpu_processo(),
+        }
+
+    @hook_impl
+    def after_pipeline_run(self, run_params: Dict[str, Any], run_result, pipeline, catalog) -> None:
+        self._finalizar(sucesso=True)
+
+    @hook_impl
+    def on_pipeline_error(self, error: Exception, run_params: Dict[str, Any], pipeline, catalog) -> None:
+        self._finalizar(sucesso=False, erro=repr(error))
+
+    # ---- nodes ------------------------------------------------------------
+
+    def _node(self, node) -> Dict[str, Any]:
+        """Registro do node; abre a janela no primeiro evento."""
+        with self._lock:
+            registro = self._nodes.get(node.name)
+            if registro is not None:
+                return registro
+            concorrente = bool(self._em_execucao)
+            for outro in self._em_execucao:
+                self._nodes[outro]["concorrente"] = True
+            if not concorrente:
+                zerar_pico_rss()
+            self._em_execucao.add(node.name)
+            registro = self._nodes[node.name] = {
+                "node": node.name,
+                "inicio": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "sucesso": None,
+                "linhas_entrada": {},
+                "linhas_saida": {},
+                "concorrente": concorrente,
+                "_t0": time.perf_counter(),
+                "_cpu0": cpu_processo(),
+                "_cpu_thread0": time.thread_time(),
+                "_rss0": rss_bytes(),
+            }
+        return registro
+
+    def _atualizar(self, registro: Dict[str, Any]) -> None:
+        registro["duracao_segundos"] = time.perf_counter() - registro["_t0"]
+        registro["_cpu"] = cpu_processo() - registro["_cpu0"]
+        registro["_cpu_thread"] = time.thread_time() - registro["_cpu_thread0"]
+        registro["memoria_pico_bytes"] = pico_rss_bytes()
+        rss = rss_bytes()
+        if rss is not None and registro["_rss0"] is not None:
+            registro["memoria_delta_bytes"] = rss - registro["_rss0"]
+
+    @hook_impl
+    def before_node_run(self, node, catalog, inputs, is_async, run_id) -> None:
+        registro = self._node(node)
+        registro["_tf0"] = time.perf_counter()
+
+    @hook_impl
+    def after_node_run(self, node, catalog, inputs, outputs, is_async, run_id) -> None:
+        registro = self._node(node)
+        registro["duracao_funcao_segundos"] = time.perf_counter() - registro.pop("_tf0", registro["_t0"])
+        registro["sucesso"] = True
+        self._atualizar(registro)
+        with self._lock:
+            self._em_execucao.discard(node.name)
+
+    @hook_impl
+    def on_node_error(self, error, node, catalog, inputs, is_async, run_id) -> None:
+        registro = self._node(node)
+        registro["sucesso"] = False
+        registro["erro"] = repr(error)
+        self._atualizar(registro)
+        with self._lock:
+            self._em_execucao.discard(node.name)
+
+    # ---- datasets ---------------------------------------------------------
+
+    def _abrir_io(self, dataset_name: str, node) -> None:
+        self._node(node)
+        self._io_abertos[(threading.get_ident(), dataset_name)] = time.perf_counter()
+
+    def _fechar_io(self, operacao: str, dataset_name: str, data: Any, node) -> None:
+        t0 = self._io_abertos.pop((threading.get_ident(), dataset_name), None)
+        duracao = time.perf_counter() - t0 if t0 is not None else None
+        registro = self._node(node)
+        linhas = _linhas(data)
+        if linhas is not None:
+            chave = "linhas_entrada" if operacao == "load" else "linhas_saida"
+            # nodes geradores salvam em pedaços: soma
+            registro[chave][dataset_name] = registro[chave].get(dataset_name, 0) + linhas
+        self._atualizar(registro)
+        with self._lock:
+            self._datasets.append({
+                "dataset": dataset_name,
+                "operacao": operacao,
+                "node": node.name,
+                "duracao_segundos": duracao,
+            })
+
+    def _bytes(self, dataset_name: str) -> Optional[int]:
+        """Bytes no disco do dataset; ``None`` para memória ou armazenamento remoto."""
+        try:
+            dataset = self._catalogo.get(dataset_name)
+            interno = getattr(dataset, "_dataset", None)
+            dataset = interno if isinstance(interno, AbstractDataset) else dataset  # CachedDataset
+            caminho = getattr(dataset, "_filepath", None) or getattr(dataset, "_path", None)
+            if caminho is None or getattr(dataset, "_protocol", "file") not in ("file", None):
+                return None
+            return _tamanho_em_disco(Path(str(caminho)))
+        except Exception:
+            return None
+
+    @hook_impl
+    def before_dataset_loaded(self, dataset_name: str, node) -> None:
+        self._abrir_io(dataset_name, node)
+
+    @hook_impl
+    def after_dataset_loaded(self, dataset_name: str, data: Any, node) -> None:
+        self._fechar_io("load", dataset_name, data, node)
+
+    @hook_impl
+    def before_dataset_saved(self, dataset_name: str, data: Any, node) -> None:
+        self._abrir_io(dataset_name, node)
+
+    @hook_impl
+    def after_dataset_saved(self, dataset_name: str, data: Any, node) -> None:
+        self._fechar_io("save", dataset_name, data, node)
+
+    # ---- saída ------------------------------------------------------------
+
+    def _finalizar(self, sucesso: bool, erro: Optional[str] = None) -> None:
+        if not self._run:
+            return
+        run = {k: v for k, v in self._run.items() if not k.startswith("_")}
+        run["duracao_segundos"] = time.perf_counter() - self._run["_t0"]
+        run["cpu_segundos"] = cpu_processo() - self._run["_cpu0"]
+        # o VmHWM é zerado a cada node: o pico do run é o maior pico visto
+        picos = [r.get("memoria_pico_bytes") for r in self._nodes.values()] + [pico_rss_bytes()]
+        run["memoria_pico_bytes"] = max(p for p in picos if p is not None)
+        run["sucesso"] = sucesso
+        if erro:
+            run["erro"] = erro
+        for registro in self._nodes.values():
+            registro["cpu_segundos"] = registro.get("_cpu_thread" if registro["concorrente"] else "_cpu")
+        run["nodes"] = [
+            {k: v for k, v in registro.items() if not k.startswith("_")} for registro in self._nodes.values()
+        ]
+        tamanhos = {nome: self._bytes(nome) for nome in dict.fromkeys(d["dataset"] for d in self._datasets)}
+        run["datasets"] = [{**d, "bytes": tamanhos[d["dataset"]]} for d in self._datasets]
+
+        projeto = Path(run.pop("projeto"))
+        diretorio = projeto / self.diretorio
+        textfile = projeto / (self.diretorio_textfile or self.diretorio)
+        carimbo = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        nome = run["pipeline"].replace(",", "+")
+        try:
+            _gravar_atomico(diretorio / f"{nome}-{carimbo}.json", json.dumps(run, indent=2, ensure_ascii=False))
+            _gravar_atomico(textfile / f"mine_tracker_{nome}.prom", formatar_prometheus(run))
+            logger.info("Métricas da execução gravadas em %s", diretorio)
+        except OSError as e:
+            # instrumentação nunca derruba o run
+            logger.warning("Não foi possível gravar as métricas da execução: %s", e)
+        self._reiniciar()
+
+
+_METRICAS = [
+    ("mine_tracker_run_duracao_segundos", "Duração total do kedro run."),
+    ("mine_tracker_run_cpu_segundos", "CPU do processo (e filhos) durante o kedro run."),
+    ("mine_tracker_run_memoria_pico_bytes", "Pico de RSS do processo no kedro run."),
+    ("mine_tracker_run_sucesso", "1 se o run terminou sem erro."),
+    ("mine_tracker_run_fim_timestamp_segundos", "Quando o run terminou (epoch)."),
+    ("mine_tracker_node_duracao_segundos", "Duração do node, do primeiro load ao último save."),
+    ("mine_tracker_node_funcao_segundos", "Duração só da função do node."),
+    ("mine_tracker_node_cpu_segundos", "CPU do node (só a da sua thread se rodou em paralelo)."),
+    ("mine_tracker_node_memoria_pico_bytes", "Pico de RSS do processo durante o node."),
+    ("mine_tracker_node_linhas_entrada", "Linhas carregadas como entrada do node."),
+    ("mine_tracker_node_linhas_saida", "Linhas salvas como saída do node."),
+    ("mine_tracker_node_sucesso", "1 se o node terminou sem erro."),
+    ("mine_tracker_dataset_duracao_segundos", "Tempo somado de load/save do dataset."),
+    ("mine_tracker_dataset_operacoes", "Quantidade de load/save do dataset no run."),
+    ("mine_tracker_dataset_bytes", "Bytes do dataset no disco no fim do run."),
+]
+
+
+def formatar_prometheus(run: Dict[str, Any]) -> str:
+    """Métricas do run no formato texto do Prometheus (textfile collector)."""
+    amostras: Dict[str, list] = {nome: [] for nome, _ in _METRICAS}
+
+    def amostra(nome: str, valor: Any, **rotulos: str) -> None:
+        if valor is None:
+            return
+        rotulos = {"pipeline": run["pipeline"], **rotulos}
+        texto = ",".join(f'{k}="{_escapar_rotulo(v)}"' for k, v in rotulos.items())
+        amostras[nome].append(f"{nome}{{{texto}}} {float(valor):.6g}")
+
+    amostra("mine_tracker_run_duracao_segundos", run["duracao_segundos"])
+    amostra("mine_tracker_run_cpu_segundos", run["cpu_segundos"])
+    amostra("mine_tracker_run_memoria_pico_bytes", run["memoria_pico_bytes"])
+    amostra("mine_tracker_run_sucesso", int(run["sucesso"]))
+    amostra("mine_tracker_run_fim_timestamp_segundos", time.time())
+
+    for n in run["nodes"]:
+        amostra("mine_tracker_node_duracao_segundos", n.get("duracao_segundos"), node=n["node"])
+        amostra("mine_tracker_node_funcao_segundos", n.get("duracao_funcao_segundos"), node=n["node"])
+        amostra("mine_tracker_node_cpu_segundos", n.get("cpu_segundos"), node=n["node"])
+        amostra("mine_tracker_node_memoria_pico_bytes", n.get("memoria_pico_bytes"), node=n["node"])
+        amostra("mine_tracker_node_linhas_entrada", sum(n["linhas_entrada"].values()) if n["linhas_entrada"] else None, node=n["node"])
+        amostra("mine_tracker_node_linhas_saida", sum(n["linhas_saida"].values()) if n["linhas_saida"] else None, node=n["node"])
+        amostra("mine_tracker_node_sucesso", int(bool(n["sucesso"])), node=n["node"])
+
+    # um dataset pode ser lido por vários nodes: soma tempo e conta as operações
+    agregados: Dict[tuple, Dict[str, Any]] = {}
+    for d in run["datasets"]:
+        a = agregados.setdefault((d["dataset"], d["operacao"]), {"duracao": 0.0, "n": 0, "bytes": None})
+        a["duracao"] += d["duracao_segundos"] or 0.0
+        a["n"] += 1
+        a["bytes"] = d["bytes"] if d["bytes"] is not None else a["bytes"]
+    for (dataset, operacao), a in agregados.items():
+        amostra("mine_tracker_dataset_duracao_segundos", a["duracao"], dataset=dataset, operacao=operacao)
+        amostra("mine_tracker_dataset_operacoes", a["n"], dataset=dataset, operacao=operacao)
+        amostra("mine_tracker_dataset_bytes", a["bytes"], dataset=dataset, operacao=operacao)
+
+    linhas = []
+    for nome, ajuda in _METRICAS:
+        if amostras[nome]:
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge", *amostras[nome]]
+    return "\n".join(linhas) + "\n"
@@ -1,16 +1,74 @@
 """Project pipelines."""
 from __future__ import annotations
 
-from kedro.framework.project import find_pipelines
+import importlib
+from collections.abc import Iterator, Mapping
+from importlib import resources
+from typing import Callable, Dict
+
 from kedro.pipeline import Pipeline
 
+PACOTE_PIPELINES = "mine_tracker.pipelines"
+
+# modos alternativos ficam fora do __default__: nome -> (pacote, função)
+MODOS_ALTERNATIVOS = {
+    "mine_incremental": ("mine", "create_incremental_pipeline"),
+    "model_incremental": ("model", "create_incremental_pipeline"),
+    "inference_lotes": ("inference", "create_batch_pipeline"),
+}
+
+
+class PipelinesSobDemanda(Mapping):
+    """Mapeamento nome -> ``Pipeline`` que só importa e monta um pipeline
+    quando ele é pedido.
+
+    As chaves são conhecidas sem importar nada; ``kedro run --pipeline
+    inference`` acessa só ``["inference"]`` e não paga o import dos nodes de
+    ``mine`` e ``model`` (sklearn, pytz...). ``__default__`` e listagens como
+    ``kedro registry list`` continuam montando todos.
+    """
+
+    def __init__(self, fabricas: Dict[str, Callable[[], Pipeline]]):
+        self._fabricas = dict(fabricas)
+        self._montados: Dict[str, Pipeline] = {}
+
+    def __getitem__(self, nome: str) -> Pipeline:
+        if nome not in self._montados:
+            self._montados[nome] = self._fabricas[nome]()
+        return self._montados[nome]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fabricas)
+
+    def __len__(self) -> int:
+        return len(self._fabricas)
+
+
+def _pacotes_de_pipeline() -> list[str]:
+    """Subpacotes de ``mine_tracker.pipelines``, como o ``find_pipelines``
+    descobre, mas sem importá-los."""
+    return sorted(
+        p.name for p in resources.files(PACOTE_PIPELINES).iterdir()
+        if p.is_dir() and not p.name.startswith((".", "_")) and (p / "__init__.py").is_file()
+    )
+
+
+def _fabrica(pacote: str, funcao: str = "create_pipeline") -> Callable[[], Pipeline]:
+    def montar() -> Pipeline:
+        return getattr(importlib.import_module(f"{PACOTE_PIPELINES}.{pacote}"), funcao)()
+    return montar
+
 
-def register_pipelines() -> dict[str, Pipeline]:
+def register_pipelines() -> Mapping[str, Pipeline]:
     """Register the project's pipelines.
 
     Returns:
-        A mapping from pipeline names to ``Pipeline`` objects.
+        A mapping from pipeline names to ``Pipeline`` objects, built on first access.
     """
-    pipelines = find_pipelines()
-    pipelines["__default__"] = sum(pipelines.values())
-    return pipelines
+    fabricas: Dict[str, Callable[[], Pipeline]] = {nome: _fabrica(nome) for nome in _pacotes_de_pipeline()}
+    modulares = list(fabricas)
+    fabricas["__default__"] = lambda: sum((registro[nome] for nome in modulares), Pipeline([]))
+    for nome, (pacote, funcao) in MODOS_ALTERNATIVOS.items():
+        fabricas[nome] = _fabrica(pacote, funcao)
+    registro = PipelinesSobDemanda(fabricas)
+    return registro
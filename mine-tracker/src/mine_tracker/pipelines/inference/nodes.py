@@ -3,10 +3,19 @@ This is a boilerplate pipeline 'inference'
 generated using Kedro 1.0.0
 """
 
-from typing import Dict, Any
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import repeat
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+import json
+import os
 import pandas as pd
 import logging
 import joblib
+import numpy as np
+
+from mine_tracker.datasets import ModeloCompacto
 
 LOAD_THRESHOLDS = {"low": 30000, "medium": 60000, "high": 90000}
 
@@ -29,101 +38,355 @@ def action_for_load(level: str) -> str:
 
 logger = logging.getLogger(__name__)
 
-def inferencia(model, DataFrame=None, ) -> pd.DataFrame:
+def _como_dataframe(DataFrame) -> pd.DataFrame:
     if isinstance(DataFrame, dict):
-        df = pd.DataFrame(DataFrame)
+        return pd.DataFrame(DataFrame)
     elif isinstance(DataFrame, pd.DataFrame):
-        df = DataFrame.copy()
-    else:
-        raise TypeError(f"DataFrame esperado como pandas.DataFrame ou dict, mas veio {type(DataFrame)}")
+        return DataFrame.copy()
+    raise TypeError(f"DataFrame esperado como pandas.DataFrame ou dict, mas veio {type(DataFrame)}")
+
+
+def inferencia(model, DataFrame=None, ) -> pd.DataFrame:
+    df = _como_dataframe(DataFrame)
 
-    
     # Faz predição
     df["prediction"] = model.predict(df)
 
     logger.info("Inferência concluída com sucesso")
     return df
 
-def generate_report(df: pd.DataFrame) -> Dict[str, Any]:
-    report = {"clusters": [], "ranking": []}
+@lru_cache(maxsize=1024)
+def _abrir_modelo_servidor(arquivo: str, versao: float):
+    if arquivo.endswith(".pkl"):  # registros gravados antes do formato compacto
+        return joblib.load(arquivo)
+    return ModeloCompacto.carregar(arquivo, mmap=True)
 
-    grouped = df.groupby("cluster")["prediction"].mean().reset_index()
-    rank = grouped.sort_values("prediction", ascending=False).reset_index(drop=True)
 
-    for _, row in grouped.iterrows():
-        cluster_id = int(row["cluster"])
-        pred = round(float(row["prediction"]))  # 🔹 arredonda predição
-        level = label_load(pred)
-        action = action_for_load(level)
+def _modelo_servidor(arquivo: str):
+    """Modelo de um servidor do registro, aberto uma vez por processo. A
+    chave inclui o mtime do arquivo, então um retreino é relido."""
+    marca = arquivo if arquivo.endswith(".pkl") else os.path.join(arquivo, "meta.json")
+    return _abrir_modelo_servidor(arquivo, os.path.getmtime(marca))
 
-        subset = df[df["cluster"] == cluster_id].drop(columns=["prediction"])
 
-        cluster_info = {
-            "cluster_id": cluster_id,
-            "baseline_prediction": pred,
-            "level": level,
-            "action": action,
-            "instances": subset.to_dict(orient="records")
-        }
-        report["clusters"].append(cluster_info)
+def inferencia_por_servidor(model, registro: Dict[str, Any], DataFrame=None) -> pd.DataFrame:
+    """Prediz cada linha com o modelo do seu servidor (``registro_modelos``,
+    chave ``ip``) e usa ``model`` (o ``best_model`` global) nas linhas sem
+    ``ip`` ou de servidores sem modelo próprio. Sem coluna ``ip`` o resultado
+    é o mesmo de :func:`inferencia`. Os modelos por servidor são mapeados do
+    disco uma vez e reusados entre chamadas (ver :func:`_modelo_servidor`)."""
+    df = _como_dataframe(DataFrame)
+    modelos = (registro or {}).get("modelos", {})
 
-    for i, row in rank.iterrows():
-        pred = round(float(row["prediction"]))
-        lvl = label_load(pred)
-        report["ranking"].append({
-            "posicao": i + 1,
-            "cluster_id": int(row["cluster"]),
-            "prediction": pred,
-            "level": lvl
-        })
+    pred = np.empty(len(df), dtype=float)
+    coberto = np.zeros(len(df), dtype=bool)
+    if "ip" in df.columns and modelos:
+        for servidor, idx in df.groupby("ip", observed=True, sort=False).indices.items():
+            info = modelos.get(str(servidor))
+            if info is None:
+                continue
+            pred[idx] = _modelo_servidor(info["arquivo"]).predict(df.iloc[idx])
+            coberto[idx] = True
 
-    return report
+    if not coberto.all():
+        pred[~coberto] = model.predict(df[~coberto])
+    df["prediction"] = pred
 
+    logger.info(f"Inferência concluída: {int(coberto.sum())} linhas com modelo do servidor, {int((~coberto).sum())} com o global")
+    return df
 
-def generate_report(df: pd.DataFrame) -> Dict[str, Any]:
-    # 🔹 legenda explicando cada feature
-    legend = {
-        "hora": "Hora do dia (0–23)",
-        "final_de_semana": "Indicador se é fim de semana (0=Não, 1=Sim)",
-        "media_movel_10": "Média móvel de jogadores nas últimas 10 janelas",
-        "proporcao_rede": "Proporção de jogadores no cluster em relação à rede total (0–1)",
-        "pct_var_jogadores": "Variação percentual de jogadores em relação ao período anterior"
-    }
 
-    report = {
-        "legend": legend,
-        "clusters": [],
-        "ranking": []
-    }
+LOTES_PADRAO = {
+    "linhas_por_lote": 100_000,
+    "max_workers": None,        # None = todos os núcleos
+    "executor": "processos",    # processos | threads
+    "colunas_extra": ["timestamp", "ip"],
+    "filtros": None,            # [(coluna, op, valor), ...] como no ParquetParticionadoDataset
+}
+
+# modelo de cada worker do pool, recebido uma vez no initializer
+_MODELO_LOTE = None
+
+
+def _iniciar_worker_lote(model) -> None:
+    global _MODELO_LOTE
+    _MODELO_LOTE = model
+
+
+def _prever_lote(df: pd.DataFrame) -> pd.DataFrame:
+    return inferencia(_MODELO_LOTE, df)
+
+
+def _lotes_de_entrada(fonte, colunas: List[str], linhas_por_lote: int, filtros=None) -> Iterator[pd.DataFrame]:
+    """Lê a entrada em pedaços de ``linhas_por_lote`` linhas, na ordem original.
+
+    ``fonte`` pode ser um ``pyarrow.dataset.Dataset`` (só as ``colunas`` e as
+    linhas dos ``filtros`` são lidas do disco, um lote de cada vez) ou um
+    ``DataFrame`` já em memória.
+    """
+    if isinstance(fonte, pd.DataFrame):
+        colunas = [c for c in colunas if c in fonte.columns]
+        for inicio in range(0, len(fonte), linhas_por_lote):
+            yield fonte.iloc[inicio:inicio + linhas_por_lote][colunas]
+        return
+
+    import pyarrow as pa
+
+    from mine_tracker.datasets.parquet_particionado import _filtro
+
+    colunas = [c for c in colunas if c in fonte.schema.names]
+    pendentes, n_pendentes = [], 0
+    for batch in fonte.to_batches(columns=colunas, filter=_filtro(filtros, fonte.schema), batch_size=linhas_por_lote):
+        pendentes.append(batch)
+        n_pendentes += batch.num_rows
+        # os batches do Parquet têm o tamanho dos row groups; junta/corta até o tamanho do lote
+        while n_pendentes >= linhas_por_lote:
+            tabela = pa.Table.from_batches(pendentes)
+            yield tabela.slice(0, linhas_por_lote).to_pandas()
+            resto = tabela.slice(linhas_por_lote)
+            pendentes, n_pendentes = resto.to_batches(), resto.num_rows
+    if n_pendentes:
+        yield pa.Table.from_batches(pendentes).to_pandas()
+
+
+def inferencia_em_lotes(model, fonte, params: Optional[Dict[str, Any]] = None) -> Iterator[pd.DataFrame]:
+    """Pontua uma entrada grande (ex.: todo o histórico de features para
+    backtest) em lotes de tamanho fixo, num pool de workers.
+
+    Node gerador: cada lote pontuado é devolvido assim que fica pronto, na
+    ordem da entrada, e o Kedro grava um pedaço por vez em
+    ``output_inference_lotes``. No máximo ``2 * max_workers`` lotes ficam em
+    voo ao mesmo tempo, então a memória depende do tamanho do lote e não do
+    tamanho da entrada. Cada lote passa por :func:`inferencia`.
+
+    Com ``executor: processos`` o modelo vai uma vez para cada worker; o
+    ``ModeloCompacto`` mapeado em memória viaja só como caminho e os workers
+    compartilham as páginas.
+    """
+    params = {**LOTES_PADRAO, **(params or {})}
+    colunas_modelo = list(getattr(model, "meta", {}).get("colunas", []))
+    colunas = list(dict.fromkeys(params["colunas_extra"] + colunas_modelo))
+    max_workers = params["max_workers"] or os.cpu_count() or 1
+    Executor = ProcessPoolExecutor if params["executor"] == "processos" else ThreadPoolExecutor
+
+    n_lotes = n_linhas = 0
+    with Executor(max_workers=max_workers, initializer=_iniciar_worker_lote, initargs=(model,)) as pool:
+        em_voo = deque()
+        for lote in _lotes_de_entrada(fonte, colunas, params["linhas_por_lote"], params["filtros"]):
+            em_voo.append(pool.submit(_prever_lote, lote))
+            if len(em_voo) >= 2 * max_workers:
+                pronto = em_voo.popleft().result()
+                n_lotes, n_linhas = n_lotes + 1, n_linhas + len(pronto)
+                yield pronto
+        while em_voo:
+            pronto = em_voo.popleft().result()
+            n_lotes, n_linhas = n_lotes + 1, n_linhas + len(pronto)
+            yield pronto
+
+    logger.info(f"Inferência em lotes concluída: {n_linhas} linhas em {n_lotes} lotes ({max_workers} workers)")
+
+
+# legenda explicando cada feature
+LEGENDA = {
+    "hora": "Hora do dia (0–23)",
+    "final_de_semana": "Indicador se é fim de semana (0=Não, 1=Sim)",
+    "media_movel_10": "Média móvel de jogadores nas últimas 10 janelas",
+    "proporcao_rede": "Proporção de jogadores no cluster em relação à rede total (0–1)",
+    "pct_var_jogadores": "Variação percentual de jogadores em relação ao período anterior"
+}
+
+NIVEIS = ["baixo", "médio", "alto", "crítico"]
 
-    grouped = df.groupby("cluster")["prediction"].mean().reset_index()
-    rank = grouped.sort_values("prediction", ascending=False).reset_index(drop=True)
 
-    for _, row in grouped.iterrows():
-        cluster_id = int(row["cluster"])
-        pred = round(float(row["prediction"]))  # 🔹 arredonda predição
-        level = label_load(pred)
-        action = action_for_load(level)
+def label_load_vetorizado(pred: np.ndarray) -> np.ndarray:
+    """Mesmo resultado de :func:`label_load`, para um array inteiro de uma vez."""
+    limites = [LOAD_THRESHOLDS["low"], LOAD_THRESHOLDS["medium"], LOAD_THRESHOLDS["high"]]
+    return np.asarray(NIVEIS, dtype=object)[np.searchsorted(limites, pred, side="right")]
 
-        subset = df[df["cluster"] == cluster_id].drop(columns=["prediction"])
 
-        cluster_info = {
-            "cluster_id": cluster_id,
-            "baseline_prediction": pred,
-            "level": level,
-            "action": action,
-            "instances": subset.to_dict(orient="records")
+def _registros(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """``df.to_dict(orient="records")`` montado coluna a coluna (mesmos valores Python)."""
+    colunas = list(df.columns)
+    valores = [df[c].tolist() for c in colunas]
+    return list(map(dict, map(zip, repeat(colunas), zip(*valores))))
+
+
+def _amostrar(posicoes: np.ndarray, limite: Optional[int], amostragem: str, rng) -> np.ndarray:
+    """Até ``limite`` posições do cluster, mantendo a ordem original das linhas."""
+    if limite is None or len(posicoes) <= limite:
+        return posicoes
+    if amostragem == "aleatoria":
+        return np.sort(rng.choice(posicoes, limite, replace=False))
+    return posicoes[:limite]
+
+
+_COLUNAS_RESUMO = ["hora", "media_movel_10", "prediction"]
+
+
+class _ParteCluster(NamedTuple):
+    """Linhas de um cluster, lidas só quando o relatório precisa delas."""
+    cluster: Any
+    n: int
+    resumo: Callable[[], List[np.ndarray]]  # hora, media_movel_10 e prediction
+    registros: Callable[[Optional[np.ndarray]], List[Dict[str, Any]]]  # instâncias (todas ou só as posições)
+
+
+def _partes_dataframe(df: pd.DataFrame) -> Iterator[_ParteCluster]:
+    base = df.drop(columns=["prediction"])
+    resumo = [df[c].to_numpy() for c in _COLUNAS_RESUMO]
+
+    def ler_resumo(linhas):
+        return [valores[linhas] for valores in resumo]
+
+    def registros(posicoes, *, linhas):
+        return _registros(base.iloc[linhas if posicoes is None else linhas[posicoes]])
+
+    for chave, pos in df.groupby("cluster", sort=True).indices.items():
+        yield _ParteCluster(chave, len(pos), partial(ler_resumo, pos), partial(registros, linhas=pos))
+
+
+def _partes_dataset(dataset) -> Iterator[_ParteCluster]:
+    """Uma parte por partição ``cluster=N/``: cada leitura filtra pela partição,
+    então só os arquivos daquele cluster são abertos."""
+    import pyarrow.dataset as ds
+
+    colunas = _colunas_instancia(dataset)
+
+    def ler_resumo(filtro):
+        tabela = dataset.to_table(columns=_COLUNAS_RESUMO, filter=filtro)
+        return [tabela.column(c).to_numpy() for c in _COLUNAS_RESUMO]
+
+    def registros(posicoes, *, filtro):
+        if posicoes is None:
+            return _registros(dataset.to_table(columns=colunas, filter=filtro).to_pandas())
+        return _registros(dataset.take(posicoes, columns=colunas, filter=filtro).to_pandas())
+
+    chaves = sorted({ds.get_partition_keys(f.partition_expression)["cluster"] for f in dataset.get_fragments()})
+    for chave in chaves:
+        filtro = ds.field("cluster") == chave
+        yield _ParteCluster(chave, dataset.count_rows(filter=filtro), partial(ler_resumo, filtro), partial(registros, filtro=filtro))
+
+
+def _colunas_instancia(fonte) -> List[str]:
+    """Colunas das instâncias (tudo menos a predição), na ordem original."""
+    if isinstance(fonte, pd.DataFrame):
+        return [c for c in fonte.columns if c != "prediction"]
+    # no dataset particionado a coluna de partição vem no fim; a ordem gravada está na metadata do pandas
+    pandas = json.loads((fonte.schema.metadata or {}).get(b"pandas", b"{}"))
+    ordem = [c["name"] for c in pandas.get("columns", []) if c.get("name") in fonte.schema.names]
+    ordem += [c for c in fonte.schema.names if c not in ordem]
+    return [c for c in ordem if c != "prediction"]
+
+
+def _agregado_por_hora(resumos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Série por hora de todas as instâncias (não só da amostra do JSON):
+    média observada, previsão média (a do cluster de cada instância), total
+    previsto, contagem, se algum cluster da hora está em nível alto e as ações."""
+    horas: Dict[int, Dict[str, Any]] = {}
+    for r in resumos:
+        for hora, soma, n in r["por_hora"]:
+            h = horas.setdefault(hora, {"observado": 0.0, "previsao": 0.0, "n": 0, "alto": False, "acoes": {}})
+            h["observado"] += soma
+            h["previsao"] += r["pred"] * n
+            h["n"] += n
+            h["alto"] = h["alto"] or r["level"] == "alto"
+            h["acoes"][r["action"]] = None
+    return [
+        {
+            "hora": hora,
+            "observado": h["observado"] / h["n"],
+            "previsao": h["previsao"] / h["n"],
+            "soma_previsao": h["previsao"],
+            "instancias": h["n"],
+            "alto": h["alto"],
+            "acoes": list(h["acoes"]),
         }
-        report["clusters"].append(cluster_info)
+        for hora, h in sorted(horas.items())
+    ]
+
+
+def generate_report(fonte, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Relatório por cluster: predição média arredondada, nível de carga, ação
+    sugerida, as instâncias do cluster, o ranking dos clusters e o agregado
+    por hora de todas as instâncias (``horas``, o que o dashboard desenha).
 
-    for i, row in rank.iterrows():
-        pred = round(float(row["prediction"]))
-        lvl = label_load(pred)
+    ``fonte`` é o Parquet particionado por cluster aberto sem leitura
+    (``report_inference_instancias@arrow``) ou um ``DataFrame``. Do Parquet,
+    cada cluster é lido sozinho: uma passada só com ``hora``,
+    ``media_movel_10`` e ``prediction`` para as médias e o agregado por hora,
+    e outra, ao montar ``clusters``, só com as linhas que vão para
+    ``instances``. A memória depende do maior cluster, não da tabela.
+
+    ``params`` (``relatorio`` em parameters_inference.yml):
+
+    - ``max_instancias_por_cluster``: limita ``instances`` de cada cluster
+      (``primeiras`` ou ``aleatoria`` conforme ``amostragem``) e acrescenta
+      ``total_instances``; a base completa fica em ``report_inference_instancias``.
+    - ``streaming``: ``clusters`` vira um gerador, montado cluster a cluster
+      enquanto o ``JSONStreamDataset`` grava.
+    """
+    params = params or {}
+    limite = params.get("max_instancias_por_cluster")
+    rng = np.random.default_rng(params.get("semente", 42))
+    partes = list(_partes_dataframe(fonte) if isinstance(fonte, pd.DataFrame) else _partes_dataset(fonte))
+    acoes = {nivel: action_for_load(nivel) for nivel in NIVEIS}
+
+    resumos = []
+    for parte in partes:
+        hora, media, pred = parte.resumo()
+        hora = hora.astype(np.int64)
+        soma = np.bincount(hora, weights=media.astype(float), minlength=24)
+        n = np.bincount(hora, minlength=24)
+        resumos.append({
+            "media": float(pred.mean()),
+            "por_hora": [(h, float(soma[h]), int(n[h])) for h in np.flatnonzero(n).tolist()],
+        })
+    medias = pd.Series([r["media"] for r in resumos], index=pd.Index([p.cluster for p in partes], name="cluster"),
+                       name="prediction", dtype=float)
+    clusters = [int(c) for c in medias.index.tolist()]
+    preds = [round(p) for p in medias.to_numpy(dtype=float).tolist()]
+    niveis = label_load_vetorizado(np.asarray(preds, dtype=float)).tolist()
+    for r, pred, level in zip(resumos, preds, niveis):
+        r.update(pred=pred, level=level, action=acoes[level])
+
+    def gerar_clusters():
+        for cluster_id, parte, pred, level in zip(clusters, partes, preds, niveis):
+            pos = _amostrar(np.arange(parte.n), limite, params.get("amostragem", "primeiras"), rng)
+            info = {
+                "cluster_id": cluster_id,
+                "baseline_prediction": pred,
+                "level": level,
+                "action": acoes[level],
+                "instances": parte.registros(None if len(pos) == parte.n else pos),
+            }
+            if limite is not None:
+                info["total_instances"] = int(parte.n)
+            yield info
+
+    report = {
+        "legend": LEGENDA,
+        "clusters": gerar_clusters() if params.get("streaming") else list(gerar_clusters()),
+        "ranking": [],
+        "horas": _agregado_por_hora(resumos),
+    }
+
+    # mesma ordenação de antes (empates incluídos)
+    rank = medias.reset_index().sort_values("prediction", ascending=False).reset_index(drop=True)
+    por_id = dict(zip(clusters, zip(preds, niveis)))
+    for i, cluster_id in enumerate(rank["cluster"].tolist()):
+        pred, level = por_id[int(cluster_id)]
         report["ranking"].append({
             "posicao": i + 1,
-            "cluster_id": int(row["cluster"]),
+            "cluster_id": int(cluster_id),
             "prediction": pred,
-            "level": lvl
+            "level": level
         })
 
     return report
+
+
+def instancias_relatorio(df: pd.DataFrame) -> pd.DataFrame:
+    """Todas as instâncias pontuadas, para o Parquet particionado por cluster
+    de onde o :func:`generate_report` lê um cluster por vez e a API serve as
+    páginas de instâncias."""
+    return df
@@ -4,20 +4,38 @@ generated using Kedro 1.0.0
 """
 
 from kedro.pipeline import Node, Pipeline  # noqa
-from mine_tracker.pipelines.inference.nodes import inferencia, generate_report
+from mine_tracker.pipelines.inference.nodes import inferencia_por_servidor, inferencia_em_lotes, generate_report, instancias_relatorio
 
 def create_pipeline(**kwargs) -> Pipeline:
     return Pipeline([
         Node(
-            func=inferencia,
-            inputs=["best_model", "input_inference"],
+            func=inferencia_por_servidor,
+            inputs=["best_model_compacto", "registro_modelos", "input_inference"],
             outputs="output_inference",
             name="inferencia_node",
         ),
         Node(
-            func=generate_report,
+            func=instancias_relatorio,
             inputs="output_inference",
+            outputs="report_inference_instancias@pandas",
+            name="instancias_relatorio_node",
+        ),
+        Node(
+            func=generate_report,
+            inputs=["report_inference_instancias@arrow", "params:relatorio"],
             outputs="report_inference",
             name="generate_report_node",
         ),
     ])
+
+
+def create_batch_pipeline(**kwargs) -> Pipeline:
+    """Pontua toda a tabela de features em lotes (backtest), gravando a saída aos pedaços."""
+    return Pipeline([
+        Node(
+            func=inferencia_em_lotes,
+            inputs=["best_model_compacto", "minecraft_servidores_features@arrow", "params:inferencia_lotes"],
+            outputs="output_inference_lotes",
+            name="inferencia_em_lotes_node",
+        ),
+    ])
@@ -0,0 +1,414 @@
+"""
+Serviço de inferência de longa duração, com micro-lotes.
+
+O modelo é carregado uma vez (``best_model_compacto`` do catálogo, mais o
+``registro_modelos`` quando existe) e um ``ThreadingHTTPServer`` atende
+``POST /predict``. Cada requisição entra numa fila; uma thread junta o que
+chegou em um lote (até ``max_lote`` linhas ou ``max_espera_ms`` depois da
+primeira) e chama :func:`inferencia_por_servidor` uma vez para o lote
+inteiro, devolvendo a cada requisição só as suas linhas. Como no node
+``inferencia_node``, linhas com ``ip`` de um servidor do registro usam o
+modelo dele e as demais o global: o serviço e o pipeline dão a mesma
+predição para a mesma entrada.
+
+Uso::
+
+    python -m mine_tracker.pipelines.inference.servico --porta 8902
+
+Corpo do ``POST /predict``: uma lista de registros, um dicionário de colunas
+ou ``{"instances": [...]}``, com as colunas de FEATURES (e ``ip``,
+opcional). Resposta:
+``{"predictions": [...]}``; valor não numérico numa coluna do modelo é 400
+só para quem o enviou. ``GET /saude`` informa o modelo e os lotes.
+
+Com ``--workers N`` (N > 1) o processo principal carrega o modelo compacto
+(arrays mapeados em memória) e aquece as páginas *antes* do fork; os N
+workers herdam o mesmo socket e as mesmas páginas somente leitura, então a
+memória do modelo não se multiplica pelo número de workers. ``GET /memoria``
+mostra RSS/PSS do worker que atendeu (e dos irmãos), lidos de
+``/proc/<pid>/smaps_rollup``.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as TempoEsgotado
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from mine_tracker.pipelines.inference.nodes import inferencia_por_servidor
+
+logger = logging.getLogger(__name__)
+
+SERVICO_PADRAO = {
+    "host": "127.0.0.1",
+    "porta": 8902,
+    "max_lote": 256,        # linhas por chamada do modelo
+    "max_espera_ms": 5.0,   # quanto o primeiro pedido do lote espera por companhia
+    "max_fila": 10000,      # pedidos aguardando; acima disso responde 503
+    "timeout_segundos": 10.0,  # sem resposta nesse prazo: 503 com Retry-After e o pedido sai da fila
+    "retry_after_segundos": 1,
+    "workers": 1,           # > 1: pré-carrega o modelo e faz fork de N workers
+}
+
+# campos de /proc/<pid>/smaps_rollup reportados (em kB)
+CAMPOS_MEMORIA = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # backlog do listen; o padrão (5) derruba conexões em rajadas
+
+
+class FilaCheia(Exception):
+    """A fila de micro-lotes está no limite; o cliente deve tentar de novo."""
+
+
+class MicroLote:
+    """Agrupa pedidos concorrentes e chama ``funcao(df)`` uma vez por lote.
+
+    ``funcao`` recebe o ``DataFrame`` concatenado e devolve um com a coluna
+    ``prediction`` na mesma ordem das linhas.
+    """
+
+    def __init__(
+        self,
+        funcao: Callable[[pd.DataFrame], pd.DataFrame],
+        max_lote: int = 256,
+        max_espera_ms: float = 5.0,
+        max_fila: int = 10000,
+    ):
+        self._funcao = funcao
+        self._max_lote = max_lote
+        self._max_espera = max_espera_ms / 1000.0
+        self._max_fila = max_fila
+        self._iniciar()
+
+    def _iniciar(self) -> None:
+        self._fila: "queue.Queue[Optional[Tuple[pd.DataFrame, Future]]]" = queue.Queue(maxsize=self._max_fila)
+        self.lotes = 0
+        self.pedidos = 0
+        self.cancelados = 0
+        self._thread = threading.Thread(target=self._laco, name="micro-lote", daemon=True)
+        self._thread.start()
+
+    def reiniciar_apos_fork(self) -> None:
+        """Threads não sobrevivem ao ``fork``: cada worker cria fila e thread próprias."""
+        self._iniciar()
+
+    def enviar(self, df: pd.DataFrame) -> Future:
+        futuro: Future = Future()
+        try:
+            self._fila.put_nowait((df, futuro))
+        except queue.Full:
+            raise FilaCheia() from None
+        return futuro
+
+    def prever(self, df: pd.DataFrame, timeout: Optional[float] = None) -> np.ndarray:
+        """Predições de ``df``. Se o prazo vence com o pedido ainda na fila, ele
+        é cancelado (não entra em nenhum lote) e ``TimeoutError`` sobe."""
+        futuro = self.enviar(df)
+        try:
+            return futuro.result(timeout)
+        except TempoEsgotado:
+            futuro.cancel()  # sem efeito se o lote dele já está rodando
+            raise
+
+    def fechar(self) -> None:
+        self._fila.put(None)
+        self._thread.join()
+
+    def _juntar(self, primeiro) -> Tuple[List[Tuple[pd.DataFrame, Future]], bool]:
+        itens, linhas = [primeiro], len(primeiro[0])
+        prazo = time.monotonic() + self._max_espera
+        while linhas < self._max_lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                item = self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            if item is None:
+                return itens, True
+            itens.append(item)
+            linhas += len(item[0])
+        return itens, False
+
+    def _laco(self) -> None:
+        while True:
+            primeiro = self._fila.get()
+            if primeiro is None:
+                return
+            itens, parar = self._juntar(primeiro)
+            self._processar(itens)
+            if parar:
+                return
+
+    def _processar(self, itens: List[Tuple[pd.DataFrame, Future]]) -> None:
+        # pedidos cujo cliente desistiu ficam de fora; os demais não podem mais ser cancelados
+        vivos = [(df, futuro) for df, futuro in itens if futuro.set_running_or_notify_cancel()]
+        self.cancelados += len(itens) - len(vivos)
+        itens = vivos
+        if not itens:
+            return
+        try:
+            lote = pd.concat([df for df, _ in itens], ignore_index=True)
+            pred = self._funcao(lote)["prediction"].to_numpy()
+        except Exception as e:  # noqa: BLE001 - o erro volta só para o pedido que o causou
+            if len(itens) == 1:
+                itens[0][1].set_exception(e)
+                return
+            # um pedido ruim não derruba os outros: cada um é refeito sozinho
+            logger.warning(f"Lote de {len(itens)} pedidos falhou ({e}); refazendo um a um")
+            for df, futuro in itens:
+                try:
+                    futuro.set_result(self._funcao(df)["prediction"].to_numpy())
+                except Exception as erro:  # noqa: BLE001
+                    futuro.set_exception(erro)
+            self.lotes += len(itens)
+            self.pedidos += len(itens)
+            return
+        self.lotes += 1
+        self.pedidos += len(itens)
+        inicio = 0
+        for df, futuro in itens:
+            futuro.set_result(pred[inicio:inicio + len(df)])
+            inicio += len(df)
+
+
+def relatorio_memoria_processo(pid: Any = "self") -> Dict[str, Any]:
+    """Memória de um processo pelo ``smaps_rollup`` (kB). ``Pss`` divide as
+    páginas compartilhadas entre quem as usa: é a conta justa por worker."""
+    relatorio: Dict[str, Any] = {"pid": os.getpid() if pid == "self" else int(pid)}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for linha in f:
+                campo, _, valor = linha.partition(":")
+                if campo in CAMPOS_MEMORIA:
+                    relatorio[f"{campo.lower()}_kb"] = int(valor.split()[0])
+    except OSError:
+        import resource  # fora do Linux: só o pico de RSS do próprio processo
+
+        relatorio["rss_max_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return relatorio
+
+
+def _irmaos(pai: int) -> List[int]:
+    """PIDs dos outros filhos de ``pai`` (os demais workers do pré-fork)."""
+    pids = []
+    for nome in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not nome.isdigit() or int(nome) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat", encoding="ascii") as f:
+                # o nome do processo pode ter espaços; o ppid é o 2º campo depois do ')'
+                if int(f.read().rpartition(")")[2].split()[1]) == pai:
+                    pids.append(int(nome))
+        except (OSError, ValueError, IndexError):
+            continue
+    return sorted(pids)
+
+
+def _ler_instancias(corpo: Any) -> pd.DataFrame:
+    if isinstance(corpo, dict) and "instances" in corpo:
+        corpo = corpo["instances"]
+    if isinstance(corpo, dict):
+        corpo = {k: v if isinstance(v, list) else [v] for k, v in corpo.items()}
+    return pd.DataFrame(corpo)
+
+
+def _validar_instancias(df: pd.DataFrame, colunas: List[str]) -> pd.DataFrame:
+    """Colunas do modelo convertidas para número (``float64``, ausentes como
+    NaN para o imputer). Valor não numérico levanta ``ValueError`` antes de o
+    pedido entrar na fila, então ele não derruba o lote dos outros clientes."""
+    df = df.copy()
+    for coluna in colunas:
+        try:
+            df[coluna] = pd.to_numeric(df[coluna], errors="raise").astype("float64")
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Coluna {coluna!r} com valor não numérico: {e}") from None
+    return df
+
+
+def criar_servidor(
+    modelo, params: Optional[Dict[str, Any]] = None, registro: Optional[Dict[str, Any]] = None
+) -> Tuple[ThreadingHTTPServer, MicroLote]:
+    """Monta o servidor HTTP e a fila de micro-lotes em volta de ``modelo``
+    (o global) e do ``registro`` de modelos por servidor, se houver (sem
+    iniciar o ``serve_forever``)."""
+    params = {**SERVICO_PADRAO, **(params or {})}
+    colunas = list(getattr(modelo, "meta", {}).get("colunas", []))
+    micro = MicroLote(
+        lambda df: inferencia_por_servidor(modelo, registro, df),
+        max_lote=params["max_lote"],
+        max_espera_ms=params["max_espera_ms"],
+        max_fila=params["max_fila"],
+    )
+
+    def _memoria() -> Dict[str, Any]:
+        relatorio = {
+            "worker": relatorio_memoria_processo(),
+            "modelo_bytes": modelo.tamanho_bytes() if hasattr(modelo, "tamanho_bytes") else None,
+            "modelo_mapeado": bool(getattr(modelo, "mapeado", False)),
+        }
+        if params.get("workers", 1) > 1:
+            relatorio["irmaos"] = [relatorio_memoria_processo(pid) for pid in _irmaos(os.getppid())]
+        return relatorio
+
+    tentar_de_novo = {"Retry-After": str(params["retry_after_segundos"])}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _responder(self, status: int, corpo: Dict[str, Any], cabecalhos: Optional[Dict[str, str]] = None) -> None:
+            dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):  # noqa: N802
+            if self.path == "/memoria":
+                return self._responder(200, _memoria())
+            if self.path != "/saude":
+                return self._responder(404, {"erro": "rota não encontrada"})
+            self._responder(200, {
+                "modelo": getattr(modelo, "meta", {}).get("estimador", type(modelo).__name__),
+                "colunas": colunas,
+                "modelos_por_servidor": len((registro or {}).get("modelos", {})),
+                "lotes": micro.lotes,
+                "pedidos": micro.pedidos,
+                "cancelados": micro.cancelados,
+                "pedidos_por_lote": round(micro.pedidos / micro.lotes, 2) if micro.lotes else None,
+            })
+
+        def do_POST(self):  # noqa: N802
+            if self.path != "/predict":
+                return self._responder(404, {"erro": "rota não encontrada"})
+            try:
+                tamanho = int(self.headers.get("Content-Length", 0))
+                df = _ler_instancias(json.loads(self.rfile.read(tamanho) or b"null"))
+            except (ValueError, TypeError) as e:
+                return self._responder(400, {"erro": f"JSON inválido: {e}"})
+            faltantes = [c for c in colunas if c not in df.columns]
+            if faltantes:
+                return self._responder(400, {"erro": f"Colunas faltantes: {faltantes}"})
+            if len(df) == 0:
+                return self._responder(200, {"predictions": []})
+            try:
+                df = _validar_instancias(df, colunas)
+            except ValueError as e:
+                return self._responder(400, {"erro": str(e)})
+            try:
+                pred = micro.prever(df, timeout=params["timeout_segundos"])
+            except FilaCheia:
+                return self._responder(503, {"erro": "fila cheia, tente novamente"}, tentar_de_novo)
+            except TempoEsgotado:
+                return self._responder(503, {"erro": "tempo esgotado na fila de inferência, tente novamente"}, tentar_de_novo)
+            except Exception as e:  # noqa: BLE001
+                logger.exception("Falha na inferência")
+                return self._responder(500, {"erro": str(e)})
+            self._responder(200, {"predictions": pred.tolist()})
+
+        def log_message(self, format, *args):  # noqa: A002 - assinatura do BaseHTTPRequestHandler
+            logger.debug(format, *args)
+
+    return _Servidor((params["host"], params["porta"]), Handler), micro
+
+
+def servir_preforkado(servidor: ThreadingHTTPServer, micro: MicroLote, workers: int) -> None:
+    """Faz fork de ``workers`` processos que atendem no mesmo socket.
+
+    Tudo que foi carregado antes (modelo mapeado em memória, imports) é
+    compartilhado com os filhos; o processo principal só espera e repassa
+    SIGINT/SIGTERM para eles.
+    """
+    micro.fechar()  # a thread do pai não vai para os filhos
+    filhos = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+            micro.reiniciar_apos_fork()
+            try:
+                servidor.serve_forever()
+            finally:
+                os._exit(0)
+        filhos.append(pid)
+    logger.info(f"{workers} workers iniciados: {filhos}")
+
+    def encerrar(*_):
+        for pid in filhos:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+    for pid in filhos:
+        while True:
+            try:
+                os.waitpid(pid, 0)
+                break
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+    servidor.server_close()
+
+
+def _carregar_do_projeto(caminho_projeto: str) -> Tuple[Any, Optional[Dict[str, Any]], Dict[str, Any]]:
+    """Carrega ``best_model_compacto``, ``registro_modelos`` (``None`` se o
+    pipeline ainda não o gerou) e ``params:servico`` pelo catálogo do projeto."""
+    from kedro.framework.session import KedroSession
+    from kedro.framework.startup import bootstrap_project
+
+    bootstrap_project(caminho_projeto)
+    with KedroSession.create(project_path=caminho_projeto) as sessao:
+        contexto = sessao.load_context()
+        catalogo = contexto.catalog
+        registro = catalogo.load("registro_modelos") if catalogo.exists("registro_modelos") else None
+        return catalogo.load("best_model_compacto"), registro, contexto.params.get("servico", {})
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serviço HTTP de inferência com micro-lotes")
+    parser.add_argument("--projeto", default=".", help="diretório do projeto Kedro")
+    parser.add_argument("--host")
+    parser.add_argument("--porta", type=int)
+    parser.add_argument("--workers", type=int, help="processos atendendo no mesmo socket (pré-fork)")
+    args = parser.parse_args(argv)
+
+    modelo, registro, params = _carregar_do_projeto(args.projeto)
+    cli = {"host": args.host, "porta": args.porta, "workers": args.workers}
+    params = {**SERVICO_PADRAO, **params, **{k: v for k, v in cli.items() if v is not None}}
+    if hasattr(modelo, "aquecer"):
+        modelo.aquecer()
+    servidor, micro = criar_servidor(modelo, params, registro)
+    logger.info(f"Serviço de inferência em http://{servidor.server_address[0]}:{servidor.server_address[1]}/predict")
+    if params["workers"] > 1:
+        servir_preforkado(servidor, micro, params["workers"])
+        return
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        micro.fechar()
+
+
+if __name__ == "__main__":
+    main()
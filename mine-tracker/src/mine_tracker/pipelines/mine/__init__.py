@@ -3,8 +3,8 @@ This is a boilerplate pipeline 'mine'
 generated using Kedro 1.0.0
 """
 
-from .pipeline import create_pipeline
+from .pipeline import create_incremental_pipeline, create_pipeline
 
-__all__ = ["create_pipeline"]
+__all__ = ["create_pipeline", "create_incremental_pipeline"]
 
 __version__ = "0.1"
@@ -0,0 +1,557 @@
+"""
+Coleta contínua das leituras dos servidores com features atualizadas a cada amostra.
+
+As leituras (``timestamp`` em ms, ``ip``, ``playerCount``, o formato dos CSVs
+do minetrack) chegam de uma *fonte* e o :class:`ColetorStreaming` mantém, por
+servidor, um buffer circular das últimas ``janela`` leituras com soma e
+contagem correntes, a leitura anterior e o total corrente da rede. Cada
+amostra custa O(1):
+
+- ``media_movel_10``: média das últimas 10 leituras válidas do servidor
+  (mesma janela do ``rolling(10, min_periods=1)`` de ``gerar_features``);
+- ``pct_var_jogadores``: variação percentual sobre a leitura anterior;
+- ``proporcao_rede``: leitura atual sobre o total da rede, a soma da última
+  leitura de cada servidor ativo (igual à soma por ``timestamp`` do lote
+  quando todos os servidores são lidos na mesma rodada, como no minetrack).
+
+:meth:`ColetorStreaming.quadro` devolve a qualquer momento uma linha por
+servidor no esquema do ``input_inference`` (FEATURES + ``cluster``), mais
+``ip`` para a inferência usar o modelo do servidor. ``cluster`` é o perfil de
+carga do servidor, como nos clusters simulados da coleta original: a faixa
+da ``media_movel_10`` entre os ``limites_cluster`` (0 = abaixo do primeiro
+limite), então o relatório tem ``len(limites_cluster) + 1`` clusters no
+máximo. Features indefinidas (uma leitura só, variação sobre 0 jogadores)
+ficam como NaN para o imputer do modelo, como no ``preprocess_data``.
+Servidores sem leitura há mais de ``expiracao_segundos`` (no tempo dos
+dados) saem do quadro e do total da rede.
+
+Fontes (``criar_fonte``; ``tipo`` também aceita ``pacote.modulo.Classe``):
+
+- ``replay``: reproduz um DataFrame do raw ou CSVs diários, opcionalmente
+  só as últimas ``janela_horas`` e no ritmo original (``velocidade``);
+- ``arquivo``: acompanha um arquivo de linhas CSV/JSON, como ``tail -f``;
+- ``socket``: servidor TCP que recebe linhas CSV/JSON de vários clientes.
+
+Processo contínuo, regravando o ``input_inference`` a cada ``intervalo``::
+
+    mine-tracker-coletor --fonte socket --porta 8903
+    mine-tracker-coletor --fonte arquivo --caminho leituras.csv
+"""
+import abc
+import argparse
+import importlib
+import json
+import logging
+import math
+import os
+import queue
+import socketserver
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from mine_tracker.pipelines.mine.esquema import ESQUEMA_INFERENCIA, aplicar_esquema
+
+logger = logging.getLogger(__name__)
+
+COLUNAS_FEATURES = [c for c in ESQUEMA_INFERENCIA if c != "cluster"]
+ESQUEMA_QUADRO = {**ESQUEMA_INFERENCIA, "ip": "category"}
+
+
+class Amostra(NamedTuple):
+    timestamp_ms: int
+    ip: str
+    jogadores: float
+
+
+def _para_ms(valor: Any) -> int:
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        ts = pd.Timestamp(valor)
+        return (ts.tz_localize("UTC") if ts.tzinfo is None else ts).value // 1_000_000
+
+
+def ler_linha(linha: Union[str, bytes]) -> Optional[Amostra]:
+    """Uma leitura de uma linha CSV (``timestamp,ip,playerCount``) ou JSON
+    (``{"timestamp": ..., "ip": ..., "playerCount": ...}``). Cabeçalho,
+    linha vazia ou inválida: ``None``."""
+    if isinstance(linha, bytes):
+        linha = linha.decode("utf-8", errors="replace")
+    linha = linha.strip()
+    if not linha or linha.startswith("timestamp"):
+        return None
+    try:
+        if linha.startswith("{"):
+            registro = json.loads(linha)
+            ts, ip, jogadores = registro["timestamp"], registro["ip"], registro.get("playerCount")
+        else:
+            ts, ip, jogadores = linha.split(",")[:3]
+        jogadores = float(jogadores) if jogadores not in ("", None) else math.nan
+        return Amostra(_para_ms(ts), str(ip).strip(), jogadores)
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+# =========================
+# Fontes
+# =========================
+class Fonte(abc.ABC):
+    """Iterável de :class:`Amostra`; ``fechar()`` encerra a iteração (de outra thread)."""
+
+    def __init__(self):
+        self._parar = threading.Event()
+        self.invalidas = 0
+
+    def fechar(self) -> None:
+        self._parar.set()
+
+    @abc.abstractmethod
+    def __iter__(self) -> Iterator[Amostra]:
+        """Amostras na ordem em que chegam, até a fonte acabar ou ``fechar()``."""
+
+    def _ler(self, linha) -> Optional[Amostra]:
+        if isinstance(linha, bytes):
+            linha = linha.decode("utf-8", errors="replace")
+        amostra = ler_linha(linha)
+        if amostra is None and linha.strip() and not linha.lstrip().startswith("timestamp"):
+            self.invalidas += 1
+        return amostra
+
+
+class FonteReplay(Fonte):
+    """Reproduz leituras já coletadas: o DataFrame do raw (``timestamp``,
+    ``ip``, ``playerCount``) ou CSVs diários do minetrack, na ordem das linhas.
+
+    ``janela_horas`` limita às últimas horas dos dados; ``velocidade`` (ex.:
+    60 = um minuto por segundo) espera entre as leituras como no original,
+    ``None`` reproduz tudo de uma vez.
+    """
+
+    def __init__(
+        self,
+        dados: Union[pd.DataFrame, str, List[str]],
+        janela_horas: Optional[float] = None,
+        velocidade: Optional[float] = None,
+    ):
+        super().__init__()
+        self.dados = dados
+        self.janela_horas = janela_horas
+        self.velocidade = velocidade
+
+    def _tabela(self) -> pd.DataFrame:
+        if isinstance(self.dados, pd.DataFrame):
+            return self.dados
+        caminhos = [self.dados] if isinstance(self.dados, (str, os.PathLike)) else list(self.dados)
+        tabela = pd.concat([pd.read_csv(c) for c in caminhos], ignore_index=True)
+        tabela["timestamp"] = pd.to_datetime(tabela["timestamp"], unit="ms", errors="coerce", utc=True)
+        return tabela
+
+    def __iter__(self) -> Iterator[Amostra]:
+        tabela = self._tabela()
+        ts = pd.to_datetime(tabela["timestamp"], errors="coerce", utc=True)
+        validas = ts.notna().to_numpy() & tabela["ip"].notna().to_numpy()
+        if self.janela_horas is not None and validas.any():
+            validas &= (ts >= ts[validas].max() - pd.Timedelta(hours=self.janela_horas)).to_numpy()
+        ms = ts[validas].dt.as_unit("ms").astype("int64").to_numpy()
+        ips = tabela["ip"][validas].astype(str).to_numpy()
+        jogadores = tabela["playerCount"][validas].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        anterior = None
+        for t, ip, valor in zip(ms.tolist(), ips.tolist(), jogadores.tolist()):
+            if self.velocidade and anterior is not None and t > anterior:
+                if self._parar.wait((t - anterior) / 1000 / self.velocidade):
+                    return
+            elif self._parar.is_set():
+                return
+            anterior = t
+            yield Amostra(t, ip, valor)
+
+
+class FonteArquivo(Fonte):
+    """Lê linhas CSV/JSON de um arquivo e, com ``seguir``, continua esperando
+    linhas novas (como ``tail -f``), reabrindo se o arquivo for truncado ou
+    trocado (rotação). Linhas incompletas esperam o ``\\n``."""
+
+    def __init__(self, caminho: str, seguir: bool = True, intervalo_segundos: float = 0.5, do_inicio: bool = True):
+        super().__init__()
+        self.caminho = caminho
+        self.seguir = seguir
+        self.intervalo_segundos = intervalo_segundos
+        self.do_inicio = do_inicio
+
+    def _trocado(self, arquivo) -> bool:
+        try:
+            st = os.stat(self.caminho)
+        except FileNotFoundError:
+            return False
+        return st.st_ino != os.fstat(arquivo.fileno()).st_ino or st.st_size < arquivo.tell()
+
+    def __iter__(self) -> Iterator[Amostra]:
+        arquivo, pendente, primeira = None, "", True
+        try:
+            while not self._parar.is_set():
+                if arquivo is None:
+                    try:
+                        arquivo = open(self.caminho, encoding="utf-8", errors="replace")
+                    except FileNotFoundError:
+                        if not self.seguir:
+                            return
+                        self._parar.wait(self.intervalo_segundos)
+                        continue
+                    if primeira and not self.do_inicio:
+                        arquivo.seek(0, os.SEEK_END)
+                    primeira = False
+                linha = arquivo.readline()
+                if linha.endswith("\n"):
+                    amostra = self._ler(pendente + linha)
+                    pendente = ""
+                    if amostra is not None:
+                        yield amostra
+                    continue
+                pendente += linha
+                if not self.seguir:
+                    amostra = self._ler(pendente)
+                    if amostra is not None:
+                        yield amostra
+                    return
+                if self._trocado(arquivo):
+                    arquivo.close()
+                    arquivo, pendente = None, ""
+                    continue
+                self._parar.wait(self.intervalo_segundos)
+        finally:
+            if arquivo is not None:
+                arquivo.close()
+
+
+class _ConexaoLinhas(socketserver.StreamRequestHandler):
+    def handle(self):
+        fonte = self.server.fonte
+        for linha in self.rfile:
+            amostra = fonte._ler(linha)
+            while amostra is not None and not fonte._parar.is_set():
+                try:
+                    # fila cheia: segura o cliente (contrapressão pelo TCP)
+                    fonte._fila.put(amostra, timeout=0.2)
+                    break
+                except queue.Full:
+                    continue
+            if fonte._parar.is_set():
+                return
+
+
+class FonteSocket(Fonte):
+    """Servidor TCP de linhas CSV/JSON, uma leitura por linha, de quantos
+    clientes conectarem. O socket abre na criação (``porta=0`` escolhe uma
+    livre; ver ``endereco``)."""
+
+    def __init__(self, host: str = "127.0.0.1", porta: int = 8903, max_fila: int = 100_000):
+        super().__init__()
+        self._fila: "queue.Queue[Amostra]" = queue.Queue(maxsize=max_fila)
+        self._servidor = socketserver.ThreadingTCPServer((host, porta), _ConexaoLinhas)
+        self._servidor.daemon_threads = True
+        self._servidor.fonte = self
+
+    @property
+    def endereco(self):
+        return self._servidor.server_address
+
+    def __iter__(self) -> Iterator[Amostra]:
+        thread = threading.Thread(target=self._servidor.serve_forever, kwargs={"poll_interval": 0.2}, daemon=True)
+        thread.start()
+        try:
+            while not self._parar.is_set():
+                try:
+                    yield self._fila.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+        finally:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+
+FONTES = {"replay": FonteReplay, "arquivo": FonteArquivo, "socket": FonteSocket}
+
+
+def criar_fonte(config: Dict[str, Any], dados: Optional[pd.DataFrame] = None) -> Fonte:
+    """Instancia a fonte de ``config['tipo']`` (nome em ``FONTES`` ou caminho
+    ``pacote.modulo.Classe``) com o resto de ``config`` como argumentos.
+    ``replay`` sem ``dados`` na configuração reproduz ``dados`` (o raw)."""
+    config = dict(config)
+    tipo = config.pop("tipo", "replay")
+    if tipo in FONTES:
+        classe = FONTES[tipo]
+    else:
+        modulo, _, nome = tipo.rpartition(".")
+        classe = getattr(importlib.import_module(modulo), nome)
+    if classe is FonteReplay and "dados" not in config:
+        config["dados"] = dados
+    return classe(**config)
+
+
+# =========================
+# Coletor
+# =========================
+def perfil_de_carga(media: np.ndarray, limites: Sequence[float]) -> np.ndarray:
+    """Código do cluster de cada média: quantos ``limites`` ela alcança.
+    Sem leitura válida na janela (NaN) o servidor fica no perfil mais baixo."""
+    media = np.asarray(media, dtype=float)
+    return np.searchsorted(np.asarray(limites, dtype=float), np.nan_to_num(media, nan=-np.inf), side="right")
+
+
+class _EstadoServidor:
+    __slots__ = ("janela", "soma", "validos", "atual", "pct", "timestamp_ms")
+
+    def __init__(self, janela: int):
+        self.janela: deque = deque(maxlen=janela)
+        self.soma = 0.0
+        self.validos = 0
+        self.atual: Optional[float] = None
+        self.pct = math.nan
+        self.timestamp_ms = -1
+
+
+def _contribuicao(valor: Optional[float]) -> float:
+    return 0.0 if valor is None or math.isnan(valor) else valor
+
+
+def _pct(atual: float, anterior: Optional[float]) -> float:
+    if anterior is None or math.isnan(anterior) or math.isnan(atual):
+        return math.nan
+    if anterior == 0:
+        return math.nan if atual == 0 else math.inf
+    return (atual / anterior - 1) * 100
+
+
+class ColetorStreaming:
+    """Estado corrente de cada servidor, atualizado em O(1) por amostra (ver o
+    docstring do módulo). Seguro para uma thread alimentando e outras
+    pedindo ``quadro()``."""
+
+    def __init__(
+        self,
+        janela: int = 10,
+        expiracao_segundos: Optional[float] = 4 * 3600,
+        limites_cluster: Sequence[float] = (30000, 60000, 90000),
+    ):
+        if list(limites_cluster) != sorted(limites_cluster):
+            raise ValueError(f"limites_cluster deve estar em ordem crescente, veio {list(limites_cluster)}")
+        self.janela = janela
+        self.expiracao_ms = None if expiracao_segundos is None else int(expiracao_segundos * 1000)
+        self.limites_cluster = list(limites_cluster)
+        # ordem = última atualização: os expirados ficam sempre no começo
+        self._servidores: "OrderedDict[str, _EstadoServidor]" = OrderedDict()
+        self._total_rede = 0.0
+        self._ultimo_ms: Optional[int] = None
+        self._lock = threading.Lock()
+        self.amostras = 0
+        self.descartadas = 0
+
+    def adicionar(self, amostra: Amostra) -> bool:
+        """Incorpora uma leitura; leituras fora de ordem de um servidor são descartadas."""
+        ts, ip, valor = amostra
+        with self._lock:
+            estado = self._servidores.get(ip)
+            if estado is None:
+                estado = self._servidores[ip] = _EstadoServidor(self.janela)
+            elif ts <= estado.timestamp_ms:
+                self.descartadas += 1
+                return False
+
+            janela = estado.janela
+            if len(janela) == janela.maxlen and not math.isnan(janela[0]):
+                estado.soma -= janela[0]
+                estado.validos -= 1
+            janela.append(valor)
+            if not math.isnan(valor):
+                estado.soma += valor
+                estado.validos += 1
+
+            estado.pct = _pct(valor, estado.atual)
+            self._total_rede += _contribuicao(valor) - _contribuicao(estado.atual)
+            estado.atual = valor
+            estado.timestamp_ms = ts
+            self._servidores.move_to_end(ip)
+            self.amostras += 1
+            if self._ultimo_ms is None or ts > self._ultimo_ms:
+                self._ultimo_ms = ts
+            self._expirar()
+        return True
+
+    def _expirar(self) -> None:
+        if self.expiracao_ms is None or self._ultimo_ms is None:
+            return
+        limite = self._ultimo_ms - self.expiracao_ms
+        while self._servidores:
+            ip, estado = next(iter(self._servidores.items()))
+            if estado.timestamp_ms >= limite:
+                break
+            self._total_rede -= _contribuicao(estado.atual)
+            del self._servidores[ip]
+        if not self._servidores:
+            self._total_rede = 0.0
+
+    def consumir(self, fonte: Fonte, duracao_segundos: Optional[float] = None) -> int:
+        """Alimenta o coletor com ``fonte`` até ela acabar ou ``duracao_segundos``
+        passar (aí a fonte é fechada). Devolve quantas amostras entraram."""
+        temporizador = None
+        if duracao_segundos is not None:
+            temporizador = threading.Timer(duracao_segundos, fonte.fechar)
+            temporizador.daemon = True
+            temporizador.start()
+        antes = self.amostras
+        try:
+            for amostra in fonte:
+                self.adicionar(amostra)
+        finally:
+            if temporizador is not None:
+                temporizador.cancel()
+        return self.amostras - antes
+
+    def iniciar(self, fonte: Fonte) -> threading.Thread:
+        """:meth:`consumir` numa thread em segundo plano (``fonte.fechar()`` para)."""
+        thread = threading.Thread(target=self.consumir, args=(fonte,), name="coletor", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "servidores": len(self._servidores),
+                "amostras": self.amostras,
+                "descartadas": self.descartadas,
+                "total_rede": self._total_rede,
+                "ultimo_timestamp": None if self._ultimo_ms is None else pd.Timestamp(self._ultimo_ms, unit="ms", tz="UTC").isoformat(),
+            }
+
+    def quadro(self, completos: bool = False) -> pd.DataFrame:
+        """Uma linha por servidor ativo com as features atuais, no esquema do
+        ``input_inference`` + ``ip``. Features indefinidas (ex.: uma leitura
+        só, ou a última sem ``playerCount``) vêm como NaN; com ``completos``
+        esses servidores ficam de fora (e a contagem vai para o log)."""
+        with self._lock:
+            self._expirar()
+            total = self._total_rede
+            linhas = [
+                (ip, e.timestamp_ms, e.soma / e.validos if e.validos else math.nan, e.pct, e.atual)
+                for ip, e in self._servidores.items()
+            ]
+        ip, ms, media, pct, atual = (list(c) for c in zip(*linhas)) if linhas else ([],) * 5
+        ts = pd.to_datetime(pd.Series(ms, dtype="int64"), unit="ms", utc=True)
+        atual = np.asarray(atual, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            proporcao = atual / total if total else np.full(len(atual), np.nan)
+        df = pd.DataFrame({
+            "hora": ts.dt.hour,
+            "final_de_semana": (ts.dt.dayofweek >= 5).astype(int),
+            "media_movel_10": np.asarray(media, dtype=float),
+            "proporcao_rede": proporcao,
+            # como no preprocess_data do modelo: variação infinita (de 0 jogadores) vira NaN
+            "pct_var_jogadores": np.where(np.isinf(pct), np.nan, pct) if len(pct) else np.asarray(pct, dtype=float),
+            "cluster": perfil_de_carga(media, self.limites_cluster),
+            "ip": ip,
+        })
+        if completos:
+            incompletos = df[COLUNAS_FEATURES].isna().any(axis=1)
+            if incompletos.any():
+                logger.info(f"{int(incompletos.sum())} servidores com features indefinidas fora do quadro")
+            df = df[~incompletos]
+        df = df.sort_values(["cluster", "ip"]).reset_index(drop=True)
+        return aplicar_esquema(df, ESQUEMA_QUADRO)
+
+
+# =========================
+# Processo contínuo
+# =========================
+def _gravar_parquet_atomico(df: pd.DataFrame, destino: str) -> None:
+    # a inferência pode ler no meio da escrita: grava num temporário e troca
+    diretorio = os.path.dirname(os.path.abspath(destino))
+    os.makedirs(diretorio, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=diretorio, prefix=".coletor.", suffix=".parquet")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, destino)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+COLETOR_PADRAO = {
+    "fonte": {"tipo": "replay", "janela_horas": 4},
+    "janela_media": 10,
+    "expiracao_segundos": 4 * 3600,
+    "limites_cluster": [30000, 60000, 90000],
+    "duracao_segundos": None,
+    "emissao": {"saida": "data/02_intermediate/base_ultimos_4h.parquet", "intervalo_segundos": 30},
+}
+
+
+def _carregar_do_projeto(caminho_projeto: str, precisa_raw: bool):
+    """``params:mine.coletor`` (e o raw, para o replay) pelo catálogo do projeto."""
+    from kedro.framework.session import KedroSession
+    from kedro.framework.startup import bootstrap_project
+
+    bootstrap_project(caminho_projeto)
+    with KedroSession.create(project_path=caminho_projeto) as sessao:
+        contexto = sessao.load_context()
+        params = contexto.params.get("mine", {}).get("coletor", {})
+        raw = contexto.catalog.load("minecraft_servidores_raw") if precisa_raw else None
+        return params, raw
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Coletor contínuo de leituras com features em O(1) por amostra")
+    parser.add_argument("--projeto", default=".", help="diretório do projeto Kedro")
+    parser.add_argument("--fonte", help="replay | arquivo | socket | pacote.modulo.Classe")
+    parser.add_argument("--caminho", help="arquivo seguido (fonte arquivo) ou CSVs (replay)", nargs="*")
+    parser.add_argument("--host")
+    parser.add_argument("--porta", type=int)
+    parser.add_argument("--velocidade", type=float, help="replay: fator sobre o ritmo original")
+    parser.add_argument("--saida", help="parquet regravado a cada intervalo (padrão: o do input_inference)")
+    parser.add_argument("--intervalo", type=float, help="segundos entre gravações do quadro")
+    args = parser.parse_args(argv)
+
+    fonte_cli = {"tipo": args.fonte, "host": args.host, "porta": args.porta, "velocidade": args.velocidade}
+    if args.caminho:
+        fonte_cli["caminho" if args.fonte == "arquivo" else "dados"] = args.caminho[0] if args.fonte == "arquivo" else args.caminho
+    fonte_cli = {k: v for k, v in fonte_cli.items() if v is not None}
+    if args.fonte and args.fonte != "replay":
+        config_fonte = fonte_cli  # outra fonte: não herda as opções do replay do projeto
+    else:
+        config_fonte = None
+
+    params, raw = _carregar_do_projeto(args.projeto, precisa_raw=config_fonte is None and not args.caminho)
+    params = {**COLETOR_PADRAO, **params}
+    config_fonte = config_fonte or {**params["fonte"], **fonte_cli}
+    emissao = {**COLETOR_PADRAO["emissao"], **(params.get("emissao") or {})}
+    saida = os.path.join(args.projeto, args.saida or emissao["saida"])
+    intervalo = args.intervalo or emissao["intervalo_segundos"]
+
+    coletor = ColetorStreaming(params["janela_media"], params["expiracao_segundos"], params["limites_cluster"])
+    fonte = criar_fonte(config_fonte, dados=raw)
+    if isinstance(fonte, FonteSocket):
+        logger.info(f"Coletor ouvindo em {fonte.endereco[0]}:{fonte.endereco[1]}")
+    thread = coletor.iniciar(fonte)
+    try:
+        while thread.is_alive():
+            thread.join(intervalo)
+            quadro = coletor.quadro()
+            _gravar_parquet_atomico(quadro, saida)
+            logger.info(f"Quadro com {len(quadro)} servidores gravado em {saida}: {coletor.estatisticas}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fonte.fechar()
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
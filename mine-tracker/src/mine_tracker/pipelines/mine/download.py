@@ -0,0 +1,174 @@
+"""
+Download concorrente e com cache dos CSVs diários do minetrack.
+
+Cada dia vira um arquivo ``{d}-{m}-{y}.csv`` em ``cache_dir``, com um
+``.meta.json`` ao lado guardando ``ETag``/``Last-Modified`` da resposta.
+Dias antigos não mudam mais no servidor, então são servidos direto do
+cache sem tocar a rede; os dias recentes são revalidados com requisição
+condicional (``If-None-Match``/``If-Modified-Since``) e só são baixados de
+novo quando o servidor não responde ``304``. Um dia que o servidor não tem
+(``404``/``410``) também fica registrado no ``.meta.json`` e, fora da janela
+de revalidação, não é pedido de novo.
+
+Os valores padrão (URL, ``cache_dir``, tentativas...) ficam só em
+``mine.download`` nos parâmetros e em ``nodes.DOWNLOAD_PADRAO``.
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger(__name__)
+
+# Status possíveis de um dia após o download
+CACHE = "cache"            # servido do disco, sem rede
+NAO_MODIFICADO = "304"     # revalidado pelo servidor
+BAIXADO = "baixado"        # transferido agora
+ERRO = "erro"              # falhou após todas as tentativas
+INEXISTENTE = "inexistente"  # o servidor não tem o dia (404/410)
+
+
+@dataclass
+class ResultadoDia:
+    dia: date
+    url: str
+    caminho: Optional[Path]
+    status: str
+    erro: Optional[str] = None
+
+
+def nome_arquivo(dia: date) -> str:
+    """Nome do arquivo diário no formato usado pelo minetrack (sem zero à esquerda)."""
+    return f"{dia.day}-{dia.month}-{dia.year}.csv"
+
+
+def dias_no_intervalo(inicio: date, fim: date) -> List[date]:
+    """Lista os dias de ``inicio`` até ``fim`` (inclusive)."""
+    return [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+
+
+def _ler_meta(caminho_meta: Path) -> dict:
+    try:
+        with open(caminho_meta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _gravar_atomico(destino: Path, resposta) -> None:
+    """Grava o corpo da resposta num temporário e troca de nome no fim,
+    para que um download interrompido nunca deixe CSV truncado no cache."""
+    fd, tmp = tempfile.mkstemp(dir=destino.parent, prefix=f".{destino.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                bloco = resposta.read(1 << 20)
+                if not bloco:
+                    break
+                f.write(bloco)
+        os.replace(tmp, destino)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def baixar_dia(
+    dia: date,
+    *,
+    base_url: str,
+    cache_dir: str,
+    tentativas: int,
+    backoff_segundos: float,
+    timeout_segundos: float,
+    revalidar_ultimos_dias: int,
+    hoje: Optional[date] = None,
+) -> ResultadoDia:
+    """Garante o CSV de um dia no cache local e devolve onde ele está."""
+    hoje = hoje or datetime.now(timezone.utc).date()
+    url = f"{base_url.rstrip('/')}/{nome_arquivo(dia)}"
+    destino = Path(cache_dir) / nome_arquivo(dia)
+    caminho_meta = destino.with_name(destino.name + ".meta.json")
+
+    em_cache = destino.exists()
+    antigo = dia < hoje - timedelta(days=revalidar_ultimos_dias)
+    if em_cache and antigo:
+        return ResultadoDia(dia, url, destino, CACHE)
+    # dia recente pode ainda não ter sido publicado: só os antigos ficam marcados
+    if not em_cache and antigo and _ler_meta(caminho_meta).get("inexistente"):
+        return ResultadoDia(dia, url, None, INEXISTENTE, "inexistente no servidor (cache)")
+
+    headers = {}
+    if em_cache:
+        meta = _ler_meta(caminho_meta)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    ultimo_erro = None
+    for tentativa in range(tentativas):
+        try:
+            with urlopen(Request(url, headers=headers), timeout=timeout_segundos) as resposta:
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                _gravar_atomico(destino, resposta)
+                meta = {
+                    "url": url,
+                    "etag": resposta.headers.get("ETag"),
+                    "last_modified": resposta.headers.get("Last-Modified"),
+                }
+            with open(caminho_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            return ResultadoDia(dia, url, destino, BAIXADO)
+        except HTTPError as e:
+            if e.code == 304 and em_cache:
+                return ResultadoDia(dia, url, destino, NAO_MODIFICADO)
+            ultimo_erro = f"HTTP {e.code}"
+            if e.code in (404, 410) and not em_cache:
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                with open(caminho_meta, "w", encoding="utf-8") as f:
+                    json.dump({"url": url, "inexistente": True}, f)
+                return ResultadoDia(dia, url, None, INEXISTENTE, ultimo_erro)
+            # 4xx (ex.: dia inexistente) não melhora tentando de novo
+            if 400 <= e.code < 500 and e.code not in (408, 429):
+                break
+        except (URLError, OSError) as e:
+            ultimo_erro = str(getattr(e, "reason", e))
+
+        if tentativa < tentativas - 1:
+            espera = backoff_segundos * (2 ** tentativa)
+            logger.info(f"Falha em {url} ({ultimo_erro}); nova tentativa em {espera:.1f}s")
+            time.sleep(espera)
+
+    if em_cache:
+        # a revalidação falhou, mas o CSV em cache é válido: o dia não sai da execução
+        logger.warning(f"Revalidação de {url} falhou ({ultimo_erro}); usando a cópia em cache")
+        return ResultadoDia(dia, url, destino, CACHE, ultimo_erro)
+    return ResultadoDia(dia, url, None, ERRO, ultimo_erro)
+
+
+def baixar_dias(dias: Iterable[date], max_workers: int, **kwargs) -> List[ResultadoDia]:
+    """Baixa vários dias em paralelo com um pool limitado de threads.
+
+    O resultado mantém a ordem de ``dias``, independente da ordem em que os
+    downloads terminam. ``kwargs`` são repassados para :func:`baixar_dia`.
+    """
+    dias = list(dias)
+    if not dias:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(dias)))) as pool:
+        resultados = list(pool.map(lambda d: baixar_dia(d, **kwargs), dias))
+
+    contagem = {}
+    for r in resultados:
+        contagem[r.status] = contagem.get(r.status, 0) + 1
+    logger.info(f"Download de {len(dias)} dias concluído: {contagem}")
+    return resultados
@@ -0,0 +1,95 @@
+"""
+Esquema compacto de tipos das tabelas do pipeline 'mine'.
+
+Cada tabela declara o tipo mais estreito que comporta seus valores:
+categóricos para textos repetidos (ip, dia da semana, período), inteiros
+pequenos para flags/horas/códigos e float32 onde a precisão basta
+(``playerCount`` é inteiro < 2**24, exato em float32). O esquema é aplicado
+na criação das tabelas pelos nodes e repetido no ``load_args`` do catálogo.
+"""
+import logging
+import sys
+from typing import Any, Dict, Mapping
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA_RAW = {
+    "ip": "category",
+    "playerCount": "float32",
+    "data": "category",  # dia (UTC) da leitura: coluna de partição no Parquet
+}
+
+ESQUEMA_FEATURES = {
+    **ESQUEMA_RAW,
+    "hora": "int8",
+    "minuto": "int8",
+    "dia_da_semana": "category",
+    "final_de_semana": "int8",
+    "var_jogadores": "float32",
+    "pct_var_jogadores": "float32",
+    "media_movel_10": "float32",
+    "media_movel_30": "float32",
+    "desvio_movel_30": "float32",
+    "total_jogadores": "float32",
+    "proporcao_rede": "float32",
+    "flag_pico": "int8",
+    "queda_abrupta": "int8",
+    "recuperacao": "int8",
+    "periodo_dia": "category",
+    "intervalo_segundos": "float32",
+    "server_id": "int32",
+    "servidor_hora": "int32",
+}
+
+ESQUEMA_INFERENCIA = {
+    "hora": "int8",
+    "final_de_semana": "int8",
+    "media_movel_10": "float32",
+    "proporcao_rede": "float32",
+    "pct_var_jogadores": "float32",
+    "cluster": "int16",
+}
+
+
+def aplicar_esquema(df: pd.DataFrame, esquema: Mapping[str, str]) -> pd.DataFrame:
+    """Converte as colunas presentes em ``df`` para os tipos do esquema (in-place)."""
+    for coluna, tipo in esquema.items():
+        if coluna in df.columns and str(df[coluna].dtype) != tipo:
+            df[coluna] = df[coluna].astype(tipo)
+    return df
+
+
+def _bytes_sem_esquema(serie: pd.Series) -> int:
+    """Estimativa do tamanho da coluna no tipo largo que tinha antes do esquema:
+    ``object`` para categóricos e 8 bytes por valor para números."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        categorias = serie.cat.categories.astype(object)
+        tamanho = np.array([sys.getsizeof(c) for c in categorias], dtype=np.int64)
+        contagem = np.bincount(serie.cat.codes[serie.cat.codes >= 0], minlength=len(categorias))
+        return int(8 * len(serie) + (tamanho * contagem).sum())
+    if serie.dtype.kind in "biuf":
+        return 8 * len(serie)
+    return int(serie.memory_usage(deep=True, index=False))
+
+
+def relatorio_memoria_tabela(df: pd.DataFrame) -> Dict[str, Any]:
+    """Memória por coluna (tipo atual e estimativa no tipo largo) de uma tabela."""
+    colunas = {}
+    for coluna in df.columns:
+        colunas[coluna] = {
+            "dtype": str(df[coluna].dtype),
+            "bytes": int(df[coluna].memory_usage(deep=True, index=False)),
+            "bytes_sem_esquema": _bytes_sem_esquema(df[coluna]),
+        }
+    total = sum(c["bytes"] for c in colunas.values())
+    total_largo = sum(c["bytes_sem_esquema"] for c in colunas.values())
+    return {
+        "linhas": int(len(df)),
+        "bytes": total,
+        "bytes_sem_esquema": total_largo,
+        "reducao": round(total_largo / total, 2) if total else None,
+        "colunas": colunas,
+    }
@@ -5,85 +5,247 @@ generated using Kedro 1.0.0
 import pandas as pd
 import logging
 logger = logging.getLogger(__name__)
-import pandas as pd
-import random
-from datetime import datetime
-import pytz
-from datetime import datetime, timedelta
+import numpy as np
+from pandas.api.indexers import BaseIndexer
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Set
+
+from mine_tracker.pipelines.mine.coletor import COLETOR_PADRAO, COLUNAS_FEATURES, ColetorStreaming, criar_fonte
+from mine_tracker.pipelines.mine.download import baixar_dias, dias_no_intervalo
+from mine_tracker.pipelines.mine.esquema import (
+    ESQUEMA_FEATURES,
+    ESQUEMA_RAW,
+    aplicar_esquema,
+    relatorio_memoria_tabela,
+)
 
+# Únicos valores padrão do downloader (``download.baixar_dia`` não tem defaults);
+# sobrescritos por ``mine.download`` nos parâmetros
+DOWNLOAD_PADRAO = {
+    "base_url": "https://dl.minetrack.me/Java",
+    "cache_dir": "data/01_raw/minetrack_cache",
+    "max_workers": 8,
+    "tentativas": 4,
+    "backoff_segundos": 1.0,
+    "timeout_segundos": 30.0,
+    "revalidar_ultimos_dias": 2,
+}
 
-def carregar_dados():
-    """Carrega os CSVs de 02/04/2020 até 30/07/2020 (Java edition) e concatena."""
-    inicio = datetime(2022, 9, 2)
-    fim = datetime(2022, 9, 10)
+
+def _params_coleta(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Completa os parâmetros de coleta com os valores padrão."""
+    params = dict(params or {})
+    download = {**DOWNLOAD_PADRAO, **(params.get("download") or {})}
+    return {
+        "inicio": pd.Timestamp(params.get("inicio", "2022-09-02")).date(),
+        "fim": pd.Timestamp(params.get("fim", "2022-09-10")).date(),
+        "download": download,
+    }
+
+
+def _ler_csv_dia(caminho) -> pd.DataFrame:
+    """Lê um CSV diário do minetrack convertendo o timestamp (ms) para UTC e
+    acrescentando o dia (``data``), a coluna de partição do raw no disco."""
+    df = pd.read_csv(caminho)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce', utc=True)
+    df['data'] = df['timestamp'].dt.date
+    return aplicar_esquema(df, ESQUEMA_RAW)
+
+
+def carregar_dados(params: Optional[Dict[str, Any]] = None):
+    """Carrega os CSVs diários (Java edition) do intervalo configurado e concatena.
+
+    Os arquivos são baixados em paralelo para um cache local por dia
+    (ver ``download.baixar_dias``); depois são lidos do disco na ordem dos dias.
+    """
+    cfg = _params_coleta(params)
+    dias = dias_no_intervalo(cfg["inicio"], cfg["fim"])
     dados = []
 
-    dia = inicio
-    while dia <= fim:
-        url = f"https://dl.minetrack.me/Java/{dia.day}-{dia.month}-{dia.year}.csv"
+    for r in baixar_dias(dias, **cfg["download"]):
+        if r.caminho is None:
+            print(f"⚠️ erro em {r.url}: {r.erro}")
+            continue
         try:
-            df = pd.read_csv(url)
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce', utc=True)
-            dados.append(df)
-            print(f"✅ carregado {url}")
+            dados.append(_ler_csv_dia(r.caminho))
+            print(f"✅ carregado {r.url} ({r.status})")
         except Exception as e:
-            print(f"⚠️ erro em {url}: {e}")
-        dia += timedelta(days=1)
+            print(f"⚠️ erro em {r.url}: {e}")
 
     if dados:
-        return pd.concat(dados, ignore_index=True)
+        # categorias diferentes entre os dias viram object no concat; reaplica o esquema
+        return aplicar_esquema(pd.concat(dados, ignore_index=True), ESQUEMA_RAW)
     else:
         return pd.DataFrame()
 
 
-def carregar_dados_ultimas_4h(n_rows: int = 250) -> pd.DataFrame:
+def dias_ingeridos(particoes: Mapping[str, Any]) -> Set[date]:
+    """Watermark da ingestão incremental: os dias que já têm partição em disco
+    (as chaves ``YYYY-MM-DD`` de ``minecraft_servidores_raw_ingeridos``).
+
+    Um dia só entra no watermark depois que sua partição foi gravada, então
+    uma execução interrompida simplesmente refaz os dias que faltaram.
+    """
+    dias = set()
+    for chave in particoes:
+        try:
+            dias.add(date.fromisoformat(Path(chave).name.split(".")[0]))
+        except ValueError:
+            continue
+    return dias
+
+
+def carregar_dados_incremental(
+    params: Optional[Dict[str, Any]] = None,
+    ingeridos: Optional[Mapping[str, Any]] = None,
+    hoje: Optional[date] = None,
+) -> Dict[str, Callable[[], pd.DataFrame]]:
+    """Ingere apenas os dias ainda não presentes em ``minecraft_servidores_raw_particoes``
+    (recebidas em ``ingeridos``, sem ler os dados).
+
+    Considera o intervalo de ``mine.inicio`` até ontem (ou ``mine.incremental.fim``),
+    descarta os dias já no watermark e devolve uma partição por dia novo
+    (chave ``YYYY-MM-DD``). As partições são funções: o ``PartitionedDataset``
+    lê e grava um dia por vez, então o pico de memória é de um dia só.
     """
-    Simula a coleta de dados coerente com clusters conhecidos,
-    usando horário do Brasil e variação de ±1h.
-    Gera múltiplas linhas por cluster para criar base de inferência.
+    cfg = _params_coleta(params)
+    incremental = (params or {}).get("incremental") or {}
+    hoje = hoje or datetime.now(timezone.utc).date()
+    fim = incremental.get("fim")
+    # o dia corrente ainda está sendo escrito no minetrack; só entra quando fechar
+    fim = pd.Timestamp(fim).date() if fim else hoje - timedelta(days=1)
+
+    ja_ingeridos = dias_ingeridos(ingeridos or {})
+    pendentes = [d for d in dias_no_intervalo(cfg["inicio"], fim) if d not in ja_ingeridos]
+    logger.info(f"Ingestão incremental: {len(ja_ingeridos)} dias já ingeridos, {len(pendentes)} novos.")
+
+    particoes = {}
+    for r in baixar_dias(pendentes, hoje=hoje, **cfg["download"]):
+        if r.caminho is None:
+            print(f"⚠️ erro em {r.url}: {r.erro}")
+            continue
+        particoes[r.dia.isoformat()] = (lambda caminho=r.caminho: _ler_csv_dia(caminho))
+        print(f"✅ carregado {r.url} ({r.status})")
+    return particoes
+
+
+def coletar_ultimas_4h(raw: pd.DataFrame, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """Features atuais de cada servidor para a inferência, pelo coletor contínuo.
+
+    Alimenta um ``ColetorStreaming`` com a fonte de ``mine.coletor.fonte``
+    (padrão: replay das últimas 4h do raw) e devolve o quadro no esquema do
+    ``input_inference``, uma linha por servidor (``cluster`` é o perfil de
+    carga do servidor, a faixa da ``media_movel_10`` entre os
+    ``limites_cluster``), mais ``ip``. Servidores com alguma feature
+    indefinida continuam no quadro, com NaN para o imputer do modelo. Fontes
+    contínuas (``socket``, ``arquivo``) são lidas por ``duracao_segundos``;
+    para manter o ``input_inference`` sempre atualizado use o processo
+    ``mine-tracker-coletor``.
     """
-    tz = pytz.timezone("America/Sao_Paulo")
-    now = datetime.now(tz)
-
-    # clusters e horários base
-    clusters_config = {
-        0: {"hora_base": 10, "media_range": (58000, 62000)},
-        1: {"hora_base": 18, "media_range": (68000, 72000)},
-        2: {"hora_base": 21, "media_range": (87000, 91000)},
-        3: {"hora_base": 3,  "media_range": (38000, 42000)},
-    }
+    cfg = {**COLETOR_PADRAO, **(params or {})}
+    coletor = ColetorStreaming(cfg["janela_media"], cfg["expiracao_segundos"], cfg["limites_cluster"])
+    fonte = criar_fonte(cfg["fonte"], dados=raw)
+    coletor.consumir(fonte, cfg.get("duracao_segundos"))
+    quadro = coletor.quadro()
+    incompletos = int(quadro[COLUNAS_FEATURES].isna().any(axis=1).sum())
+    logger.info(
+        f"Coletor: {len(quadro)} servidores no quadro de inferência, {incompletos} com features indefinidas "
+        f"(imputadas pelo modelo) ({coletor.estatisticas})"
+    )
+    return quadro
+
+class _JanelaPorServidor(BaseIndexer):
+    """Janela móvel de ``window_size`` linhas que não atravessa a fronteira
+    entre servidores. Espera os dados ordenados por servidor e recebe em
+    ``inicio_grupo`` a posição da primeira linha do servidor de cada linha."""
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        fim = np.arange(1, num_values + 1, dtype=np.int64)
+        inicio = np.maximum(fim - self.window_size, self.inicio_grupo).astype(np.int64)
+        return inicio, fim
 
-    rows = []
-    cluster_ids = list(clusters_config.keys())
 
-    for _ in range(n_rows):
-        cluster_id = random.choice(cluster_ids)
-        cfg = clusters_config[cluster_id]
+def _features_por_servidor(
+    ip: pd.Series,
+    player_count: pd.Series,
+    timestamp: pd.Series,
+    historico: Optional[pd.DataFrame] = None,
+) -> Dict[str, np.ndarray]:
+    """Calcula as features por servidor (diff, pct_change, médias/desvio móveis
+    e intervalo entre registros) numa única passada agrupada.
 
-        hora = cfg["hora_base"] + random.choice([-1, 0, 1])
-        hora = max(0, min(23, hora))  # garante 0–23
-        final_de_semana = 1 if now.weekday() >= 5 else 0
+    Ordena uma vez por servidor com sort estável, o que mantém a ordem original
+    das linhas dentro de cada servidor (a mesma que ``groupby('ip')`` usa), roda
+    os kernels vetorizados do pandas sobre o bloco inteiro com janelas que
+    respeitam as fronteiras entre servidores e devolve tudo na ordem original.
 
-        media_movel_10 = random.randint(*cfg["media_range"])
-        proporcao_rede = round(random.uniform(0.25, 0.40), 2)
-        pct_var_jogadores = round(random.uniform(-1.0, 2.0), 1)
+    ``historico`` (colunas ``ip``, ``playerCount``, ``timestamp``) são as últimas
+    linhas de cada servidor vindas de blocos anteriores: entram antes do bloco
+    atual só para alimentar janelas e diffs e não aparecem no resultado.
+    """
+    n_hist = 0
+    if historico is not None and len(historico):
+        n_hist = len(historico)
+        ip = pd.concat([historico['ip'], ip], ignore_index=True)
+        player_count = pd.concat([historico['playerCount'], player_count], ignore_index=True)
+        timestamp = pd.concat([historico['timestamp'], timestamp], ignore_index=True)
+
+    codigos, _ = pd.factorize(ip)
+    ordem = np.argsort(codigos, kind="stable")
+    cod_ord = codigos[ordem]
+    n = len(cod_ord)
 
-        rows.append({
-            "hora": hora,
-            "final_de_semana": final_de_semana,
-            "media_movel_10": media_movel_10,
-            "proporcao_rede": proporcao_rede,
-            "pct_var_jogadores": pct_var_jogadores,
-            "cluster": cluster_id
-        })
+    novo_grupo = np.ones(n, dtype=bool)
+    novo_grupo[1:] = cod_ord[1:] != cod_ord[:-1]
+    inicio_grupo = np.maximum.accumulate(np.where(novo_grupo, np.arange(n), 0))
+    # linhas sem ip ficam fora de qualquer grupo, como no groupby
+    sem_grupo = cod_ord < 0
+
+    pc = pd.Series(player_count.to_numpy(dtype=np.float64, na_value=np.nan)[ordem])
+    ts = pd.Series(timestamp.to_numpy()[ordem], dtype=timestamp.dtype)
+
+    resultado = {
+        "var_jogadores": pc.diff(),
+        "pct_var_jogadores": pc.pct_change(),
+        "intervalo_segundos": ts.diff().dt.total_seconds(),
+    }
+    for janela in (10, 30):
+        rolling = pc.rolling(_JanelaPorServidor(window_size=janela, inicio_grupo=inicio_grupo), min_periods=1)
+        resultado[f"media_movel_{janela}"] = rolling.mean()
+        if janela == 30:
+            resultado["desvio_movel_30"] = rolling.std()
+
+    inversa = np.empty(n, dtype=np.int64)
+    inversa[ordem] = np.arange(n)
+    for nome, serie in resultado.items():
+        valores = serie.to_numpy(dtype=float, na_value=np.nan, copy=True)
+        if nome in ("var_jogadores", "pct_var_jogadores", "intervalo_segundos"):
+            valores[novo_grupo] = np.nan
+        valores[sem_grupo] = np.nan
+        resultado[nome] = valores[inversa][n_hist:]
+    return resultado
 
-    return pd.DataFrame(rows)
 
 def gerar_features(df):
     """Cria todas as features para análise."""
+    return _gerar_features(df)
+
+
+def _gerar_features(
+    df: pd.DataFrame,
+    limite_pico: Optional[float] = None,
+    categorias_ip: Optional[pd.Index] = None,
+    historico: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """Corpo de :func:`gerar_features`. No modo streaming recebe de fora o que
+    depende do histórico inteiro (percentil 95 de ``playerCount``, lista de
+    servidores para ``server_id``) e o ``historico`` por servidor do bloco anterior."""
     df = df.copy()
     logger.info("Gerando features a partir dos dados brutos.")
     df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    # contas em float64; o esquema compacto é aplicado só na saída
+    df['playerCount'] = df['playerCount'].astype('float64')
 
     # Features temporais
     logger
@@ -95,11 +257,12 @@ def gerar_features(df):
 
     # Variação e tendência
     logger.info("Calculando variações e médias móveis.")
-    df['var_jogadores'] = df.groupby('ip')['playerCount'].diff()
-    df['pct_var_jogadores'] = df.groupby('ip')['playerCount'].pct_change() * 100
-    df['media_movel_10'] = df.groupby('ip')['playerCount'].transform(lambda x: x.rolling(window=10, min_periods=1).mean())
-    df['media_movel_30'] = df.groupby('ip')['playerCount'].transform(lambda x: x.rolling(window=30, min_periods=1).mean())
-    df['desvio_movel_30'] = df.groupby('ip')['playerCount'].transform(lambda x: x.rolling(window=30, min_periods=1).std())
+    por_servidor = _features_por_servidor(df['ip'], df['playerCount'], df['timestamp'], historico)
+    df['var_jogadores'] = por_servidor['var_jogadores']
+    df['pct_var_jogadores'] = por_servidor['pct_var_jogadores'] * 100
+    df['media_movel_10'] = por_servidor['media_movel_10']
+    df['media_movel_30'] = por_servidor['media_movel_30']
+    df['desvio_movel_30'] = por_servidor['desvio_movel_30']
 
     # Popularidade relativa
     logger.info("Calculando popularidade relativa.")
@@ -108,7 +271,8 @@ def gerar_features(df):
 
     # Flags de eventos
     logger.info("Criando flags de eventos especiais.")
-    limite_pico = df['playerCount'].quantile(0.95)
+    if limite_pico is None:
+        limite_pico = df['playerCount'].quantile(0.95)
     df['flag_pico'] = (df['playerCount'] > limite_pico).astype(int)
     df['queda_abrupta'] = (df['pct_var_jogadores'] < -20).astype(int)
     df['recuperacao'] = (df['pct_var_jogadores'] > 20).astype(int)
@@ -124,13 +288,105 @@ def gerar_features(df):
 
     # Intervalos entre registros
     logger.info("Calculando intervalos entre registros.")
-    df['intervalo_segundos'] = df.groupby('ip')['timestamp'].diff().dt.total_seconds()
+    df['intervalo_segundos'] = por_servidor['intervalo_segundos']
 
     # Codificação para ML
     logger.info("Codificando variáveis categóricas.")
-    df['server_id'] = df['ip'].astype('category').cat.codes
-    df['servidor_hora'] = df['ip'] + "_" + df['hora'].astype(str)
+    if categorias_ip is None:
+        categorias_ip = _categorias_ordenadas(df['ip'])
+    df['server_id'] = pd.Categorical(df['ip'], categories=categorias_ip).codes.astype(np.int32)
+    # código derivado de (servidor, hora) no lugar da string "ip_hora"; -1 sem ip
+    df['servidor_hora'] = np.where(df['server_id'] >= 0, df['server_id'] * 24 + df['hora'], -1)
+
+    return aplicar_esquema(df, ESQUEMA_FEATURES)
+
+
+def _categorias_ordenadas(ip: pd.Series) -> pd.Index:
+    """Servidores distintos em ordem alfabética, base dos códigos de ``server_id``."""
+    return pd.Index(sorted(np.asarray(ip.dropna().unique(), dtype=object)))
+
+
+# Linhas guardadas por servidor entre blocos: cobre a maior janela móvel (30)
+LINHAS_HISTORICO = 30
 
-    return df
 
+def _quantil_por_contagem(valores: np.ndarray, contagens: np.ndarray, q: float) -> float:
+    """Quantil com interpolação linear (o padrão de ``Series.quantile``) calculado
+    a partir de valores distintos ordenados e suas contagens, sem materializar a série."""
+    n = int(contagens.sum())
+    if n == 0:
+        return np.nan
+    # mesma aritmética do numpy para o índice virtual (método "linear")
+    indice = (n - 1) * q
+    baixo = int(np.floor(indice))
+    acumulado = np.cumsum(contagens)
 
+    def _valor_na_posicao(pos: int) -> float:
+        pos = min(max(pos, 0), n - 1)
+        return valores[np.searchsorted(acumulado, pos, side="right")]
+
+    lo, hi = _valor_na_posicao(baixo), _valor_na_posicao(baixo + 1)
+    return float(np.quantile(np.array([lo, hi], dtype=float), indice - baixo))
+
+
+def _particoes_por_dia(raw) -> Dict[str, Any]:
+    """Arquivos ``YYYY-MM-DD.parquet`` de um ``pyarrow.dataset`` (``lazy: true``), por dia."""
+    return {Path(f.path).name.split(".")[0]: f for f in raw.get_fragments()}
+
+
+def gerar_features_streaming(raw) -> Iterator[pd.DataFrame]:
+    """Gera as features dia a dia a partir de ``minecraft_servidores_raw_particoes@arrow``.
+
+    Resultado igual ao de :func:`gerar_features` sobre o histórico concatenado
+    (``desvio_movel_30`` até o arredondamento de ponto flutuante, já que a
+    variância móvel é recalculada a partir do histórico carregado), com memória
+    limitada pelo tamanho de um dia:
+
+    1. uma primeira passada lê só ``ip`` e ``playerCount`` de cada dia e junta
+       o que depende do histórico inteiro: contagem de cada valor de
+       ``playerCount`` (para o percentil 95 exato do ``flag_pico``) e o
+       conjunto de servidores (``server_id``);
+    2. a segunda lê um dia inteiro por vez, em ordem de data, levando adiante
+       por servidor as últimas ``LINHAS_HISTORICO`` amostras, e entrega as
+       features do dia. O node é gerador: o Kedro grava cada dia assim que
+       ele sai, na ordem em que sai.
+    """
+    particoes = _particoes_por_dia(raw)
+    chaves = sorted(particoes)
+    contagens = pd.Series(dtype=float)
+    servidores = set()
+    for chave in chaves:
+        dia = particoes[chave].to_table(columns=['ip', 'playerCount']).to_pandas()
+        contagens = contagens.add(dia['playerCount'].value_counts(), fill_value=0)
+        servidores.update(np.asarray(dia['ip'].dropna().unique(), dtype=object))
+        del dia
+
+    contagens = contagens.sort_index()
+    limite_pico = _quantil_por_contagem(contagens.index.to_numpy(dtype=float), contagens.to_numpy(), 0.95)
+    categorias_ip = pd.Index(sorted(servidores))
+    logger.info(f"Streaming de features: {len(chaves)} dias, {len(categorias_ip)} servidores.")
+
+    historico = None
+    for chave in chaves:
+        dia = particoes[chave].to_table().to_pandas()
+        dia['timestamp'] = pd.to_datetime(dia['timestamp'], errors='coerce')
+        features = _gerar_features(dia, limite_pico, categorias_ip, historico)
+        cauda = pd.concat([historico, dia[['ip', 'playerCount', 'timestamp']]], ignore_index=True) \
+            if historico is not None else dia[['ip', 'playerCount', 'timestamp']]
+        historico = cauda.groupby('ip', sort=False).tail(LINHAS_HISTORICO).reset_index(drop=True)
+        del dia, cauda
+        yield features
+
+
+def relatorio_memoria(raw: pd.DataFrame, features: pd.DataFrame) -> Dict[str, Any]:
+    """Relatório de memória por tabela/coluna, para acompanhar o ganho do esquema compacto."""
+    relatorio = {
+        "minecraft_servidores_raw": relatorio_memoria_tabela(raw),
+        "minecraft_servidores_features": relatorio_memoria_tabela(features),
+    }
+    for nome, tabela in relatorio.items():
+        logger.info(
+            f"{nome}: {tabela['linhas']} linhas, {tabela['bytes'] / 2**20:.1f} MiB "
+            f"({tabela['reducao']}x menor que sem esquema)"
+        )
+    return relatorio
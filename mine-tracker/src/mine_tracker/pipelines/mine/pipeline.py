@@ -1,26 +1,55 @@
 from kedro.pipeline import Pipeline, node, pipeline
+from mine_tracker.cache import cacheado
 from mine_tracker.pipelines.mine.nodes import carregar_dados # noqa
 from mine_tracker.pipelines.mine.nodes import gerar_features # noqa
-from mine_tracker.pipelines.mine.nodes import carregar_dados_ultimas_4h # noqa
+from mine_tracker.pipelines.mine.nodes import coletar_ultimas_4h # noqa
+from mine_tracker.pipelines.mine.nodes import carregar_dados_incremental # noqa
+from mine_tracker.pipelines.mine.nodes import gerar_features_streaming # noqa
+from mine_tracker.pipelines.mine.nodes import relatorio_memoria # noqa
 
 def create_pipeline(**kwargs) -> Pipeline:
     return pipeline([
         node(
             func=carregar_dados,
-            inputs=None,
+            inputs="params:mine",
             outputs="minecraft_servidores_raw",
             name="coleta_mine_node",
         ),
         node(
-            func=carregar_dados_ultimas_4h,
-            inputs=None,
+            func=coletar_ultimas_4h,
+            inputs=["minecraft_servidores_raw", "params:mine.coletor"],
             outputs="input_inference",
             name="coleta_mine_node_ultimas_4h",
         ),
         node(
-            func=gerar_features,
+            func=cacheado(gerar_features),
             inputs="minecraft_servidores_raw",
-            outputs="minecraft_servidores_features",
+            outputs="minecraft_servidores_features@pandas",
             name="coleta_mine_node_features",
         ),
+        node(
+            func=relatorio_memoria,
+            inputs=["minecraft_servidores_raw", "minecraft_servidores_features@pandas"],
+            outputs="relatorio_memoria_mine",
+            name="relatorio_memoria_node",
+        ),
+    ])
+
+
+def create_incremental_pipeline(**kwargs) -> Pipeline:
+    """Ingestão append-only: grava só os dias novos como partições diárias
+    e gera as features dia a dia, com memória limitada a um dia."""
+    return pipeline([
+        node(
+            func=carregar_dados_incremental,
+            inputs=["params:mine", "minecraft_servidores_raw_ingeridos"],
+            outputs="minecraft_servidores_raw_particoes@partes",
+            name="coleta_mine_node_incremental",
+        ),
+        node(
+            func=gerar_features_streaming,
+            inputs="minecraft_servidores_raw_particoes@arrow",
+            outputs="minecraft_servidores_features_particoes",
+            name="coleta_mine_node_features_streaming",
+        ),
     ])
@@ -0,0 +1,220 @@
+"""
+Busca de hiperparâmetros por halving sucessivo, com orçamento de tempo.
+
+Todos os candidatos de uma grade começam com pouco recurso (poucas linhas
+de treino ou poucas árvores); a cada rodada só a melhor fração ``1/fator``
+segue, com ``fator`` vezes mais recurso, até a última rodada usar tudo.
+
+- Pré-processamento em cache: candidatos com o mesmo passo ``prep`` (mesma
+  configuração e mesmas linhas) compartilham um único ajuste do
+  imputer/scaler; só o estimador é treinado por candidato.
+- Paralelo: as avaliações de uma rodada rodam em threads (o sklearn libera
+  o GIL no fit), com ``n_jobs=1`` em cada estimador.
+- Retomável: cada avaliação vira uma linha no diário (jsonl); rodar de novo
+  com os mesmos dados e a mesma grade reaproveita o que já foi avaliado.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterGrid
+from sklearn.pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+LINHAS = "linhas"
+ARVORES = "arvores"
+
+
+def _ler_diario(caminho: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Avaliações já feitas, indexadas pela chave; linhas truncadas são ignoradas."""
+    if not caminho or not os.path.exists(caminho):
+        return {}
+    feitas = {}
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                continue  # última linha de uma execução interrompida
+            feitas[registro["chave"]] = registro
+    return feitas
+
+
+class _Diario:
+    """Anexa avaliações ao jsonl, uma por linha, com flush a cada escrita."""
+
+    def __init__(self, caminho: Optional[str]):
+        self._caminho = caminho
+        self._lock = threading.Lock()
+        if caminho:
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+
+    def anotar(self, registro: Dict[str, Any]) -> None:
+        if not self._caminho:
+            return
+        with self._lock, open(self._caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            f.flush()
+
+
+def _rodadas(n_candidatos: int, fator: int, recurso_min: int, recurso_max: int) -> List[int]:
+    """Recurso de cada rodada: a última usa ``recurso_max`` e cada anterior
+    ``fator`` vezes menos, sem passar de ``recurso_min`` nem de rodadas
+    suficientes para sobrar um candidato."""
+    por_candidatos = math.ceil(math.log(max(n_candidatos, 1), fator)) + 1 if n_candidatos > 1 else 1
+    por_recurso = int(math.floor(math.log(max(recurso_max / max(recurso_min, 1), 1), fator))) + 1
+    n = max(1, min(por_candidatos, por_recurso))
+    return [max(1, int(recurso_max // fator ** (n - 1 - i))) for i in range(n)]
+
+
+class CachePrep:
+    """Passos ``prep`` já ajustados, por (configuração do prep, linhas usadas).
+
+    O ajuste de cada chave acontece uma vez só, mesmo com várias threads
+    pedindo a mesma chave ao mesmo tempo.
+    """
+
+    def __init__(self):
+        self._itens: Dict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]] = {}
+        self._locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.ajustes = 0
+        self.reusos = 0
+
+    def obter(self, prep, n_linhas: int, X_treino: pd.DataFrame, X_val: pd.DataFrame):
+        chave = (joblib.hash(prep), n_linhas)
+        with self._lock:
+            lock = self._locks.setdefault(chave, threading.Lock())
+        with lock:
+            if chave in self._itens:
+                with self._lock:
+                    self.reusos += 1
+                return self._itens[chave]
+            ajustado = clone(prep).fit(X_treino)
+            self._itens[chave] = (ajustado.transform(X_treino), ajustado.transform(X_val))
+            with self._lock:
+                self.ajustes += 1
+            return self._itens[chave]
+
+
+def _impressao_dados(X: pd.DataFrame, y: pd.Series) -> str:
+    """Hash do conteúdo de X/y: o diário só é reaproveitado para os mesmos dados."""
+    return joblib.hash((pd.util.hash_pandas_object(X, index=False).to_numpy(), y.to_numpy()))
+
+
+def busca_sucessiva(
+    nome: str,
+    modelo: Pipeline,
+    grade: Dict[str, List[Any]],
+    X_treino: pd.DataFrame,
+    y_treino: pd.Series,
+    X_val: pd.DataFrame,
+    y_val: pd.Series,
+    recurso: str = LINHAS,
+    fator: int = 3,
+    linhas_min: int = 500,
+    arvores_min: int = 25,
+    arvores_max: Optional[int] = None,
+    orcamento_segundos: Optional[float] = None,
+    max_workers: Optional[int] = None,
+    random_state: int = 42,
+    diario: Optional[str] = None,
+    cache: Optional[CachePrep] = None,
+) -> Dict[str, Any]:
+    """Halving sucessivo de um modelo sobre a ``grade`` (nomes de parâmetro do
+    ``Pipeline``, ex.: ``est__max_depth``). Devolve os melhores parâmetros, o
+    R² de validação e o histórico das rodadas."""
+    inicio = time.perf_counter()
+    cache = cache or CachePrep()
+    candidatos = list(ParameterGrid(grade)) if grade else [{}]
+    est = modelo.named_steps["est"]
+    if recurso == ARVORES and "n_estimators" not in est.get_params():
+        recurso = LINHAS  # sem árvores para podar, o recurso vira linhas
+
+    if recurso == ARVORES:
+        maximo = arvores_max or est.get_params()["n_estimators"]
+        niveis = _rodadas(len(candidatos), fator, arvores_min, maximo)
+    else:
+        niveis = _rodadas(len(candidatos), fator, linhas_min, len(X_treino))
+        niveis[-1] = len(X_treino)
+
+    # subconjuntos de linhas aninhados: a rodada seguinte contém a anterior
+    ordem = np.random.default_rng(random_state).permutation(len(X_treino))
+    impressao = joblib.hash((_impressao_dados(X_treino, y_treino), _impressao_dados(X_val, y_val), random_state))
+    feitas = _ler_diario(diario)
+    registro_diario = _Diario(diario)
+
+    def avaliar(params: Dict[str, Any], nivel: int) -> Dict[str, Any]:
+        chave = joblib.hash((nome, sorted(params.items(), key=lambda kv: kv[0]), recurso, nivel, impressao))
+        if chave in feitas:
+            return {**feitas[chave], "retomado": True}
+        t0 = time.perf_counter()
+        candidato = clone(modelo).set_params(**params)
+        n_linhas = nivel if recurso == LINHAS else len(X_treino)
+        if recurso == ARVORES:
+            candidato.set_params(est__n_estimators=nivel)
+        if "n_jobs" in candidato.named_steps["est"].get_params():
+            candidato.set_params(est__n_jobs=1)
+
+        linhas = np.sort(ordem[:n_linhas])
+        Xt_treino, Xt_val = cache.obter(
+            candidato.named_steps["prep"], n_linhas, X_treino.iloc[linhas], X_val
+        )
+        estimador = candidato.named_steps["est"].fit(Xt_treino, y_treino.iloc[linhas])
+        r2 = float(r2_score(y_val, estimador.predict(Xt_val)))
+        registro = {
+            "chave": chave,
+            "modelo": nome,
+            "params": params,
+            "recurso": recurso,
+            "nivel": int(nivel),
+            "r2": r2,
+            "segundos": round(time.perf_counter() - t0, 4),
+        }
+        registro_diario.anotar(registro)
+        return {**registro, "retomado": False}
+
+    workers = max_workers or os.cpu_count() or 1
+    vivos = candidatos
+    historico = []
+    melhores: List[Tuple[Dict[str, Any], float]] = []
+    for rodada, nivel in enumerate(niveis):
+        gasto = time.perf_counter() - inicio
+        if melhores and orcamento_segundos is not None and gasto > orcamento_segundos:
+            logger.info(f"Busca {nome}: orçamento de {orcamento_segundos}s esgotado antes da rodada {rodada}.")
+            break
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(vivos)))) as pool:
+            resultados = list(pool.map(lambda p: avaliar(p, nivel), vivos))
+
+        pontuados = sorted(zip(vivos, (r["r2"] for r in resultados)), key=lambda pr: -pr[1])
+        historico.append({
+            "rodada": rodada,
+            "recurso": recurso,
+            "nivel": int(nivel),
+            "candidatos": len(vivos),
+            "retomados": sum(r["retomado"] for r in resultados),
+            "melhor_r2": pontuados[0][1],
+        })
+        logger.info(f"Busca {nome}: rodada {rodada} ({recurso}={nivel}) com {len(vivos)} candidatos, melhor R² {pontuados[0][1]:.4f}")
+        melhores = pontuados
+        vivos = [p for p, _ in pontuados[: max(1, math.ceil(len(vivos) / fator))]]
+
+    melhor_params, melhor_r2 = melhores[0]
+    return {
+        "melhores_params": melhor_params,
+        "r2_validacao": melhor_r2,
+        "candidatos": len(candidatos),
+        "rodadas": historico,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
@@ -3,30 +3,42 @@
 Nodes para o pipeline 'model' do Kedro.
 
 Fluxo:
-- load_data: recebe o DataFrame do catálogo (minecraft_servidores_features) e filtra o servidor mais frequente
+- load_data: recebe a tabela de features (minecraft_servidores_features@arrow) e lê só o servidor mais frequente
 - preprocess_data: seleciona features/target, saneia, winsoriza e retorna X, y, n_drop_y
 - criar_pipelines: devolve dicionário com pipelines de modelos
-- treinar_modelos: faz split fixo e treina modelos in-place
+- dividir_treino_teste: calcula uma vez os índices de treino/teste (aleatório ou temporal)
+- buscar_hiperparametros: halving sucessivo sobre a grade de cada candidato, só dentro do treino
+- treinar_modelos: treina os candidatos em paralelo sobre o split, dividindo os núcleos entre eles
 - avaliar_modelos: reusa o mesmo split para avaliar, escolhe melhor por R², salva modelo e relatório
+- treinar_por_servidor: um modelo por servidor em paralelo, indexado por ip no registro de modelos
+- atualizar_modelo_incremental: incorpora ao best_model só os dias novos desde o último treino
+- compactar_modelo / relatorio_modelo_compacto: exporta o best_model em arrays para a inferência e mede o ganho
 """
 
+import hashlib
+import multiprocessing
 import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
 import joblib
 import numpy as np
 import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_absolute_error, r2_score
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
 import logging
 
+from mine_tracker.datasets import ModeloCompacto
+
+# o sklearn (~1,5 s de import) só é carregado dentro dos nodes que treinam ou
+# avaliam; importar este módulo não deve custar isso a quem só usa FEATURES
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+else:
+    Pipeline = Any
+
 logger = logging.getLogger(__name__)
 # Configs básicas
 FEATURES = [
@@ -43,10 +55,18 @@ MODEL_DIR = "models"  # ajuste se quiser outro caminho
 # =========================
 # 1) Carregar dados
 # =========================
-def load_data(df_raw: pd.DataFrame) -> pd.DataFrame:
+def load_data(df_raw) -> pd.DataFrame:
     """Filtra o servidor mais frequente e devolve apenas ele.
     Armazena o servidor escolhido em df.attrs['servidor_escolhido'].
+
+    Aceita um ``DataFrame`` ou um ``pyarrow.dataset.Dataset`` (catálogo
+    ``minecraft_servidores_features@arrow``). No segundo caso só a coluna
+    ``ip`` é lida para escolher o servidor, e depois apenas FEATURES + TARGET
+    das linhas desse servidor, com o filtro aplicado na leitura do Parquet.
     """
+    if hasattr(df_raw, "to_table"):
+        return _load_data_arrow(df_raw)
+
     if "ip" not in df_raw.columns:
         raise ValueError("Coluna 'ip' não encontrada no dataset de entrada.")
     if len(df_raw) == 0:
@@ -55,6 +75,23 @@ def load_data(df_raw: pd.DataFrame) -> pd.DataFrame:
     servidor_escolhido = df_raw["ip"].value_counts().index[0]
     df = df_raw[df_raw["ip"] == servidor_escolhido].copy()
     df.attrs["servidor_escolhido"] = servidor_escolhido
+    if "data" in df.columns and len(df):
+        df.attrs["ultimo_dia"] = pd.to_datetime(df["data"].astype(str)).max().date().isoformat()
+    return df
+
+
+def _load_data_arrow(dataset) -> pd.DataFrame:
+    if "ip" not in dataset.schema.names:
+        raise ValueError("Coluna 'ip' não encontrada no dataset de entrada.")
+    ips = dataset.to_table(columns=["ip"]).column("ip").to_pandas()
+    if len(ips) == 0:
+        raise ValueError("Dataset de entrada está vazio.")
+
+    servidor_escolhido = ips.value_counts().index[0]
+    df = _load_data_arrow_servidor(dataset, servidor_escolhido)
+    colunas = list(df.columns)
+    df.attrs["servidor_escolhido"] = servidor_escolhido
+    logger.info(f"Servidor escolhido: {servidor_escolhido} ({len(df)} linhas, colunas {colunas})")
     return df
 
 
@@ -95,10 +132,10 @@ def preprocess_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series, int]:
     X = df_model[FEATURES].copy()
     y = df_model[TARGET].astype(float)
 
-    # Propaga nome do servidor (se presente)
-    servidor_escolhido = df.attrs.get("servidor_escolhido", None)
-    if servidor_escolhido is not None:
-        X.attrs["servidor_escolhido"] = servidor_escolhido
+    # Propaga nome do servidor e último dia dos dados (se presentes)
+    for chave in ("servidor_escolhido", "ultimo_dia"):
+        if df.attrs.get(chave) is not None:
+            X.attrs[chave] = df.attrs[chave]
 
     return X, y, n_drop_y
 
@@ -108,6 +145,13 @@ def preprocess_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series, int]:
 # =========================
 def criar_pipelines() -> Dict[str, Pipeline]:
     """Cria pipelines para LinearRegression e RandomForest."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.impute import SimpleImputer
+    from sklearn.linear_model import LinearRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
     num_features = FEATURES
 
     preprocess_linear = ColumnTransformer(
@@ -156,20 +200,152 @@ def criar_pipelines() -> Dict[str, Pipeline]:
 
 
 # =========================
-# 4) Treino
+# 4) Split + Treino
 # =========================
-def treinar_modelos(modelos: Dict[str, Pipeline], X: pd.DataFrame, y: pd.Series) -> Dict[str, Pipeline]:
-    """Treina todos os modelos e retorna o dicionário treinado."""
-    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
-    for _, modelo in modelos.items():
-        modelo.fit(X_train, y_train)
+def dividir_treino_teste(X: pd.DataFrame, y: pd.Series, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Calcula o split uma única vez e devolve só as posições das linhas.
+
+    - ``split_estrategia: aleatorio`` (padrão): as mesmas linhas de
+      ``train_test_split(X, y, test_size, random_state)``.
+    - ``split_estrategia: temporal``: as últimas ``test_size`` linhas viram
+      teste; supõe ``X`` em ordem cronológica, como sai da tabela de features.
+    """
+    params = params or {}
+    test_size = params.get("test_size", 0.2)
+    estrategia = params.get("split_estrategia", "aleatorio")
+    posicoes = np.arange(len(X))
+
+    if estrategia == "temporal":
+        n_teste = int(np.ceil(test_size * len(X))) if isinstance(test_size, float) else int(test_size)
+        treino, teste = posicoes[: len(X) - n_teste], posicoes[len(X) - n_teste:]
+    elif estrategia == "aleatorio":
+        from sklearn.model_selection import train_test_split
+        treino, teste = train_test_split(posicoes, test_size=test_size, random_state=params.get("random_state", 42))
+    else:
+        raise ValueError(f"split_estrategia inválida: {estrategia!r} (use 'aleatorio' ou 'temporal')")
+
+    return {"estrategia": estrategia, "treino": treino, "teste": teste}
+
+
+def _aplicar_split(X: pd.DataFrame, y: pd.Series, split: Dict[str, Any], parte: str) -> Tuple[pd.DataFrame, pd.Series]:
+    idx = split[parte]
+    return X.iloc[idx], y.iloc[idx]
+
+
+def _distribuir_threads(modelos: Dict[str, Pipeline], n_nucleos: Optional[int] = None) -> None:
+    """Divide os núcleos entre candidatos treinados ao mesmo tempo: quem não
+    paraleliza fica com um núcleo e quem tem ``n_jobs`` (ex.: RandomForest
+    com ``n_jobs=-1``) divide o restante, para não passar do total."""
+    n_nucleos = n_nucleos or os.cpu_count() or 1
+    com_n_jobs = {
+        nome: [k for k in modelo.get_params() if k.endswith("n_jobs")]
+        for nome, modelo in modelos.items()
+    }
+    paralelos = [nome for nome, chaves in com_n_jobs.items() if chaves]
+    if not paralelos:
+        return
+    livres = max(n_nucleos - (len(modelos) - len(paralelos)), len(paralelos))
+    por_modelo = max(1, livres // len(paralelos))
+    for nome in paralelos:
+        modelos[nome].set_params(**{k: por_modelo for k in com_n_jobs[nome]})
+
+
+def _em_paralelo(funcao, modelos: Dict[str, Pipeline]) -> Dict[str, Any]:
+    """Aplica ``funcao(nome, modelo)`` a todos os candidatos em threads
+    (o sklearn libera o GIL no fit/predict pesado)."""
+    with ThreadPoolExecutor(max_workers=max(1, len(modelos))) as pool:
+        futuros = {nome: pool.submit(funcao, nome, modelo) for nome, modelo in modelos.items()}
+        return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+
+def treinar_modelos(
+    modelos: Dict[str, Pipeline],
+    X: pd.DataFrame,
+    y: pd.Series,
+    split: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Pipeline]:
+    """Treina todos os modelos ao mesmo tempo e retorna o dicionário treinado."""
+    split = split if split is not None else dividir_treino_teste(X, y)
+    X_train, y_train = _aplicar_split(X, y, split, "treino")
+    _distribuir_threads(modelos)
+    _em_paralelo(lambda nome, modelo: modelo.fit(X_train, y_train), modelos)
     return modelos
 
+def buscar_hiperparametros(
+    modelos: Dict[str, Pipeline],
+    X: pd.DataFrame,
+    y: pd.Series,
+    split: Dict[str, Any],
+    params: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, Pipeline], Dict[str, Any]]:
+    """Ajusta os hiperparâmetros de cada candidato antes do treino final.
+
+    A busca usa só as linhas de treino do ``split`` (a validação sai delas,
+    com a mesma estratégia), então o teste de :func:`avaliar_modelos` segue
+    intocado. Para cada modelo com grade em ``params['grade']`` roda um
+    halving sucessivo (ver ``busca.py``) e devolve o pipeline ainda não
+    treinado com os melhores parâmetros, mais o relatório da busca.
+    Com ``ativa: false`` os modelos passam sem mudança.
+    """
+    params = params or {}
+    if not params.get("ativa", False):
+        return modelos, {"ativa": False}
+
+    X_treino, y_treino = _aplicar_split(X, y, split, "treino")
+    validacao = dividir_treino_teste(X_treino, y_treino, {
+        "test_size": params.get("validacao", 0.2),
+        "split_estrategia": split.get("estrategia", "aleatorio"),
+        "random_state": params.get("random_state", 42),
+    })
+    X_fit, y_fit = _aplicar_split(X_treino, y_treino, validacao, "treino")
+    X_val, y_val = _aplicar_split(X_treino, y_treino, validacao, "teste")
+
+    from mine_tracker.pipelines.model.busca import CachePrep, busca_sucessiva
+
+    recurso = params.get("recurso", "linhas")
+    cache = CachePrep()
+    resultados = {}
+    for nome, grade in (params.get("grade") or {}).items():
+        if nome not in modelos:
+            continue
+        resultado = busca_sucessiva(
+            nome, modelos[nome], grade or {}, X_fit, y_fit, X_val, y_val,
+            recurso=recurso,
+            fator=params.get("fator", 3),
+            linhas_min=params.get("linhas_min", 500),
+            arvores_min=params.get("arvores_min", 25),
+            arvores_max=params.get("arvores_max"),
+            orcamento_segundos=params.get("orcamento_segundos"),
+            max_workers=params.get("max_workers"),
+            random_state=params.get("random_state", 42),
+            diario=params.get("diario"),
+            cache=cache,
+        )
+        modelos[nome] = modelos[nome].set_params(**resultado["melhores_params"])
+        if recurso == "arvores" and params.get("arvores_max") and "est__n_estimators" in modelos[nome].get_params():
+            modelos[nome].set_params(est__n_estimators=params["arvores_max"])
+        resultados[nome] = resultado
+
+    relatorio = {
+        "ativa": True,
+        "recurso": recurso,
+        "linhas_busca": int(len(X_fit)),
+        "linhas_validacao": int(len(X_val)),
+        "preprocessamentos_ajustados": cache.ajustes,
+        "preprocessamentos_reusados": cache.reusos,
+        "modelos": resultados,
+    }
+    logger.info(f"Busca de hiperparâmetros: { {n: r['melhores_params'] for n, r in resultados.items()} }")
+    return modelos, relatorio
+
+
 # =========================
 # 5) Avaliação + Salvamento
 # =========================
 def _avaliar_um(nome: str, modelo: Pipeline, X: pd.DataFrame, y: pd.Series) -> Tuple[float, float]:
     """Avalia um modelo retornando (MAE, R²)."""
+    from sklearn.metrics import mean_absolute_error, r2_score
+
     pred = modelo.predict(X)
     mae = mean_absolute_error(y, pred)
     r2 = r2_score(y, pred)
@@ -182,14 +358,289 @@ def avaliar_modelos(
     X: pd.DataFrame,
     y: pd.Series,
     n_drop_y: int,
+    split: Optional[Dict[str, Any]] = None,
 ) -> None:
     """Usa o mesmo split para avaliação, escolhe melhor por R² e salva artefatos."""
     # Mesmo split do treino
-    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    split = split if split is not None else dividir_treino_teste(X, y)
+    X_test, y_test = _aplicar_split(X, y, split, "teste")
 
     logger.info("\nAvaliação (teste):")
-    metricas = {nome: _avaliar_um(nome, mdl, X_test, y_test) for nome, mdl in modelos.items()}
+    metricas = _em_paralelo(lambda nome, mdl: _avaliar_um(nome, mdl, X_test, y_test), modelos)
 
     # Escolhe melhor por R²
     melhor = max(metricas, key=lambda k: metricas[k][1])
+    # marca d'água do treino incremental: de qual servidor e até que dia o modelo viu dados
+    modelos[melhor].servidor_escolhido_ = X.attrs.get("servidor_escolhido")
+    modelos[melhor].ultimo_dia_ = X.attrs.get("ultimo_dia")
     return modelos[melhor], {k: {"mae": m[0], "r2": m[1]} for k, m in metricas.items()}, X_test
+
+
+# =========================
+# 6) Modelos por servidor
+# =========================
+def _id_arquivo(servidor: str) -> str:
+    """Nome de arquivo seguro para o ip/host do servidor. O hash curto do
+    original evita colisões do saneamento (``host:25565`` e ``host_25565``)."""
+    texto = str(servidor)
+    sufixo = hashlib.blake2b(texto.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{re.sub(r'[^A-Za-z0-9._-]', '_', texto)}-{sufixo}"
+
+
+def _treinar_servidor(servidor: str, df: pd.DataFrame, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Roda num processo do pool: recebe só as linhas do servidor, treina,
+    avalia no holdout e grava o modelo no formato compacto (a inferência abre
+    com mmap, sem joblib nem sklearn). Devolve apenas as métricas."""
+    from sklearn.metrics import mean_absolute_error, r2_score
+
+    X, y, n_drop_y = preprocess_data(df)
+    split = dividir_treino_teste(X, y, params)
+    X_train, y_train = _aplicar_split(X, y, split, "treino")
+    X_test, y_test = _aplicar_split(X, y, split, "teste")
+
+    modelo = criar_pipelines()["RandomForest"]
+    # o paralelismo é entre servidores; cada processo usa um núcleo
+    modelo.set_params(est__n_estimators=params.get("n_estimators", 100), est__n_jobs=1)
+    modelo.fit(X_train, y_train)
+    pred = modelo.predict(X_test)
+
+    arquivo = os.path.join(params["dir"], _id_arquivo(servidor))
+    ModeloCompacto.de_pipeline(modelo).salvar(arquivo)
+    return servidor, {
+        "arquivo": arquivo,
+        "mae": float(mean_absolute_error(y_test, pred)),
+        "r2": float(r2_score(y_test, pred)) if len(y_test) > 1 else None,
+        "linhas_treino": int(len(X_train)),
+        "linhas_teste": int(len(X_test)),
+        "n_drop_y": int(n_drop_y),
+    }
+
+
+def _load_data_arrow_servidor(dataset, servidor: str, apos_dia: Optional[str] = None) -> pd.DataFrame:
+    """Lê FEATURES + TARGET de um servidor (opcionalmente só os dias depois de
+    ``apos_dia``) e guarda o último dia lido em ``df.attrs['ultimo_dia']``."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    colunas = [c for c in FEATURES + [TARGET] if c in dataset.schema.names]
+    tem_data = "data" in dataset.schema.names
+    filtro = ds.field("ip") == servidor
+    if apos_dia is not None and tem_data:
+        # a partição pode vir como date32 (esquema gravado) ou texto (tabelas antigas)
+        filtro = filtro & (ds.field("data") > pa.scalar(apos_dia).cast(dataset.schema.field("data").type))
+
+    df = dataset.to_table(columns=colunas + (["data"] if tem_data else []), filter=filtro).to_pandas()
+    if tem_data:
+        dias = df.pop("data").astype(str)
+        df.attrs["ultimo_dia"] = dias.max() if len(dias) else None
+    return df
+
+
+def treinar_por_servidor(dataset, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Treina um modelo por servidor em todos os núcleos e devolve o registro de modelos.
+
+    ``dataset`` é a tabela de features aberta sem leitura
+    (``minecraft_servidores_features@arrow``): o processo principal conta as
+    linhas pela coluna ``ip``, lê uma única vez FEATURES + TARGET dos
+    servidores com pelo menos ``min_linhas`` e manda a cada worker o recorte
+    do seu servidor (``ip`` não é chave de partição, então um filtro por
+    servidor em cada worker varreria a tabela inteira de novo). Os demais
+    ficam de fora e usam o ``best_model`` global na inferência.
+
+    Os workers saem de ``forkserver`` (``spawn`` onde não houver): no ambiente
+    ``orquestrado`` este node roda ao lado de outros no ``ThreadRunner``, e um
+    ``fork`` com outras threads ativas pode herdar locks presos.
+
+    O registro (``registro_modelos``) é indexado por ip, com o diretório do
+    ``ModeloCompacto`` e as métricas de holdout de cada um.
+    """
+    contagem = dataset.to_table(columns=["ip"]).column("ip").to_pandas().value_counts()
+    min_linhas = params.get("min_linhas", 200)
+    servidores = [str(ip) for ip, n in contagem.items() if n >= min_linhas]
+    ignorados = int((contagem < min_linhas).sum())
+
+    os.makedirs(params["dir"], exist_ok=True)
+    max_workers = params.get("max_workers") or os.cpu_count()
+    logger.info(f"Treinando {len(servidores)} modelos por servidor em {max_workers} processos ({ignorados} servidores com poucos dados).")
+
+    import pyarrow.dataset as ds
+
+    colunas = [c for c in FEATURES + [TARGET] if c in dataset.schema.names]
+    df = dataset.to_table(columns=["ip"] + colunas, filter=ds.field("ip").isin(servidores)).to_pandas()
+    partes = df.groupby(df.pop("ip").astype(str), sort=False)
+
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    modelos = {}
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(metodo)) as pool:
+        futuros = [pool.submit(_treinar_servidor, ip, parte, params) for ip, parte in partes]
+        del df, partes
+        for futuro in futuros:
+            servidor, info = futuro.result()
+            modelos[servidor] = info
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "features": FEATURES,
+        "target": TARGET,
+        "servidores_sem_modelo": ignorados,
+        "modelos": modelos,
+    }
+
+
+# =========================
+# 7) Treino incremental
+# =========================
+def atualizar_modelo_incremental(modelo: Pipeline, dataset, params: Optional[Dict[str, Any]] = None):
+    """Atualiza o ``best_model`` salvo com as linhas que chegaram desde o último treino.
+
+    O modelo carrega a própria marca d'água (``servidor_escolhido_`` e
+    ``ultimo_dia_``, gravados por :func:`avaliar_modelos`); do Parquet de
+    features só são lidas as linhas desse servidor em dias posteriores.
+
+    - RandomForest: treina ``n_arvores_novas`` árvores só nos dados novos e as
+      soma à floresta, aposentando as mais antigas acima de ``max_arvores``.
+    - Estimadores com ``partial_fit``: recebem os dados novos via ``partial_fit``.
+    - Outros (ex.: LinearRegression): não há atualização exata sem o histórico;
+      o modelo fica como está até o próximo treino completo.
+
+    O pré-processamento (imputer/scaler) continua o do treino completo.
+    Devolve o modelo e ``{momento: registro}`` do que a atualização consumiu
+    (uma partição nova por execução em ``historico_incremental``).
+    """
+    params = params or {}
+    servidor = getattr(modelo, "servidor_escolhido_", None)
+    ultimo_dia = getattr(modelo, "ultimo_dia_", None)
+    agora = datetime.now()
+    chave = agora.strftime("%Y%m%dT%H%M%S")
+    registro = {
+        "executado_em": agora.isoformat(timespec="seconds"),
+        "servidor": servidor,
+        "apos_dia": ultimo_dia,
+    }
+    if servidor is None:
+        raise ValueError("best_model sem servidor_escolhido_; rode o pipeline 'model' completo antes.")
+
+    df = _load_data_arrow_servidor(dataset, servidor, apos_dia=ultimo_dia)
+    if len(df) == 0:
+        logger.info("Treino incremental: nenhum dado novo.")
+        return modelo, {chave: {**registro, "status": "sem dados novos", "linhas": 0}}
+
+    novo_ultimo_dia = df.attrs.get("ultimo_dia")
+    X, y, n_drop_y = preprocess_data(df)
+    est = modelo.named_steps["est"]
+    Xt = modelo.named_steps["prep"].transform(X)
+    registro.update({"ate_dia": novo_ultimo_dia, "linhas": int(len(X)), "n_drop_y": int(n_drop_y)})
+
+    from sklearn.ensemble import RandomForestRegressor
+
+    if hasattr(est, "estimators_") and isinstance(est, RandomForestRegressor):
+        n_novas = params.get("n_arvores_novas", 20)
+        max_arvores = params.get("max_arvores", est.n_estimators)
+        semente = (est.random_state or 0) + int(str(novo_ultimo_dia).replace("-", "") or 0)
+        novas = RandomForestRegressor(**{**est.get_params(), "n_estimators": n_novas, "warm_start": False, "random_state": semente})
+        novas.fit(Xt, y)
+
+        arvores = list(est.estimators_) + list(novas.estimators_)
+        retiradas = max(0, len(arvores) - max_arvores)
+        est.estimators_ = arvores[retiradas:]
+        est.n_estimators = len(est.estimators_)
+        registro.update({"status": "atualizado", "arvores_novas": n_novas, "arvores_retiradas": retiradas, "arvores": est.n_estimators})
+    elif hasattr(est, "partial_fit"):
+        est.partial_fit(Xt, y)
+        registro["status"] = "atualizado"
+    else:
+        logger.info(f"Treino incremental: {type(est).__name__} não suporta atualização; mantendo o modelo.")
+        return modelo, {chave: {**registro, "status": f"{type(est).__name__} sem suporte a atualização incremental"}}
+
+    modelo.ultimo_dia_ = novo_ultimo_dia
+    logger.info(f"Treino incremental: {registro}")
+    return modelo, {chave: registro}
+
+
+# =========================
+# 8) Exportação compacta
+# =========================
+def compactar_modelo(modelo: Pipeline, params: Optional[Dict[str, Any]] = None) -> ModeloCompacto:
+    """Converte o ``best_model`` para o formato compacto usado na inferência
+    (ver ``mine_tracker.datasets.modelo_compacto``). ``profundidade_max`` e
+    ``max_arvores`` podam a floresta; o custo em precisão sai no relatório."""
+    params = params or {}
+    return ModeloCompacto.de_pipeline(
+        modelo,
+        profundidade_max=params.get("profundidade_max"),
+        max_arvores=params.get("max_arvores"),
+    )
+
+
+def _melhor_tempo(funcao, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(max(1, repeticoes)):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def relatorio_modelo_compacto(
+    modelo: Pipeline,
+    compacto: ModeloCompacto,
+    X: pd.DataFrame,
+    y: pd.Series,
+    split: Dict[str, Any],
+    params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Compara o pickle do sklearn com o formato compacto: tamanho em disco,
+    tempo de carga, latência de predição por tamanho de lote (melhor de
+    ``repeticoes``) e a diferença de MAE/R² no teste causada pela poda."""
+    from sklearn.metrics import mean_absolute_error, r2_score
+
+    params = params or {}
+    repeticoes = params.get("repeticoes", 5)
+    X_test, y_test = _aplicar_split(X, y, split, "teste")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho_pkl = os.path.join(tmp, "best_model.pkl")
+        caminho_compacto = os.path.join(tmp, "compacto")
+        joblib.dump(modelo, caminho_pkl)
+        compacto.salvar(caminho_compacto)
+        tamanho = {
+            "joblib": os.path.getsize(caminho_pkl),
+            "compacto": sum(os.path.getsize(os.path.join(caminho_compacto, f)) for f in os.listdir(caminho_compacto)),
+        }
+        carga = {
+            "joblib": _melhor_tempo(lambda: joblib.load(caminho_pkl), repeticoes),
+            "compacto_mmap": _melhor_tempo(lambda: ModeloCompacto.carregar(caminho_compacto, mmap=True), repeticoes),
+        }
+
+    predicao = {}
+    for lote in params.get("benchmark_lotes", [1, 64, 1024]):
+        amostra = X_test.iloc[np.arange(lote) % len(X_test)] if len(X_test) else X.head(lote)
+        predicao[f"lote_{lote}"] = {
+            "sklearn": _melhor_tempo(lambda: modelo.predict(amostra), repeticoes),
+            "compacto": _melhor_tempo(lambda: compacto.predict(amostra), repeticoes),
+        }
+
+    pred_original = modelo.predict(X_test)
+    pred_compacto = compacto.predict(X_test)
+    teste = {
+        "linhas": int(len(X_test)),
+        "mae_original": float(mean_absolute_error(y_test, pred_original)),
+        "mae_compacto": float(mean_absolute_error(y_test, pred_compacto)),
+        "r2_original": float(r2_score(y_test, pred_original)),
+        "r2_compacto": float(r2_score(y_test, pred_compacto)),
+        "max_dif_predicao": float(np.abs(pred_original - pred_compacto).max()),
+    }
+    teste["custo_r2"] = teste["r2_original"] - teste["r2_compacto"]
+
+    relatorio = {
+        "estimador": compacto.meta["estimador"],
+        "arvores": compacto.meta.get("arvores"),
+        "nos": compacto.meta.get("nos"),
+        "profundidade_max": compacto.meta.get("profundidade_max"),
+        "tamanho_bytes": tamanho,
+        "carga_segundos": carga,
+        "predicao_segundos": predicao,
+        "teste": teste,
+    }
+    logger.info(f"Modelo compacto: {tamanho['compacto']} bytes (joblib {tamanho['joblib']}), custo R² {teste['custo_r2']:.5f}")
+    return relatorio
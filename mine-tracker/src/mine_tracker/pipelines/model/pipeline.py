@@ -1,6 +1,9 @@
 from kedro.pipeline import Node, Pipeline
+from mine_tracker.cache import cacheado
 from mine_tracker.pipelines.model.nodes import (
-    load_data, preprocess_data, criar_pipelines, treinar_modelos, avaliar_modelos
+    load_data, preprocess_data, criar_pipelines, dividir_treino_teste, buscar_hiperparametros, treinar_modelos,
+    avaliar_modelos, treinar_por_servidor, atualizar_modelo_incremental, compactar_modelo,
+    relatorio_modelo_compacto,
 )
 
 def create_pipeline(**kwargs) -> Pipeline:
@@ -8,31 +11,79 @@ def create_pipeline(**kwargs) -> Pipeline:
         Node(
             func=criar_pipelines,
             inputs=None,
-            outputs="modelos",
+            outputs="modelos_candidatos",
             name="criar_pipelines_node",
         ),
         Node(
-            func=load_data,
-            inputs="minecraft_servidores_features",
+            func=cacheado(load_data),
+            inputs="minecraft_servidores_features@arrow",
             outputs="model_data",
             name="load_data_node",
         ),
         Node(
-            func=preprocess_data,
+            func=cacheado(preprocess_data),
             inputs="model_data",
             outputs=["X", "y", "n_drop_y"],
             name="preprocess_data_node",
         ),
+        Node(
+            func=dividir_treino_teste,
+            inputs=["X", "y", "params:model"],
+            outputs="split_indices",
+            name="dividir_treino_teste_node",
+        ),
+        Node(
+            func=cacheado(buscar_hiperparametros),
+            inputs=["modelos_candidatos", "X", "y", "split_indices", "params:model.busca"],
+            outputs=["modelos", "resultado_busca"],
+            name="buscar_hiperparametros_node",
+        ),
         Node(  # <- AGORA PRODUZ "modelos_trained"
-            func=treinar_modelos,
-            inputs=["modelos", "X", "y"],
+            func=cacheado(treinar_modelos),
+            inputs=["modelos", "X", "y", "split_indices"],
             outputs="modelos_trained",
             name="treinar_modelos_node",
         ),
         Node(  # <- AVALIA USA "modelos_trained"
-            func=avaliar_modelos,
-            inputs=["modelos_trained", "X", "y", "n_drop_y"],
+            func=cacheado(avaliar_modelos),
+            inputs=["modelos_trained", "X", "y", "n_drop_y", "split_indices"],
             outputs=["best_model", "metricas_dict", "X_test"],
             name="avaliar_modelos_node",
         ),
+        Node(
+            func=compactar_modelo,
+            inputs=["best_model", "params:model.compacto"],
+            outputs="best_model_compacto",
+            name="compactar_modelo_node",
+        ),
+        Node(
+            func=relatorio_modelo_compacto,
+            inputs=["best_model", "best_model_compacto", "X", "y", "split_indices", "params:model.compacto"],
+            outputs="relatorio_modelo_compacto",
+            name="relatorio_modelo_compacto_node",
+        ),
+        Node(
+            func=treinar_por_servidor,
+            inputs=["minecraft_servidores_features@arrow", "params:model.por_servidor"],
+            outputs="registro_modelos",
+            name="treinar_por_servidor_node",
+        ),
+    ])
+
+
+def create_incremental_pipeline(**kwargs) -> Pipeline:
+    """Atualiza o best_model salvo só com os dias que chegaram depois do último treino."""
+    return Pipeline([
+        Node(
+            func=atualizar_modelo_incremental,
+            inputs=["best_model", "minecraft_servidores_features@arrow", "params:model.incremental"],
+            outputs=["best_model_atualizado", "historico_incremental"],
+            name="atualizar_modelo_incremental_node",
+        ),
+        Node(
+            func=compactar_modelo,
+            inputs=["best_model_atualizado", "params:model.compacto"],
+            outputs="best_model_compacto",
+            name="compactar_modelo_incremental_node",
+        ),
     ])
@@ -3,10 +3,14 @@ from the Kedro defaults. For further information, including these default values
 https://docs.kedro.org/en/stable/kedro_project_setup/settings.html."""
 
 # Instantiated project hooks.
-# For example, after creating a hooks.py and defining a ProjectHooks class there, do
-# from mine_tracker.hooks import ProjectHooks
 # Hooks are executed in a Last-In-First-Out (LIFO) order.
-# HOOKS = (ProjectHooks(),)
+# Métricas de cada run (JSON + textfile do Prometheus) em data/08_reporting/metricas_execucao;
+# MINE_TRACKER_TEXTFILE_DIR aponta o .prom para o diretório do textfile collector do node_exporter.
+# Cache de nodes (mine_tracker/cache.py): desligado a menos que cache_nodes.ativo seja true nos parâmetros.
+from mine_tracker.cache import CacheNodesHooks
+from mine_tracker.hooks import InstrumentacaoHooks
+
+HOOKS = (InstrumentacaoHooks(), CacheNodesHooks())
 
 # Installed plugins for which to disable hook auto-registration.
 # DISABLE_HOOKS_FOR_PLUGINS = ("kedro-viz",)
@@ -7,3 +7,345 @@ Kedro recommends using `pytest` framework, more info about it can be found
 in the official documentation:
 https://docs.pytest.org/en/latest/getting-started.html
 """
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mine_tracker.pipelines.inference.servico import MicroLote, criar_servidor
+from mine_tracker.pipelines.model.nodes import FEATURES
+
+
+class _ModeloSoma:
+    meta = {"colunas": ["hora", "media_movel_10"], "estimador": "Soma"}
+
+    def predict(self, df):
+        return (df["hora"] + df["media_movel_10"]).to_numpy(dtype=float)
+
+
+@pytest.fixture
+def servico():
+    servidor, micro = criar_servidor(_ModeloSoma(), {"porta": 0, "max_lote": 64, "max_espera_ms": 20})
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
+    micro.fechar()
+
+
+def _post(url, corpo):
+    requisicao = Request(url, data=json.dumps(corpo).encode(), headers={"Content-Type": "application/json"})
+    with urlopen(requisicao, timeout=10) as resposta:
+        return json.loads(resposta.read())
+
+
+def test_servico_agrupa_pedidos_concorrentes(servico):
+    """Pedidos simultâneos saem em micro-lotes e cada um recebe só as suas predições."""
+    def pedir(i):
+        return i, _post(f"{servico}/predict", [{"hora": i, "media_movel_10": 0.5}, {"hora": i, "media_movel_10": 1.0}])
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        respostas = list(pool.map(pedir, range(200)))
+
+    for i, resposta in respostas:
+        np.testing.assert_allclose(resposta["predictions"], [i + 0.5, i + 1.0])
+    with urlopen(f"{servico}/saude") as resposta:
+        saude = json.loads(resposta.read())
+    assert saude["pedidos"] == 200
+    assert saude["lotes"] < 200
+
+    with pytest.raises(Exception) as erro:
+        _post(f"{servico}/predict", {"instances": [{"hora": 1}]})
+    assert erro.value.code == 400
+
+
+def test_servico_pedido_invalido_nao_derruba_o_lote(servico):
+    """Valor não numérico é 400 só para quem o enviou; se um lote falhar, os pedidos são refeitos um a um."""
+    with pytest.raises(HTTPError) as erro:
+        _post(f"{servico}/predict", [{"hora": "abc", "media_movel_10": 1.0}])
+    assert erro.value.code == 400
+    assert "hora" in json.loads(erro.value.read())["erro"]
+    assert _post(f"{servico}/predict", [{"hora": "2", "media_movel_10": 1.5}])["predictions"] == [3.5]
+
+    def funcao(df):
+        if (df["hora"] < 0).any():
+            raise ValueError("hora negativa")
+        return df.assign(prediction=df["hora"] * 2.0)
+
+    micro = MicroLote(funcao, max_espera_ms=200)
+    try:
+        futuros = [micro.enviar(pd.DataFrame({"hora": [h]})) for h in (1, -1, 3)]
+        assert futuros[0].result(10).tolist() == [2.0]
+        with pytest.raises(ValueError, match="negativa"):
+            futuros[1].result(10)
+        assert futuros[2].result(10).tolist() == [6.0]
+    finally:
+        micro.fechar()
+
+
+def test_servico_usa_modelo_do_servidor_como_o_pipeline(tmp_path):
+    """Com o registro de modelos, o serviço prediz como o ``inferencia_node``: modelo do ip, senão o global."""
+    import joblib
+    from sklearn.dummy import DummyRegressor
+
+    from mine_tracker.pipelines.inference.nodes import inferencia_por_servidor
+
+    arquivo = str(tmp_path / "srv.pkl")
+    joblib.dump(DummyRegressor(strategy="constant", constant=42.0).fit(np.zeros((1, 2)), [42.0]), arquivo)
+    registro = {"modelos": {"srv.net": {"arquivo": arquivo}}}
+    entrada = [
+        {"hora": 1, "media_movel_10": 1.0, "ip": "srv.net"},
+        {"hora": 1, "media_movel_10": 1.0, "ip": "outro.net"},
+        {"hora": 2, "media_movel_10": 0.5},
+    ]
+
+    servidor, micro = criar_servidor(_ModeloSoma(), {"porta": 0}, registro)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}"
+    try:
+        predicoes = _post(f"{url}/predict", entrada)["predictions"]
+        with urlopen(f"{url}/saude") as resposta:
+            assert json.loads(resposta.read())["modelos_por_servidor"] == 1
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        micro.fechar()
+
+    assert predicoes == [42.0, 2.0, 2.5]
+    assert predicoes == inferencia_por_servidor(_ModeloSoma(), registro, pd.DataFrame(entrada))["prediction"].tolist()
+
+
+def test_servico_timeout_responde_503_e_descarta_pedido():
+    """Pedido que estoura o prazo na fila vira 503 com Retry-After e não é computado depois."""
+    liberar = threading.Event()
+    vistos = []
+
+    class _ModeloLento(_ModeloSoma):
+        def predict(self, df):
+            vistos.extend(df["hora"].tolist())
+            liberar.wait(10)
+            return super().predict(df)
+
+    servidor, micro = criar_servidor(_ModeloLento(), {"porta": 0, "max_espera_ms": 0, "timeout_segundos": 0.2})
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/predict"
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            ocupado = pool.submit(micro.prever, pd.DataFrame({"hora": [1], "media_movel_10": [0.0]}))
+            while not vistos:  # o primeiro lote segura a thread de micro-lotes
+                time.sleep(0.01)
+            with pytest.raises(HTTPError) as erro:
+                _post(url, [{"hora": 2, "media_movel_10": 0.0}])
+            liberar.set()
+            np.testing.assert_allclose(ocupado.result(timeout=10), [1.0])
+        assert erro.value.code == 503
+        assert erro.value.headers["Retry-After"] == "1"
+        assert _post(url, [{"hora": 3, "media_movel_10": 0.0}])["predictions"] == [3.0]
+        assert vistos == [1, 3] and micro.cancelados == 1
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        micro.fechar()
+
+
+def test_preforkado_compartilha_modelo_mapeado(tmp_path):
+    """Workers do pré-fork atendem no mesmo socket e relatam memória por processo."""
+    import subprocess
+    import sys
+    import time
+
+    script = f"""
+import numpy as np, pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from mine_tracker.datasets import ModeloCompacto
+from mine_tracker.pipelines.model.nodes import FEATURES, criar_pipelines
+from mine_tracker.pipelines.inference.servico import criar_servidor, servir_preforkado
+
+rng = np.random.default_rng(0)
+X = pd.DataFrame(rng.normal(size=(500, 5)), columns=FEATURES)
+modelo = criar_pipelines()["RandomForest"].set_params(est__n_estimators=10).fit(X, X.sum(axis=1))
+ModeloCompacto.de_pipeline(modelo).salvar({str(tmp_path / "compacto")!r})
+compacto = ModeloCompacto.carregar({str(tmp_path / "compacto")!r})
+compacto.aquecer()
+servidor, micro = criar_servidor(compacto, {{"porta": 0, "workers": 2}})
+open({str(tmp_path / "porta")!r}, "w").write(str(servidor.server_address[1]))
+servir_preforkado(servidor, micro, 2)
+"""
+    processo = subprocess.Popen([sys.executable, "-c", script])
+    try:
+        for _ in range(200):
+            if (tmp_path / "porta").exists() and (tmp_path / "porta").read_text():
+                break
+            time.sleep(0.05)
+        url = f"http://127.0.0.1:{(tmp_path / 'porta').read_text()}"
+
+        with urlopen(f"{url}/memoria", timeout=10) as resposta:
+            memoria = json.loads(resposta.read())
+        assert memoria["worker"]["pid"] != processo.pid
+        assert memoria["modelo_mapeado"] is True
+        assert memoria["worker"]["pss_kb"] <= memoria["worker"]["rss_kb"]
+        assert len(memoria["irmaos"]) == 1
+        assert len(_post(f"{url}/predict", {"instances": [dict.fromkeys(FEATURES, 0.0)]})["predictions"]) == 1
+    finally:
+        processo.terminate()
+        processo.wait(timeout=10)
+
+
+@pytest.mark.parametrize("executor", ["threads", "processos"])
+def test_inferencia_em_lotes_grava_em_ordem(tmp_path, executor):
+    """Lotes pontuados no pool saem na ordem da entrada e são gravados aos pedaços."""
+    import pandas as pd
+
+    from mine_tracker.datasets import ArquivoIncrementalDataset, ParquetParticionadoDataset
+    from mine_tracker.pipelines.inference.nodes import inferencia_em_lotes
+
+    entrada = pd.DataFrame({
+        "timestamp": pd.date_range("2022-09-02", periods=1000, freq="min", tz="UTC"),
+        "ip": "srv.net",
+        "hora": np.arange(1000) % 24,
+        "media_movel_10": np.arange(1000, dtype=float),
+        "outra": 1,
+    })
+    ParquetParticionadoDataset(filepath=str(tmp_path / "entrada.parquet")).save(entrada)
+    fonte = ParquetParticionadoDataset(filepath=str(tmp_path / "entrada.parquet"), lazy=True).load()
+
+    saida = ArquivoIncrementalDataset(filepath=str(tmp_path / "saida"))
+    params = {"linhas_por_lote": 64, "max_workers": 2, "executor": executor}
+    for lote in inferencia_em_lotes(_ModeloSoma(), fonte, params):
+        assert len(lote) <= 64
+        saida.save(lote)
+
+    resultado = saida.load()
+    assert len(list((tmp_path / "saida").iterdir())) == 16
+    assert list(resultado.columns) == ["timestamp", "ip", "hora", "media_movel_10", "prediction"]
+    np.testing.assert_array_equal(resultado["prediction"], entrada["hora"] + entrada["media_movel_10"])
+
+    csv = ArquivoIncrementalDataset(filepath=str(tmp_path / "saida.csv"), formato="csv")
+    for lote in inferencia_em_lotes(_ModeloSoma(), entrada, params):
+        csv.save(lote)
+    assert len(csv.load()) == 1000
+
+
+def test_inferencia_em_lotes_filtro_de_data_em_texto(tmp_path):
+    """Filtros do YAML vêm em texto e são convertidos para o tipo da partição (``data`` é date32)."""
+    from mine_tracker.datasets import ParquetParticionadoDataset
+    from mine_tracker.pipelines.inference.nodes import inferencia_em_lotes
+
+    entrada = pd.DataFrame({
+        "data": pd.to_datetime(["2024-12-31", "2025-01-01", "2025-01-02"] * 10).date,
+        "hora": np.arange(30) % 24,
+        "media_movel_10": np.arange(30, dtype=float),
+    })
+    caminho = str(tmp_path / "entrada")
+    ParquetParticionadoDataset(filepath=caminho, partition_cols=["data"]).save(entrada)
+    fonte = ParquetParticionadoDataset(filepath=caminho, lazy=True).load()
+    assert str(fonte.schema.field("data").type) == "date32[day]"
+
+    params = {"linhas_por_lote": 8, "max_workers": 1, "executor": "threads",
+              "colunas_extra": ["data"], "filtros": [["data", ">=", "2025-01-01"]]}
+    resultado = pd.concat(list(inferencia_em_lotes(_ModeloSoma(), fonte, params)))
+
+    assert len(resultado) == 20
+    assert (resultado["data"].astype(str) >= "2025-01-01").all()
+
+
+def test_generate_report_igual_a_varredura_por_cluster():
+    """O relatório gera o mesmo JSON que filtrar o DataFrame cluster a cluster,
+    com o agregado por hora sobre todas as instâncias."""
+    import pandas as pd
+
+    from mine_tracker.pipelines.inference.nodes import LEGENDA, action_for_load, generate_report, label_load
+    from mine_tracker.pipelines.mine.esquema import ESQUEMA_INFERENCIA, aplicar_esquema
+
+    rng = np.random.default_rng(0)
+    df = aplicar_esquema(pd.DataFrame({
+        "hora": rng.integers(0, 24, 3000),
+        "final_de_semana": rng.integers(0, 2, 3000),
+        "media_movel_10": rng.gamma(2.0, 400.0, 3000),
+        "proporcao_rede": rng.random(3000),
+        "pct_var_jogadores": rng.normal(0, 0.05, 3000),
+        "cluster": rng.integers(0, 40, 3000),
+    }), ESQUEMA_INFERENCIA)
+    df["prediction"] = rng.choice([29999.5, 30000.0, 59999.4, 60000.5, 90000.0, 120000.0], 3000)
+
+    esperado = {"legend": LEGENDA, "clusters": [], "ranking": [], "horas": []}
+    medias = pd.DataFrame([(c, df[df["cluster"] == c]["prediction"].mean()) for c in sorted(df["cluster"].unique())],
+                          columns=["cluster", "prediction"])
+    for _, row in medias.iterrows():
+        pred = round(float(row["prediction"]))
+        esperado["clusters"].append({
+            "cluster_id": int(row["cluster"]),
+            "baseline_prediction": pred,
+            "level": label_load(pred),
+            "action": action_for_load(label_load(pred)),
+            "instances": df[df["cluster"] == int(row["cluster"])].drop(columns=["prediction"]).to_dict(orient="records"),
+        })
+    rank = medias.sort_values("prediction", ascending=False).reset_index(drop=True)
+    for i, row in rank.iterrows():
+        pred = round(float(row["prediction"]))
+        esperado["ranking"].append({"posicao": i + 1, "cluster_id": int(row["cluster"]), "prediction": pred, "level": label_load(pred)})
+    previsao = df["cluster"].map({c["cluster_id"]: c["baseline_prediction"] for c in esperado["clusters"]}).astype(float)
+    nivel = df["cluster"].map({c["cluster_id"]: c["level"] for c in esperado["clusters"]})
+    for hora in sorted(df["hora"].unique()):
+        na_hora = df["hora"] == hora
+        esperado["horas"].append({
+            "hora": int(hora),
+            "observado": pytest.approx(df.loc[na_hora, "media_movel_10"].astype(float).mean()),
+            "previsao": pytest.approx(previsao[na_hora].mean()),
+            "soma_previsao": pytest.approx(previsao[na_hora].sum()),
+            "instancias": int(na_hora.sum()),
+            "alto": bool((nivel[na_hora] == "alto").any()),
+            "acoes": list(dict.fromkeys(c["action"] for c in esperado["clusters"] if c["cluster_id"] in set(df.loc[na_hora, "cluster"]))),
+        })
+
+    def serializar(report):
+        return json.dumps(report, indent=2, ensure_ascii=False)
+
+    report = generate_report(df)
+    assert report.pop("horas") == esperado.pop("horas")
+    assert serializar(report) == serializar(esperado)
+
+
+def test_relatorio_em_fluxo_limitado_e_sidecar(tmp_path):
+    """O JSON em fluxo é igual ao json.dump; instâncias limitadas e a base
+    completa no sidecar, de onde o relatório sai lendo um cluster por vez."""
+    import pandas as pd
+
+    from mine_tracker.datasets import JSONStreamDataset, ParquetParticionadoDataset
+    from mine_tracker.pipelines.inference.nodes import generate_report, instancias_relatorio
+
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "hora": rng.integers(0, 24, 500).astype("int8"),
+        "media_movel_10": rng.random(500).astype("float32"),
+        "cluster": rng.integers(0, 7, 500).astype("int16"),
+        "prediction": rng.gamma(2.0, 25000.0, 500),
+    })
+    caminho = tmp_path / "report.json"
+    dataset = JSONStreamDataset(filepath=str(caminho))
+
+    dataset.save(generate_report(df, {"streaming": True}))
+    assert caminho.read_text(encoding="utf-8") == json.dumps(generate_report(df), indent=2, ensure_ascii=False)
+
+    dataset.save(generate_report(df, {"streaming": True, "max_instancias_por_cluster": 5, "amostragem": "aleatoria"}))
+    report = dataset.load()
+    contagem = df["cluster"].value_counts()
+    assert all(len(c["instances"]) == 5 for c in report["clusters"])
+    assert all(c["total_instances"] == contagem[c["cluster_id"]] for c in report["clusters"])
+
+    sidecar = ParquetParticionadoDataset(filepath=str(tmp_path / "instancias"), partition_cols=["cluster"])
+    sidecar.save(instancias_relatorio(df))
+    cluster_3 = ParquetParticionadoDataset(
+        filepath=str(tmp_path / "instancias"), load_args={"filters": [("cluster", "=", 3)]}
+    ).load()
+    assert len(cluster_3) == contagem[3]
+
+    particionado = ParquetParticionadoDataset(filepath=str(tmp_path / "instancias"), lazy=True).load()
+    for params in ({}, {"max_instancias_por_cluster": 5, "amostragem": "aleatoria"}):
+        assert generate_report(particionado, params) == generate_report(df, params)
@@ -7,28 +7,246 @@ Kedro recommends using `pytest` framework, more info about it can be found
 in the official documentation:
 https://docs.pytest.org/en/latest/getting-started.html
 """
+import socket
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
 import pytest
-from unittest.mock import patch
 import pandas as pd
 
-from mine_tracker.pipelines.mine.nodes import carregar_dados, gerar_features
+from mine_tracker.pipelines.mine.download import baixar_dias
+from mine_tracker.datasets import ParquetParticionadoDataset, ParticoesDataset
+
+from mine_tracker.pipelines.mine.coletor import (
+    ColetorStreaming, Fonte, FonteArquivo, FonteReplay, FonteSocket, perfil_de_carga,
+)
+from mine_tracker.pipelines.mine.nodes import (
+    DOWNLOAD_PADRAO,
+    carregar_dados,
+    carregar_dados_incremental,
+    coletar_ultimas_4h,
+    gerar_features,
+    gerar_features_streaming,
+    relatorio_memoria,
+)
+from mine_tracker.pipelines.mine.esquema import ESQUEMA_FEATURES, ESQUEMA_INFERENCIA
+
+
+CSV_DIA = "timestamp,ip,playerCount\n1640995200000,192.168.1.1,100\n1640995260000,192.168.1.1,120\n"
+
+
+class _MinetrackFalso(BaseHTTPRequestHandler):
+    """Servidor HTTP local que imita o dl.minetrack.me."""
 
+    requisicoes = []
+    falhas_restantes = 0
+    inexistentes = set()
 
-def test_carregar_dados():
+    def do_GET(self):
+        cls = type(self)
+        cls.requisicoes.append((self.path, self.headers.get("If-None-Match")))
+        if self.path in cls.inexistentes:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if cls.falhas_restantes > 0:
+            cls.falhas_restantes -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        corpo = CSV_DIA.encode()
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def minetrack_local():
+    _MinetrackFalso.requisicoes = []
+    _MinetrackFalso.falhas_restantes = 0
+    _MinetrackFalso.inexistentes = set()
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _MinetrackFalso)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/Java", _MinetrackFalso
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_carregar_dados(minetrack_local, tmp_path):
     """Testa se carregar_dados funciona"""
-    with patch('pandas.read_csv') as mock_read:
-        # Mock simples
-        mock_read.return_value = pd.DataFrame({
-            'ip': ['192.168.1.1'],
-            'playerCount': [100],
-            'timestamp': ['1640995200000']
-        })
-        
-        result = carregar_dados()
-        
-        # Só verifica se retorna algo e não quebra
-        assert isinstance(result, pd.DataFrame)
-        assert len(result) > 0
+    base_url, _ = minetrack_local
+    params = {
+        "inicio": "2022-09-02",
+        "fim": "2022-09-04",
+        "download": {"base_url": base_url, "cache_dir": str(tmp_path)},
+    }
+
+    result = carregar_dados(params)
+
+    assert isinstance(result, pd.DataFrame)
+    assert len(result) == 6
+    assert result["timestamp"].dt.tz is not None
+
+
+def test_raw_particionado_por_dia_volta_igual(minetrack_local, tmp_path):
+    """O raw particionado por data volta com tipos e ordem de colunas originais
+    e aceita filtro de dia (texto, como no YAML) lido só do disco."""
+    base_url, _ = minetrack_local
+    raw = carregar_dados({
+        "inicio": "2022-09-02",
+        "fim": "2022-09-04",
+        "download": {"base_url": base_url, "cache_dir": str(tmp_path / "cache")},
+    })
+    caminho = str(tmp_path / "raw")
+    ParquetParticionadoDataset(filepath=caminho, partition_cols=["data"]).save(raw)
+
+    lido = ParquetParticionadoDataset(filepath=caminho).load()
+    pd.testing.assert_frame_equal(lido, raw, check_categorical=False)
+    assert list(lido.columns) == list(raw.columns)
+    assert lido["data"].dtype == "category"
+
+    def _do_dia(dia):
+        return ParquetParticionadoDataset(filepath=caminho, load_args={"filters": [("data", "=", dia)]}).load()
+
+    # o minetrack falso devolve o mesmo CSV (1º/jan/2022) para todos os dias
+    assert len(_do_dia("2022-01-01")) == 6
+    assert len(_do_dia("2022-09-03")) == 0
+
+
+def test_particionado_sobrescrever_mantem_tabela_se_gravacao_falha(tmp_path):
+    """A tabela anterior só sai depois que a nova foi gravada inteira."""
+    from kedro.io import DatasetError
+
+    caminho = tmp_path / "raw"
+    dataset = ParquetParticionadoDataset(filepath=str(caminho), partition_cols=["data"])
+    antes = pd.DataFrame({"ip": ["a", "b"], "playerCount": [1.0, 2.0], "data": ["2022-09-02", "2022-09-03"]})
+    dataset.save(antes)
+
+    def _falha():
+        raise RuntimeError("download interrompido")
+
+    for invalido in (pd.DataFrame(), antes.drop(columns="data"), antes.head(0),
+                     {"1": antes.head(1), "2": _falha}):
+        with pytest.raises((DatasetError, RuntimeError)):
+            dataset.save(invalido)
+        assert len(dataset.load()) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["raw"]  # nenhum temporário sobra
+
+    dataset.save(antes.tail(1))
+    assert dataset.load()["ip"].tolist() == ["b"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["raw"]
+
+
+def test_download_reexecucao_sem_rede(minetrack_local, tmp_path):
+    """Dias antigos já em cache não geram nenhuma requisição nova."""
+    base_url, servidor = minetrack_local
+    dias = [date(2022, 9, 2), date(2022, 9, 3)]
+    kwargs = {**DOWNLOAD_PADRAO, "base_url": base_url, "cache_dir": str(tmp_path), "hoje": date(2022, 10, 1)}
+
+    primeira = baixar_dias(dias, **kwargs)
+    assert [r.status for r in primeira] == ["baixado", "baixado"]
+    assert len(servidor.requisicoes) == 2
+
+    segunda = baixar_dias(dias, **kwargs)
+    assert [r.status for r in segunda] == ["cache", "cache"]
+    assert len(servidor.requisicoes) == 2
+
+
+def test_download_revalida_dias_recentes(minetrack_local, tmp_path):
+    """Dias recentes são revalidados com ETag e aceitam 304."""
+    base_url, servidor = minetrack_local
+    kwargs = {**DOWNLOAD_PADRAO, "base_url": base_url, "cache_dir": str(tmp_path), "hoje": date(2022, 9, 3)}
+
+    baixar_dias([date(2022, 9, 3)], **kwargs)
+    (r,) = baixar_dias([date(2022, 9, 3)], **kwargs)
+
+    assert r.status == "304"
+    assert servidor.requisicoes[-1] == ("/Java/3-9-2022.csv", '"v1"')
+
+
+def test_download_revalidacao_falha_usa_cache(minetrack_local, tmp_path):
+    """Se a revalidação de um dia recente falha (5xx ou sem rede), o CSV em cache continua na execução."""
+    base_url, servidor = minetrack_local
+    kwargs = {**DOWNLOAD_PADRAO, "base_url": base_url, "cache_dir": str(tmp_path), "hoje": date(2022, 9, 3),
+              "tentativas": 2, "backoff_segundos": 0.01}
+    (baixado,) = baixar_dias([date(2022, 9, 3)], **kwargs)
+
+    servidor.falhas_restantes = 2
+    (r,) = baixar_dias([date(2022, 9, 3)], **kwargs)
+    assert (r.status, r.caminho, r.erro) == ("cache", baixado.caminho, "HTTP 503")
+
+    (r,) = baixar_dias([date(2022, 9, 3)], **{**kwargs, "base_url": "http://127.0.0.1:9/Java"})
+    assert (r.status, r.caminho) == ("cache", baixado.caminho)
+    assert r.caminho.read_text() == CSV_DIA
+
+
+def test_download_tenta_de_novo_com_backoff(minetrack_local, tmp_path):
+    base_url, servidor = minetrack_local
+    servidor.falhas_restantes = 2
+
+    (r,) = baixar_dias(
+        [date(2022, 9, 2)], **{**DOWNLOAD_PADRAO, "base_url": base_url, "cache_dir": str(tmp_path), "backoff_segundos": 0.01}
+    )
+
+    assert r.status == "baixado"
+    assert len(servidor.requisicoes) == 3
+
+
+def test_download_dia_inexistente_nao_e_pedido_de_novo(minetrack_local, tmp_path):
+    """Um 404 de dia antigo fica no .meta.json; um recente é pedido de novo."""
+    base_url, servidor = minetrack_local
+    servidor.inexistentes = {"/Java/2-9-2022.csv", "/Java/30-9-2022.csv"}
+    kwargs = {**DOWNLOAD_PADRAO, "base_url": base_url, "cache_dir": str(tmp_path), "hoje": date(2022, 10, 1)}
+
+    for _ in range(2):
+        antigo, recente = baixar_dias([date(2022, 9, 2), date(2022, 9, 30)], **kwargs)
+        assert antigo.status == recente.status == "inexistente"
+        assert antigo.caminho is None
+
+    pedidos = [p for p, _ in servidor.requisicoes]
+    assert pedidos.count("/Java/2-9-2022.csv") == 1
+    assert pedidos.count("/Java/30-9-2022.csv") == 2
+
+
+def test_ingestao_incremental_so_dias_novos(minetrack_local, tmp_path):
+    """A segunda noite só busca e grava o dia que fechou desde a primeira."""
+    base_url, servidor = minetrack_local
+    particoes_dir = tmp_path / "raw"
+    dataset = ParticoesDataset(
+        path=str(particoes_dir),
+        dataset={"type": "pandas.CSVDataset", "save_args": {"index": False}},
+        filename_suffix=".csv",
+    )
+    params = {
+        "inicio": "2022-09-02",
+        "download": {"base_url": base_url, "cache_dir": str(tmp_path / "cache")},
+    }
+
+    assert dataset.load() == {}
+    primeira = carregar_dados_incremental(params, dataset.load(), hoje=date(2022, 9, 5))
+    assert sorted(primeira) == ["2022-09-02", "2022-09-03", "2022-09-04"]
+    dataset.save(primeira)
+
+    segunda = carregar_dados_incremental(params, dataset.load(), hoje=date(2022, 9, 6))
+    assert list(segunda) == ["2022-09-05"]
+    assert len(servidor.requisicoes) == 4
+    dataset.save(segunda)
+
+    assert sorted(dataset.load()) == ["2022-09-02", "2022-09-03", "2022-09-04", "2022-09-05"]
+    assert len(dataset.load()["2022-09-05"]()) == 2
 
 
 def test_gerar_features():
@@ -46,3 +264,198 @@ def test_gerar_features():
     assert isinstance(result, pd.DataFrame)
     assert len(result) > 0
     assert 'hora' in result.columns  # Uma feature básica
+
+
+def test_gerar_features_igual_ao_groupby_por_servidor():
+    """As features por servidor batem exatamente com o groupby('ip') linha a linha."""
+    rng = np.random.default_rng(0)
+    n = 3000
+    df_teste = pd.DataFrame({
+        'ip': [f"srv{i}.net" for i in rng.integers(0, 40, n)],
+        'playerCount': rng.integers(0, 500, n),
+        'timestamp': pd.Timestamp('2022-09-02', tz='UTC') + pd.to_timedelta(rng.integers(0, 86400, n), unit='s'),
+    })
+
+    result = gerar_features(df_teste)
+
+    por_ip = df_teste.groupby('ip')['playerCount']
+    esperado = {
+        'var_jogadores': por_ip.diff(),
+        'pct_var_jogadores': por_ip.pct_change() * 100,
+        'media_movel_10': por_ip.transform(lambda x: x.rolling(window=10, min_periods=1).mean()),
+        'media_movel_30': por_ip.transform(lambda x: x.rolling(window=30, min_periods=1).mean()),
+        'desvio_movel_30': por_ip.transform(lambda x: x.rolling(window=30, min_periods=1).std()),
+        'intervalo_segundos': df_teste.groupby('ip')['timestamp'].diff().dt.total_seconds(),
+    }
+    for coluna, serie in esperado.items():
+        # saída no esquema compacto (float32)
+        pd.testing.assert_series_equal(result[coluna], serie.astype('float32'), check_names=False, check_exact=True)
+
+
+def test_gerar_features_streaming_igual_ao_em_memoria(tmp_path):
+    """Processar dia a dia dá o mesmo resultado que o histórico inteiro em memória."""
+    rng = np.random.default_rng(1)
+    n = 6000
+    df_teste = pd.DataFrame({
+        'timestamp': pd.Timestamp('2022-09-02', tz='UTC')
+        + pd.to_timedelta(np.sort(rng.integers(0, 4 * 86400, n)), unit='s'),
+        'ip': [f"srv{i}.net" for i in rng.integers(0, 50, n)],
+        'playerCount': rng.integers(0, 800, n),
+    })
+    dias = {str(d): g.reset_index(drop=True) for d, g in df_teste.groupby(df_teste['timestamp'].dt.date)}
+
+    for chave in reversed(list(dias)):
+        dias[chave].to_parquet(tmp_path / f"{chave}.parquet", index=False)
+    raw = ParquetParticionadoDataset(filepath=str(tmp_path), lazy=True).load()
+
+    por_dia = list(gerar_features_streaming(raw))
+    assert [str(f['data'].iloc[0]) for f in por_dia] == sorted(dias)
+    result = pd.concat(por_dia, ignore_index=True)
+
+    esperado = gerar_features(pd.concat(dias.values(), ignore_index=True))
+    # cada dia tem suas próprias categorias; compara os valores
+    categoricas = ['ip', 'data', 'dia_da_semana']
+    result[categoricas] = result[categoricas].astype(object)
+    esperado[categoricas] = esperado[categoricas].astype(object)
+    pd.testing.assert_frame_equal(
+        result.drop(columns='desvio_movel_30'), esperado.drop(columns='desvio_movel_30'), check_exact=True
+    )
+    pd.testing.assert_series_equal(result['desvio_movel_30'], esperado['desvio_movel_30'], rtol=1e-9)
+
+
+def test_gerar_features_esquema_compacto():
+    """Saída no esquema declarado, com servidor_hora como código derivado."""
+    df_teste = pd.DataFrame({
+        'ip': ['b.net', 'a.net', 'b.net', None],
+        'playerCount': [100, 50, 120, 7],
+        'timestamp': pd.to_datetime(['2021-01-01 10:00', '2021-01-01 10:00', '2021-01-01 11:00', '2021-01-01 11:00'], utc=True),
+    })
+
+    result = gerar_features(df_teste)
+
+    for coluna, tipo in ESQUEMA_FEATURES.items():
+        assert str(result[coluna].dtype) == tipo, coluna
+    assert result['server_id'].tolist() == [1, 0, 1, -1]
+    assert result['servidor_hora'].tolist() == [34, 10, 35, -1]
+
+    relatorio = relatorio_memoria(df_teste, result)
+    assert relatorio['minecraft_servidores_features']['linhas'] == 4
+    assert set(relatorio['minecraft_servidores_features']['colunas']) == set(result.columns)
+
+
+def _rodadas(n_rodadas, n_servidores, seed=2):
+    """Leituras no formato do raw: todos os servidores a cada minuto, com falhas."""
+    rng = np.random.default_rng(seed)
+    inicio = pd.Timestamp('2022-09-03 22:00', tz='UTC')
+    df = pd.DataFrame({
+        'timestamp': np.repeat(inicio + pd.to_timedelta(np.arange(n_rodadas), unit='min'), n_servidores),
+        'ip': [f"srv{i}.net" for i in range(n_servidores)] * n_rodadas,
+        'playerCount': rng.integers(1, 500, n_rodadas * n_servidores).astype(float),
+    })
+    df.loc[rng.random(len(df)) < 0.05, 'playerCount'] = np.nan
+    df.loc[len(df) - n_servidores:, 'playerCount'] = rng.integers(1, 500, n_servidores)  # última rodada completa
+    return df
+
+
+def test_coletor_igual_a_ultima_linha_de_gerar_features():
+    """O quadro do coletor é a última linha de cada servidor em gerar_features."""
+    df_teste = _rodadas(300, 12)
+    coletor = ColetorStreaming(janela=10, expiracao_segundos=None)
+    assert coletor.consumir(FonteReplay(df_teste)) == len(df_teste)
+
+    quadro = coletor.quadro()
+    esperado = gerar_features(df_teste).groupby('ip', observed=True).tail(1).set_index('ip')
+    esperado = esperado.loc[quadro['ip'].astype(str)]
+
+    assert len(quadro) == 12
+    assert quadro['cluster'].tolist() == perfil_de_carga(quadro['media_movel_10'], [30000, 60000, 90000]).tolist()
+    for coluna in ['hora', 'final_de_semana']:
+        np.testing.assert_array_equal(quadro[coluna], esperado[coluna])
+    for coluna in ['media_movel_10', 'proporcao_rede', 'pct_var_jogadores']:
+        np.testing.assert_allclose(quadro[coluna], esperado[coluna], rtol=1e-6)
+
+
+def test_coletor_descarta_fora_de_ordem_e_expira():
+    coletor = ColetorStreaming(janela=3, expiracao_segundos=60)
+    coletor.consumir(FonteReplay(pd.DataFrame({
+        'timestamp': pd.to_datetime([0, 60_000, 30_000, 120_000, 180_000], unit='ms', utc=True),
+        'ip': ['a', 'a', 'a', 'b', 'b'],
+        'playerCount': [10, 20, 99, 30, 60],
+    })))
+
+    assert coletor.descartadas == 1
+    quadro = coletor.quadro()
+    assert quadro['ip'].tolist() == ['b']  # 'a' sem leitura há mais de 60s
+    assert quadro['cluster'].tolist() == [0]
+    assert quadro[['media_movel_10', 'proporcao_rede', 'pct_var_jogadores']].iloc[0].tolist() == [45, 1, 100]
+
+
+def test_coletor_cluster_e_perfil_de_carga_e_mantem_incompletos():
+    """``cluster`` é a faixa de carga da média móvel; servidores com feature indefinida
+    ficam no quadro com NaN (o imputer do modelo completa), a menos que se peça ``completos``."""
+    coletor = ColetorStreaming(janela=3, expiracao_segundos=None, limites_cluster=[100, 1000])
+    coletor.consumir(FonteReplay(pd.DataFrame({
+        'timestamp': pd.to_datetime([0, 0, 0, 0, 60_000, 60_000, 60_000], unit='ms', utc=True),
+        'ip': ['zero', 'medio', 'alto', 'unico', 'zero', 'medio', 'alto'],
+        'playerCount': [0, 500, 5000, 50, 10, 700, 3000],
+    })))
+
+    quadro = coletor.quadro().set_index('ip')
+    assert quadro['cluster'].to_dict() == {'zero': 0, 'unico': 0, 'medio': 1, 'alto': 2}
+    assert np.isnan(quadro.loc['zero', 'pct_var_jogadores'])  # variação sobre 0 jogadores
+    assert np.isnan(quadro.loc['unico', 'pct_var_jogadores'])  # uma leitura só
+    assert set(coletor.quadro(completos=True)['ip']) == {'medio', 'alto'}
+
+    assert perfil_de_carga([np.nan, 99.0, 100.0, 1e6], [100, 1000]).tolist() == [0, 0, 1, 2]
+    with pytest.raises(ValueError):
+        ColetorStreaming(limites_cluster=[1000, 100])
+    with pytest.raises(TypeError):
+        Fonte()
+
+
+def test_coletor_fontes_arquivo_e_socket(tmp_path):
+    caminho = tmp_path / "leituras.csv"
+    caminho.write_text("timestamp,ip,playerCount\n1640995200000,a.net,100\n")
+    coletor = ColetorStreaming()
+    fonte = FonteArquivo(str(caminho), intervalo_segundos=0.05)
+    thread = coletor.iniciar(fonte)
+    with open(caminho, "a") as f:
+        f.write('{"timestamp": 1640995260000, "ip": "a.net", "playerCount": 1')  # linha incompleta
+        f.flush()
+        time.sleep(0.2)
+        f.write('50}\nlixo\n')
+    for _ in range(100):
+        if coletor.amostras == 2:
+            break
+        time.sleep(0.05)
+    fonte.fechar()
+    thread.join(5)
+    assert coletor.quadro()['pct_var_jogadores'].tolist() == [50]
+    assert fonte.invalidas == 1
+
+    fonte = FonteSocket(porta=0)
+    thread = coletor.iniciar(fonte)
+    with socket.create_connection(fonte.endereco) as cliente:
+        cliente.sendall(b"1640995320000,a.net,300\n1640995320000,b.net,100\n")
+    for _ in range(100):
+        if coletor.amostras == 4:
+            break
+        time.sleep(0.05)
+    fonte.fechar()
+    thread.join(5)
+    quadro = coletor.quadro().set_index('ip')
+    assert quadro.index.tolist() == ['a.net', 'b.net']
+    assert quadro['proporcao_rede'].tolist() == [0.75, 0.25]
+    assert np.isnan(quadro.loc['b.net', 'pct_var_jogadores'])  # b.net com uma leitura só
+
+
+def test_coletar_ultimas_4h_esquema_de_inferencia():
+    df_teste = _rodadas(6 * 60, 5)
+    df_teste.loc[df_teste['ip'] == 'srv4.net', 'timestamp'] -= pd.Timedelta(hours=5)  # fora da janela
+
+    result = coletar_ultimas_4h(df_teste, {"fonte": {"tipo": "replay", "janela_horas": 4}})
+
+    assert list(result.columns) == list(ESQUEMA_INFERENCIA) + ['ip']
+    for coluna, tipo in ESQUEMA_INFERENCIA.items():
+        assert str(result[coluna].dtype) == tipo, coluna
+    assert sorted(result['ip'].astype(str)) == [f"srv{i}.net" for i in range(4)]
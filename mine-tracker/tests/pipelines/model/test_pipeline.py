@@ -7,3 +7,266 @@ Kedro recommends using `pytest` framework, more info about it can be found
 in the official documentation:
 https://docs.pytest.org/en/latest/getting-started.html
 """
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mine_tracker.datasets import ParquetParticionadoDataset
+from mine_tracker.pipelines.mine.nodes import gerar_features
+from mine_tracker.pipelines.model.nodes import FEATURES, TARGET, load_data
+
+
+@pytest.fixture
+def features():
+    rng = np.random.default_rng(0)
+    n = 4000
+    raw = pd.DataFrame({
+        'timestamp': pd.Timestamp('2022-09-02', tz='UTC')
+        + pd.to_timedelta(np.sort(rng.integers(0, 3 * 86400, n)), unit='s'),
+        'ip': [f"srv{i}.net" for i in rng.integers(0, 20, n)],
+        'playerCount': rng.integers(0, 900, n),
+    })
+    return gerar_features(raw)
+
+
+def test_load_data_parquet_le_so_o_servidor_escolhido(features, tmp_path):
+    """Com o dataset particionado, load_data lê só as colunas do modelo e o servidor escolhido."""
+    caminho = str(tmp_path / "features")
+    ParquetParticionadoDataset(filepath=caminho, partition_cols=["data"]).save(features)
+
+    em_memoria = load_data(features)
+    particionado = load_data(ParquetParticionadoDataset(filepath=caminho, lazy=True).load())
+
+    assert sorted(p.name for p in (tmp_path / "features").iterdir() if p.is_dir()) == [
+        "data=2022-09-02", "data=2022-09-03", "data=2022-09-04"
+    ]
+    assert particionado.attrs["servidor_escolhido"] == em_memoria.attrs["servidor_escolhido"]
+    assert list(particionado.columns) == FEATURES + [TARGET]
+    np.testing.assert_array_equal(
+        particionado[TARGET].to_numpy(), em_memoria[TARGET].to_numpy()
+    )
+
+
+def test_treinar_por_servidor_e_inferencia_pelo_registro(features, tmp_path):
+    """Um modelo por servidor no registro; a inferência usa o do ip de cada linha."""
+    from mine_tracker.pipelines.inference.nodes import _abrir_modelo_servidor, inferencia, inferencia_por_servidor
+    from mine_tracker.pipelines.model.nodes import _id_arquivo, treinar_por_servidor
+
+    caminho = str(tmp_path / "features")
+    ParquetParticionadoDataset(filepath=caminho, partition_cols=["data"]).save(features)
+    dataset = ParquetParticionadoDataset(filepath=caminho, lazy=True).load()
+    params = {"dir": str(tmp_path / "modelos"), "min_linhas": 150, "n_estimators": 5, "max_workers": 2}
+
+    registro = treinar_por_servidor(dataset, params)
+
+    contagem = features["ip"].value_counts()
+    assert set(registro["modelos"]) == {str(ip) for ip, n in contagem.items() if n >= 150}
+    assert all("mae" in info and "r2" in info for info in registro["modelos"].values())
+    assert all(os.path.isfile(os.path.join(info["arquivo"], "meta.json")) for info in registro["modelos"].values())
+    assert _id_arquivo("host:25565") != _id_arquivo("host_25565")
+
+    class Global:
+        def predict(self, df):
+            return np.full(len(df), -1.0)
+
+    com_modelo = next(iter(registro["modelos"]))
+    entrada = features[features["ip"].isin([com_modelo, "desconhecido"])][FEATURES + ["ip"]].head(20)
+    entrada = pd.concat([entrada, entrada.head(1).assign(ip="desconhecido")], ignore_index=True)
+    result = inferencia_por_servidor(Global(), registro, entrada)
+
+    assert (result["prediction"].iloc[:-1] >= 0).all()
+    assert result["prediction"].iloc[-1] == -1.0
+    # a segunda chamada reusa o modelo já mapeado
+    abertos = _abrir_modelo_servidor.cache_info().misses
+    pd.testing.assert_frame_equal(inferencia_por_servidor(Global(), registro, entrada), result)
+    assert _abrir_modelo_servidor.cache_info().misses == abertos
+    sem_ip = inferencia_por_servidor(Global(), registro, entrada.drop(columns="ip"))
+    pd.testing.assert_frame_equal(sem_ip, inferencia(Global(), entrada.drop(columns="ip")))
+
+
+def test_split_unico_e_treino_concorrente(features):
+    """O split é calculado uma vez; o aleatório é o mesmo do train_test_split."""
+    from sklearn.model_selection import train_test_split
+
+    from mine_tracker.pipelines.model.nodes import (
+        avaliar_modelos,
+        criar_pipelines,
+        dividir_treino_teste,
+        preprocess_data,
+        treinar_modelos,
+    )
+
+    X, y, n_drop_y = preprocess_data(load_data(features))
+
+    split = dividir_treino_teste(X, y, {"test_size": 0.2, "random_state": 42})
+    _, X_test_ref, _, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+    assert list(X.index[split["teste"]]) == list(X_test_ref.index)
+
+    temporal = dividir_treino_teste(X, y, {"test_size": 0.25, "split_estrategia": "temporal"})
+    assert temporal["treino"].max() < temporal["teste"].min()
+    assert len(temporal["teste"]) == int(np.ceil(0.25 * len(X)))
+
+    modelos = treinar_modelos(criar_pipelines(), X, y, split)
+    melhor, metricas, X_test = avaliar_modelos(modelos, X, y, n_drop_y, split)
+
+    assert set(metricas) == {"LinearRegression", "RandomForest"}
+    assert melhor is modelos[max(metricas, key=lambda k: metricas[k]["r2"])]
+    assert len(X_test) == len(split["teste"])
+
+
+def test_atualizacao_incremental_le_so_os_dias_novos(features, tmp_path):
+    """O best_model incorpora só os dias depois da marca d'água e não repete dias já vistos."""
+    from mine_tracker.pipelines.model.nodes import (
+        atualizar_modelo_incremental,
+        avaliar_modelos,
+        criar_pipelines,
+        dividir_treino_teste,
+        preprocess_data,
+        treinar_modelos,
+    )
+
+    caminho = str(tmp_path / "features")
+    escrita = ParquetParticionadoDataset(filepath=caminho, partition_cols=["data"], save_args={"modo": "particoes"})
+    leitura = ParquetParticionadoDataset(filepath=caminho, lazy=True)
+    dias = features["data"].astype(str)
+    escrita.save(features[dias < "2022-09-04"])
+
+    X, y, n_drop_y = preprocess_data(load_data(leitura.load()))
+    split = dividir_treino_teste(X, y)
+    modelos = treinar_modelos(criar_pipelines(), X, y, split)
+    modelo = modelos["RandomForest"]
+    modelo.servidor_escolhido_, modelo.ultimo_dia_ = X.attrs["servidor_escolhido"], X.attrs["ultimo_dia"]
+    assert modelo.ultimo_dia_ == "2022-09-03"
+    assert avaliar_modelos(modelos, X, y, n_drop_y, split)[0].ultimo_dia_ == "2022-09-03"
+
+    escrita.save(features[dias == "2022-09-04"])
+    params = {"n_arvores_novas": 10, "max_arvores": 205}
+    modelo, historico = atualizar_modelo_incremental(modelo, leitura.load(), params)
+    (registro,) = historico.values()
+
+    novas = features[(dias == "2022-09-04") & (features["ip"] == modelo.servidor_escolhido_)]
+    assert registro["linhas"] + registro["n_drop_y"] == len(novas)
+    assert registro["arvores_retiradas"] == 5
+    assert len(modelo.named_steps["est"].estimators_) == 205
+    assert modelo.ultimo_dia_ == "2022-09-04"
+    assert modelo.predict(X.head()).shape == (5,)
+
+    _, historico = atualizar_modelo_incremental(modelo, leitura.load(), params)
+    assert next(iter(historico.values()))["status"] == "sem dados novos"
+
+
+def test_busca_halving_reusa_preprocessamento_e_retoma(features, tmp_path):
+    """A busca compartilha o prep entre candidatos e um rerun retoma pelo diário."""
+    from mine_tracker.pipelines.model.nodes import (
+        buscar_hiperparametros,
+        criar_pipelines,
+        dividir_treino_teste,
+        preprocess_data,
+    )
+
+    X, y, _ = preprocess_data(load_data(features))
+    split = dividir_treino_teste(X, y)
+    params = {
+        "ativa": True, "recurso": "linhas", "fator": 2, "linhas_min": 20, "max_workers": 2,
+        "diario": str(tmp_path / "diario.jsonl"),
+        "grade": {"RandomForest": {"est__max_depth": [2, 8], "est__min_samples_leaf": [1, 10]}},
+    }
+    criar = lambda: {nome: m.set_params(est__n_estimators=5) if nome == "RandomForest" else m for nome, m in criar_pipelines().items()}
+
+    modelos, relatorio = buscar_hiperparametros(criar(), X, y, split, params)
+    rodadas = relatorio["modelos"]["RandomForest"]["rodadas"]
+
+    assert [r["candidatos"] for r in rodadas] == [4, 2, 1]
+    assert relatorio["preprocessamentos_ajustados"] == len(rodadas)
+    assert relatorio["preprocessamentos_reusados"] == 4 + 2 + 1 - len(rodadas)
+    melhores = relatorio["modelos"]["RandomForest"]["melhores_params"]
+    assert modelos["RandomForest"].get_params()["est__max_depth"] == melhores["est__max_depth"]
+
+    _, retomado = buscar_hiperparametros(criar(), X, y, split, params)
+    assert all(r["retomados"] == r["candidatos"] for r in retomado["modelos"]["RandomForest"]["rodadas"])
+    assert retomado["modelos"]["RandomForest"]["melhores_params"] == melhores
+    assert buscar_hiperparametros(criar(), X, y, split, {"ativa": False})[1] == {"ativa": False}
+
+
+def test_modelo_compacto_prediz_igual_e_relatorio(features, tmp_path):
+    """O formato compacto reproduz o Pipeline e a poda aparece como custo no relatório."""
+    from mine_tracker.datasets import ModeloCompactoDataset
+    from mine_tracker.pipelines.model.nodes import (
+        compactar_modelo,
+        criar_pipelines,
+        dividir_treino_teste,
+        preprocess_data,
+        relatorio_modelo_compacto,
+        treinar_modelos,
+    )
+
+    X, y, _ = preprocess_data(load_data(features))
+    X.iloc[::7, 2] = np.nan  # exercita o imputer
+    split = dividir_treino_teste(X, y)
+    modelos = treinar_modelos({n: m.set_params(est__n_estimators=20) if n == "RandomForest" else m
+                               for n, m in criar_pipelines().items()}, X, y, split)
+
+    dataset = ModeloCompactoDataset(filepath=str(tmp_path / "compacto"))
+    for modelo in modelos.values():
+        dataset.save(compactar_modelo(modelo))
+        np.testing.assert_array_equal(dataset.load().predict(X), modelo.predict(X))
+    assert isinstance(dataset.load().arrays["feature"], np.memmap)
+
+    rf = modelos["RandomForest"]
+    podado = compactar_modelo(rf, {"profundidade_max": 2, "max_arvores": 5})
+    relatorio = relatorio_modelo_compacto(rf, podado, X, y, split, {"benchmark_lotes": [1, 8], "repeticoes": 1})
+
+    assert (podado.meta["arvores"], podado.meta["profundidade"]) == (5, 2)
+    assert relatorio["tamanho_bytes"]["compacto"] < relatorio["tamanho_bytes"]["joblib"]
+    assert set(relatorio["predicao_segundos"]) == {"lote_1", "lote_8"}
+    assert relatorio["teste"]["custo_r2"] == pytest.approx(relatorio["teste"]["r2_original"] - relatorio["teste"]["r2_compacto"])
+    assert relatorio["teste"]["max_dif_predicao"] > 0
+
+
+def test_modelo_compacto_regravado_atomicamente(features, tmp_path, monkeypatch):
+    """Regravar troca o diretório inteiro de uma vez: quem já mapeou o antigo segue
+    prevendo e uma gravação que falha deixa o modelo anterior no lugar."""
+    from mine_tracker.datasets import ModeloCompacto
+    from mine_tracker.pipelines.model.nodes import compactar_modelo, criar_pipelines, preprocess_data
+
+    X, y, _ = preprocess_data(load_data(features))
+    rf = criar_pipelines()["RandomForest"].set_params(est__n_estimators=5).fit(X, y)
+    linear = criar_pipelines()["LinearRegression"].fit(X, y)
+    caminho = str(tmp_path / "modelo")
+
+    compactar_modelo(rf).salvar(caminho)
+    mapeado = ModeloCompacto.carregar(caminho, mmap=True)
+    compactar_modelo(linear).salvar(caminho)
+    np.testing.assert_array_equal(mapeado.predict(X), rf.predict(X))
+    np.testing.assert_array_equal(ModeloCompacto.carregar(caminho).predict(X), linear.predict(X))
+
+    def _falha(*args, **kwargs):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(np, "save", _falha)
+    with pytest.raises(OSError):
+        compactar_modelo(rf).salvar(caminho)
+    np.testing.assert_array_equal(ModeloCompacto.carregar(caminho).predict(X), linear.predict(X))
+    assert [p.name for p in tmp_path.iterdir()] == ["modelo"]
+
+
+def test_modelo_compacto_prediz_em_blocos(features, monkeypatch):
+    """Predições grandes descem a floresta em blocos de linhas sem mudar o resultado."""
+    from mine_tracker.datasets import modelo_compacto
+    from mine_tracker.pipelines.model.nodes import compactar_modelo, criar_pipelines, preprocess_data
+
+    X, y, _ = preprocess_data(load_data(features))
+    rf = criar_pipelines()["RandomForest"].set_params(est__n_estimators=7).fit(X, y)
+    compacto = compactar_modelo(rf)
+    inteiro = compacto.predict(X)
+
+    chamadas = []
+    prever = compacto._prever_floresta
+    monkeypatch.setattr(compacto, "_prever_floresta", lambda bloco: chamadas.append(len(bloco)) or prever(bloco))
+    monkeypatch.setattr(modelo_compacto, "_PARES_POR_BLOCO", 7 * 10)  # 10 linhas por bloco
+
+    np.testing.assert_array_equal(compacto.predict(X), inteiro)
+    np.testing.assert_array_equal(compacto.predict(X), rf.predict(X))
+    assert len(chamadas) > 1 and max(chamadas) == 10
@@ -0,0 +1,239 @@
+import gzip
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mine_tracker.datasets import JSONStreamDataset, ParquetParticionadoDataset
+from mine_tracker.pipelines.inference.nodes import generate_report
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "app"))
+import app as app_flask  # noqa: E402
+
+
+def _saida_inferencia(semente=0, linhas=400, clusters=6):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        "hora": rng.integers(0, 24, linhas).astype("int8"),
+        "final_de_semana": rng.integers(0, 2, linhas).astype("int8"),
+        "media_movel_10": rng.gamma(2.0, 400.0, linhas).astype("float32"),
+        "proporcao_rede": rng.random(linhas).astype("float32"),
+        "pct_var_jogadores": rng.normal(0, 0.05, linhas).astype("float32"),
+        "cluster": rng.integers(0, clusters, linhas).astype("int16"),
+        "prediction": rng.gamma(2.0, 30000.0, linhas),
+    })
+
+
+def _gravar(diretorio, df, max_instancias=5):
+    """Grava o relatório e o Parquet de instâncias como o pipeline 'inference'."""
+    ParquetParticionadoDataset(
+        filepath=str(diretorio / app_flask.INSTANCIAS_DIR), partition_cols=["cluster"]
+    ).save(df)
+    JSONStreamDataset(filepath=str(diretorio / "report_inference.json")).save(
+        generate_report(df, {"streaming": True, "max_instancias_por_cluster": max_instancias})
+    )
+    return diretorio / "report_inference.json"
+
+
+@pytest.fixture
+def relatorio(tmp_path, monkeypatch):
+    df = _saida_inferencia()
+    caminho = _gravar(tmp_path, df)
+    monkeypatch.setattr(app_flask, "cache", app_flask.CacheRelatorio(str(caminho)))
+    return caminho, df
+
+
+@pytest.fixture
+def cliente():
+    return app_flask.app.test_client()
+
+
+def test_cache_relatorio_etag_gzip_e_304(relatorio, cliente):
+    """/api/data sai do cache com ETag/Last-Modified, gzip negociado e 304 na revalidação."""
+    caminho, _ = relatorio
+
+    simples = cliente.get("/api/data")
+    assert simples.status_code == 200
+    assert "Content-Encoding" not in simples.headers
+    assert json.loads(simples.data) == json.loads(caminho.read_bytes())
+    assert simples.headers["Vary"] == "Accept-Encoding"
+    assert simples.last_modified is not None
+
+    comprimido = cliente.get("/api/data", headers={"Accept-Encoding": "gzip"})
+    assert comprimido.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(comprimido.data) == simples.data
+    assert comprimido.headers["ETag"] != simples.headers["ETag"]
+
+    assert cliente.get("/api/data", headers={"If-None-Match": simples.headers["ETag"]}).status_code == 304
+    assert cliente.get("/api/data", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": comprimido.headers["ETag"],
+    }).status_code == 304
+    assert cliente.get("/api/data", headers={"If-Modified-Since": simples.headers["Last-Modified"]}).status_code == 304
+
+    # mesmo conteúdo com mtime novo: relido, mas a versão (e o ETag) continuam
+    entrada = app_flask.cache.obter()
+    os.utime(caminho, ns=(os.stat(caminho).st_atime_ns, os.stat(caminho).st_mtime_ns + 10**9))
+    assert app_flask.cache.obter() is entrada
+    assert cliente.get("/api/data", headers={"If-None-Match": simples.headers["ETag"]}).status_code == 304
+
+    _gravar(caminho.parent, _saida_inferencia(semente=1))
+    novo = cliente.get("/api/data", headers={"If-None-Match": simples.headers["ETag"]})
+    assert novo.status_code == 200
+    assert novo.headers["ETag"] != simples.headers["ETag"]
+
+
+def test_cache_relatorio_sem_arquivo_responde_503(tmp_path, monkeypatch, cliente):
+    monkeypatch.setattr(app_flask, "cache", app_flask.CacheRelatorio(str(tmp_path / "report_inference.json")))
+    resposta = cliente.get("/api/resumo")
+    assert resposta.status_code == 503
+    assert "erro" in resposta.get_json()
+
+
+def test_consulta_clusters_paginada_e_filtrada(relatorio, cliente):
+    """/api/clusters pagina com offset/limit e filtra por nível; cada consulta tem o seu ETag."""
+    _, df = relatorio
+    resumo = cliente.get("/api/resumo").get_json()
+    assert len(resumo["clusters"]) == df["cluster"].nunique()
+    assert all("instances" not in c for c in resumo["clusters"])
+
+    pagina = cliente.get("/api/clusters?offset=2&limit=3").get_json()
+    assert pagina["total"] == len(resumo["clusters"])
+    assert pagina["itens"] == resumo["clusters"][2:5]
+
+    nivel = resumo["clusters"][0]["level"]
+    filtrada = cliente.get(f"/api/clusters?level={nivel}").get_json()
+    assert filtrada["itens"] == [c for c in resumo["clusters"] if c["level"] == nivel]
+
+    primeira = cliente.get("/api/clusters?limit=3")
+    assert primeira.headers["ETag"] != cliente.get("/api/clusters?limit=4").headers["ETag"]
+    assert cliente.get("/api/clusters?limit=3", headers={"If-None-Match": primeira.headers["ETag"]}).status_code == 304
+
+
+def test_consulta_instancias_vem_da_base_completa(relatorio, cliente):
+    """Instâncias paginadas saem do Parquet (não da amostra do JSON), com faixa de hora e campos."""
+    _, df = relatorio
+    cluster = df[df["cluster"] == 2].reset_index(drop=True)
+    assert len(cluster) > 5  # o JSON guarda só 5 por cluster
+
+    pagina = cliente.get("/api/clusters/2/instancias?offset=3&limit=4").get_json()
+    assert pagina["total"] == len(cluster)
+    assert [i["media_movel_10"] for i in pagina["itens"]] == cluster["media_movel_10"].iloc[3:7].tolist()
+    assert "prediction" not in pagina["itens"][0]
+
+    faixa = cliente.get("/api/clusters/2/instancias?hora_min=6&hora_max=12&campos=hora,media_movel_10&limit=1000").get_json()
+    esperado = cluster[cluster["hora"].between(6, 12)]
+    assert faixa["total"] == len(esperado)
+    assert faixa["itens"] == esperado[["hora", "media_movel_10"]].to_dict(orient="records")
+
+    horas = cliente.get("/api/resumo").get_json()["horas"]
+    assert sum(h["instancias"] for h in horas) == len(df)
+
+    exportado = cliente.get("/api/exportar?formato=csv").get_data(as_text=True).splitlines()
+    assert len(exportado) == len(df) + 1
+
+
+def test_instancias_relidas_quando_o_parquet_e_regravado(relatorio, cliente):
+    """O Parquet das instâncias é regravado antes do JSON: a paginação reabre em vez de dar 500."""
+    caminho, df = relatorio
+    assert cliente.get("/api/clusters/2/instancias").get_json()["total"] == int((df["cluster"] == 2).sum())
+
+    # só o Parquet mudou (o JSON ainda é o antigo): o cluster 2 sumiu e o 1 dobrou
+    novo = pd.concat([df[df["cluster"] == 1]] * 2 + [df[~df["cluster"].isin([1, 2])]], ignore_index=True)
+    ParquetParticionadoDataset(
+        filepath=str(caminho.parent / app_flask.INSTANCIAS_DIR), partition_cols=["cluster"]
+    ).save(novo)
+    assert cliente.get("/api/clusters/2/instancias").get_json()["total"] == 0
+    assert cliente.get("/api/clusters/1/instancias").get_json()["total"] == 2 * int((df["cluster"] == 1).sum())
+    exportado = cliente.get("/api/exportar?formato=csv").get_data(as_text=True).splitlines()
+    assert len(exportado) == len(novo) + 1
+
+    # arquivo apagado dentro da partição: o diretório raiz não muda, a leitura falha e o dataset é reaberto
+    for arquivo in (caminho.parent / app_flask.INSTANCIAS_DIR / "cluster=1").iterdir():
+        arquivo.unlink()
+    assert cliente.get("/api/clusters/1/instancias").get_json()["total"] == 0
+
+
+@pytest.mark.parametrize("consulta, status", [
+    ("/api/clusters?limit=0", 400),
+    ("/api/clusters?limit=1001", 400),
+    ("/api/clusters?offset=-1", 400),
+    ("/api/clusters?offset=x", 400),
+    ("/api/clusters/2/instancias?hora_min=24", 400),
+    ("/api/clusters/2/instancias?hora_max=-1", 400),
+    ("/api/clusters/2/instancias?campos=hora,senha", 400),
+    ("/api/clusters/99/instancias", 404),
+    ("/api/exportar?formato=xml", 400),
+])
+def test_consulta_valida_parametros(relatorio, cliente, consulta, status):
+    resposta = cliente.get(consulta)
+    assert resposta.status_code == status
+    assert "erro" in resposta.get_json()
+
+
+def _cluster(cid, pred, level="baixo"):
+    return {"cluster_id": cid, "baseline_prediction": pred, "level": level, "action": f"ação {level}", "instances": []}
+
+
+def test_diferenca_indices_so_o_que_mudou():
+    legenda = {"hora": "Hora do dia"}
+    antigo = app_flask.IndiceRelatorio({
+        "legend": legenda,
+        "clusters": [_cluster(0, 100), _cluster(1, 200), _cluster(2, 300)],
+        "ranking": [{"posicao": 1, "cluster_id": 2}],
+        "horas": [{"hora": 1, "instancias": 3}],
+    }, "v1")
+    novo = app_flask.IndiceRelatorio({
+        "legend": legenda,
+        "clusters": [_cluster(1, 95000, "crítico"), _cluster(0, 100), _cluster(3, 50)],
+        "ranking": [{"posicao": 1, "cluster_id": 1}],
+        "horas": [{"hora": 1, "instancias": 3}],
+    }, "v2")
+
+    diff = app_flask.diferenca_indices(antigo, novo)
+    assert (diff["versao"], diff["anterior"]) == ("v2", "v1")
+    assert [c["cluster_id"] for c in diff["clusters"]] == [1, 3]
+    assert diff["removidos"] == [2]
+    assert diff["ordem"] == [1, 0, 3]
+    assert diff["ranking"] == novo.ranking
+    assert "legend" not in diff and "horas" not in diff
+    assert app_flask.diferenca_indices(novo, novo) == {"versao": "v2", "anterior": "v2", "clusters": [], "removidos": []}
+
+
+def _eventos(fila):
+    """Eventos SSE pendentes na fila, como (tipo, dados)."""
+    eventos = []
+    while not fila.empty():
+        campos = dict(linha.split(": ", 1) for linha in fila.get_nowait().strip().split("\n"))
+        eventos.append((campos["event"], json.loads(campos["data"])))
+    return eventos
+
+
+def test_publicador_repete_historico_e_pede_recarga(relatorio):
+    """Quem reconecta recebe os diffs perdidos; versão fora do histórico ou fila cheia viram ``recarregar``."""
+    caminho, _ = relatorio
+    publicador = app_flask.PublicadorRelatorio(app_flask.cache, intervalo=3600, historico=4, max_fila=2)
+    try:
+        lento = publicador.assinar()
+        versoes = [publicador.versao()]
+        for semente in (1, 2):
+            _gravar(caminho.parent, _saida_inferencia(semente=semente))
+            publicador._verificar()
+            versoes.append(publicador.versao())
+        assert len(set(versoes)) == 3
+
+        perdidos = _eventos(publicador.assinar(desde=versoes[0]))
+        assert [tipo for tipo, _ in perdidos] == ["diff", "diff"]
+        assert [(d["anterior"], d["versao"]) for _, d in perdidos] == list(zip(versoes, versoes[1:]))
+        assert _eventos(publicador.assinar(desde=versoes[-1])) == []
+        assert _eventos(publicador.assinar(desde="desconhecida")) == [("recarregar", {"versao": versoes[-1]})]
+
+        # o assinante lento não leu nada: a fila cheia troca o atraso por uma recarga completa
+        _gravar(caminho.parent, _saida_inferencia(semente=3))
+        publicador._verificar()
+        assert _eventos(lento) == [("recarregar", {"versao": publicador.versao()})]
+    finally:
+        publicador.parar()
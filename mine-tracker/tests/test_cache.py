@@ -0,0 +1,86 @@
+import os
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from mine_tracker.cache import cacheado, configurar
+
+chamadas = []
+
+
+@cacheado
+def _somar(df, params):
+    chamadas.append(1)
+    return df.assign(total=df["x"] + params["k"])
+
+
+@cacheado
+def _contar(dataset):
+    chamadas.append(1)
+    return dataset.count_rows()
+
+
+@pytest.fixture(autouse=True)
+def _sem_cache_depois():
+    chamadas.clear()
+    yield
+    configurar(None)
+
+
+def test_reaproveita_saida_com_mesmas_entradas(tmp_path):
+    df = pd.DataFrame({"x": range(5)})
+    assert _somar(df, {"k": 1}).equals(_somar(df, {"k": 1}))
+    assert len(chamadas) == 2  # sem cache configurado roda sempre
+
+    configurar(str(tmp_path))
+    primeira = _somar(df, {"k": 1})
+    segunda = _somar(df.copy(), {"k": 1})
+    assert segunda.equals(primeira) and len(chamadas) == 3
+
+    _somar(df, {"k": 2})
+    _somar(df.assign(x=df["x"] * 2), {"k": 1})
+    assert len(chamadas) == 5
+    assert len(list(tmp_path.glob("_somar-*.pkl"))) == 3
+
+
+def test_dataset_lazy_usa_conteudo_dos_arquivos(tmp_path):
+    configurar(str(tmp_path / "cache"))
+    pasta = tmp_path / "tabela"
+    pasta.mkdir()
+    pd.DataFrame({"x": range(3)}).to_parquet(pasta / "a.parquet")
+
+    assert _contar(ds.dataset(str(pasta))) == 3
+    # regravado igual (novo mtime): continua acerto
+    pd.DataFrame({"x": range(3)}).to_parquet(pasta / "a.parquet")
+    assert _contar(ds.dataset(str(pasta))) == 3 and len(chamadas) == 1
+
+    pd.DataFrame({"x": range(4)}).to_parquet(pasta / "a.parquet")
+    assert _contar(ds.dataset(str(pasta))) == 4 and len(chamadas) == 2
+
+
+def test_despeja_entradas_de_uso_mais_antigo(tmp_path):
+    c = configurar(str(tmp_path))
+    dfs = [pd.DataFrame({"x": range(i * 1000, (i + 1) * 1000)}) for i in range(3)]
+    _somar(dfs[0], {"k": 0})
+    [a] = tmp_path.glob("*.pkl")
+    _somar(dfs[1], {"k": 0})
+    [b] = set(tmp_path.glob("*.pkl")) - {a}
+    os.utime(a, ns=(1, 1))
+    os.utime(b, ns=(2, 2))
+
+    _somar(dfs[0], {"k": 0})  # acerto: ``a`` passa a ser a de uso mais recente
+    assert len(chamadas) == 2
+    c.max_bytes = a.stat().st_size + b.stat().st_size + a.stat().st_size // 2
+    _somar(dfs[2], {"k": 0})
+
+    restantes = set(tmp_path.glob("*.pkl"))
+    assert a in restantes and b not in restantes and len(restantes) == 2
+
+
+def test_nodes_geradores_sao_recusados():
+    def gerador(df):
+        yield df
+
+    with pytest.raises(TypeError):
+        cacheado(gerador)
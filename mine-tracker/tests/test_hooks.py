@@ -0,0 +1,68 @@
+import json
+
+import pandas as pd
+from kedro.framework.hooks.manager import _create_hook_manager
+from kedro.io import DataCatalog, MemoryDataset
+from kedro.pipeline import Pipeline, node
+from kedro.runner import SequentialRunner
+
+from mine_tracker.datasets import ArquivoIncrementalDataset, ParquetParticionadoDataset
+from mine_tracker import hooks as hooks_modulo
+from mine_tracker.hooks import InstrumentacaoHooks
+
+
+def _dobrar(df):
+    return df.assign(x=df["x"] * 2)
+
+
+def _em_pedacos(df):
+    for i in range(0, len(df), 4):
+        yield df.iloc[i:i + 4]
+
+
+def test_instrumentacao_grava_json_e_prometheus(tmp_path, monkeypatch):
+    catalogo = DataCatalog({
+        "entrada": MemoryDataset(pd.DataFrame({"x": range(10)})),
+        "dobrado": ParquetParticionadoDataset(filepath=str(tmp_path / "dobrado")),
+        "pedacos": ArquivoIncrementalDataset(filepath=str(tmp_path / "pedacos")),
+    })
+    pipeline = Pipeline([
+        node(_dobrar, "entrada", "dobrado", name="dobrar"),
+        node(_em_pedacos, "dobrado", "pedacos", name="em_pedacos"),
+    ])
+    hooks = InstrumentacaoHooks(diretorio="metricas")
+    medidos = []
+    tamanho_em_disco = hooks_modulo._tamanho_em_disco
+    monkeypatch.setattr(hooks_modulo, "_tamanho_em_disco", lambda caminho: medidos.append(caminho) or tamanho_em_disco(caminho))
+    gerenciador = _create_hook_manager()
+    gerenciador.register(hooks)
+    run_params = {"run_id": "teste", "pipeline_names": ["mine"], "project_path": str(tmp_path), "runner": "SequentialRunner"}
+
+    gerenciador.hook.before_pipeline_run(run_params=run_params, pipeline=pipeline, catalog=catalogo)
+    resultado = SequentialRunner().run(pipeline, catalogo, gerenciador, run_id="teste")
+    gerenciador.hook.after_pipeline_run(run_params=run_params, run_result=resultado, pipeline=pipeline, catalog=catalogo)
+
+    [arquivo] = (tmp_path / "metricas").glob("mine-*.json")
+    run = json.loads(arquivo.read_text())
+    assert run["sucesso"] and run["pipeline"] == "mine"
+    nodes = {n["node"]: n for n in run["nodes"]}
+    assert nodes["dobrar"]["linhas_entrada"] == {"entrada": 10}
+    assert nodes["dobrar"]["linhas_saida"] == {"dobrado": 10}
+    # node gerador: três pedaços salvos, linhas somadas
+    assert nodes["em_pedacos"]["linhas_saida"] == {"pedacos": 10}
+    assert all(n["sucesso"] and n["duracao_segundos"] >= n["duracao_funcao_segundos"] >= 0 for n in nodes.values())
+    assert all(n["memoria_pico_bytes"] > 0 for n in nodes.values())
+
+    saves = [d for d in run["datasets"] if d["operacao"] == "save"]
+    assert [d["dataset"] for d in saves] == ["dobrado", "pedacos", "pedacos", "pedacos"]
+    assert saves[0]["bytes"] == (tmp_path / "dobrado").stat().st_size
+    # tamanho medido uma vez por dataset no fim do run, não a cada pedaço salvo
+    assert {d["bytes"] for d in saves[1:]} == {sum(p.stat().st_size for p in (tmp_path / "pedacos").iterdir())}
+    assert sorted(p.name for p in medidos) == ["dobrado", "pedacos"]
+    assert [d["bytes"] for d in run["datasets"] if d["dataset"] == "entrada"] == [None]
+
+    prom = (tmp_path / "metricas" / "mine_tracker_mine.prom").read_text()
+    assert "# TYPE mine_tracker_node_duracao_segundos gauge" in prom
+    assert 'mine_tracker_node_linhas_saida{pipeline="mine",node="em_pedacos"} 10' in prom
+    assert 'mine_tracker_dataset_operacoes{pipeline="mine",dataset="pedacos",operacao="save"} 3' in prom
+    assert 'mine_tracker_run_sucesso{pipeline="mine"} 1' in prom
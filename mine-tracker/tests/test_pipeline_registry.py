@@ -0,0 +1,16 @@
+from mine_tracker.pipeline_registry import MODOS_ALTERNATIVOS, register_pipelines
+
+
+def test_registro_monta_so_o_pipeline_pedido():
+    pipelines = register_pipelines()
+    assert set(pipelines) == {"__default__", "mine", "model", "inference", *MODOS_ALTERNATIVOS}
+    assert pipelines._montados == {}
+
+    inferencia = pipelines["inference"]
+    assert list(pipelines._montados) == ["inference"]
+    assert pipelines["inference"] is inferencia
+
+    # __default__ soma os pipelines modulares, sem os modos alternativos
+    nomes = {n.name for n in pipelines["__default__"].nodes}
+    assert nomes == {n.name for nome in ("mine", "model", "inference") for n in pipelines[nome].nodes}
+    assert "inferencia_em_lotes_node" not in nomes